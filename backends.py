@@ -0,0 +1,470 @@
+import os
+import sqlite3
+from collections import Counter
+from contextlib import contextmanager
+
+import storage
+from models import MAX_ORDINAL
+from parser import pars_line, pars_store_iter
+from storage import (
+    append_lines, atomic_write, file_lock, file_size, file_stat, read_lines_from, read_tail, write_lines,
+)
+
+EDIT_FILE = 'edit.litstore'
+
+
+def _in_period(entry, code=None, date_from=None, date_to=None) -> bool:
+    if code and entry.code != code:
+        return False
+    if date_from and entry.date_ord < date_from.toordinal():
+        return False
+    if date_to and entry.date_ord > date_to.toordinal():
+        return False
+    return entry.date_ord != MAX_ORDINAL or not (date_from or date_to)
+
+
+class HistoryIndex:
+    """
+    Хэши содержимого отправленных строк .lithistory (WorklogEntry.content_hash)
+    для проверки «уже отправлено» за O(1). Хранится на диске вместе с размером учтённой
+    части истории и последними байтами перед этой границей: при следующем запуске
+    дочитываются только новые строки, а переписанная история индексируется заново.
+    """
+    VERSION = 1
+    TAIL = 64
+
+    def __init__(self, history_file, index_file):
+        self.history_file = history_file
+        self.index_file = index_file
+        self.hashes = set()
+        self.size = 0
+        self.tail = b''
+
+    def __contains__(self, content_hash):
+        return content_hash in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _load_disk(self):
+        # Первая строка: версия, размер учтённой части истории и её хвост в hex; далее по хэшу в строке
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                version, size, tail = f.readline().split()
+                if int(version) != self.VERSION:
+                    return
+                hashes = {bytes.fromhex(line) for line in f.read().split()}
+                self.hashes, self.size, self.tail = hashes, int(size), bytes.fromhex(tail.strip('-'))
+        except (OSError, ValueError):
+            # Нет индекса или он битый - строим заново
+            return
+
+    def _save_disk(self):
+        try:
+            with atomic_write(self.index_file, fsync='none') as f:
+                f.write(f"{self.VERSION} {self.size} {self.tail.hex() or '-'}\n")
+                f.writelines(f"{content_hash.hex()}\n" for content_hash in self.hashes)
+        except OSError as e:
+            print(f"Ошибка при сохранении индекса истории: {e}")
+
+    def load(self):
+        """Читает индекс и дописывает в него строки, добавленные в историю с прошлого раза"""
+        self._load_disk()
+        with file_lock(self.history_file):
+            current = file_size(self.history_file)
+            if current < self.size or read_tail(self.history_file, self.size, self.TAIL) != self.tail:
+                self.hashes, self.size = set(), 0
+            if current == self.size:
+                return self
+            new_lines = read_lines_from(self.history_file, self.size)
+            self.hashes.update(entry.content_hash for entry in pars_store_iter(new_lines))
+            self.size = current
+            self.tail = read_tail(self.history_file, current, self.TAIL)
+        self._save_disk()
+        return self
+
+
+class WorklogBackend:
+    """
+    Хранилище записей ворклога и истории отправок.
+    Реализации: TextBackend (.litstore, по умолчанию), ShardedStore (по месяцам), SqliteBackend.
+    История по умолчанию хранится в текстовом .lithistory.
+    """
+    layout = None  # Значение [storage] layout
+
+    def __init__(self, history_file=None):
+        self.history_file = history_file
+
+    def load(self) -> list:
+        """Строки для работы в памяти"""
+        raise NotImplementedError
+
+    def load_all(self) -> list:
+        """Все строки хранилища (для экспорта)"""
+        return self.load()
+
+    def append(self, lines):
+        """
+        Дописывает строки. Возвращает строки, которых ещё нет в памяти (дописанные
+        другими процессами), или None, если хранилище переписали извне и его нужно перечитать.
+        """
+        raise NotImplementedError
+
+    def save(self, lines) -> list:
+        """Перезаписывает хранилище строками lines и возвращает итоговый список строк"""
+        raise NotImplementedError
+
+    def stat(self):
+        """Состояние файла для кэша разбора, если память совпадает с ним, иначе None"""
+        return None
+
+    def archived_count(self) -> int:
+        """Количество строк, не загруженных в память"""
+        return 0
+
+    def export_for_edit(self) -> str:
+        """Путь к файлу для lit edit"""
+        raise NotImplementedError
+
+    def import_edit(self, path, stat_before=None):
+        """Применяет изменения из файла lit edit"""
+
+    def append_history(self, lines):
+        if not lines:
+            return
+        with file_lock(self.history_file):
+            append_lines(self.history_file, lines)
+
+    def read_history(self) -> list:
+        return read_lines_from(self.history_file, 0)
+
+    def pushed_hashes(self):
+        """Хэши содержимого отправленных записей (поддерживает in)"""
+        return HistoryIndex(self.history_file, self.history_file + '.index').load()
+
+    def find_history(self, code=None, date_from=None, date_to=None) -> list:
+        """Отправленные строки по коду задачи и периоду. В текстовой истории - полным проходом."""
+        return [
+            entry.log for entry in pars_store_iter(self.read_history())
+            if _in_period(entry, code, date_from, date_to)
+        ]
+
+    def update_history(self, changes):
+        """
+        Заменяет строки истории по словарю {строка: новая строка}, None - удалить строку
+        (lit amend / lit revert). Текстовая история переписывается целиком, индекс заметит это по хвосту файла.
+        """
+        if not changes:
+            return
+        with file_lock(self.history_file):
+            lines = (changes.get(line, line) for line in read_lines_from(self.history_file, 0))
+            write_lines(self.history_file, [line for line in lines if line is not None])
+
+    def replace_all(self, lines, history):
+        """Заменяет всё содержимое хранилища и истории (lit store --import)"""
+        self.load_all()
+        self.save(lines)
+        with file_lock(self.history_file):
+            write_lines(self.history_file, history)
+
+
+class TextBackend(WorklogBackend):
+    """Один текстовый файл .litstore: новые строки дописываются в конец, push перезаписывает файл"""
+    layout = 'flat'
+    TAIL = 64
+
+    def __init__(self, path, history_file=None):
+        super().__init__(history_file)
+        self.path = path
+        self.size = 0    # Сколько байт файла уже отражено в памяти
+        self.tail = b''  # Последние байты перед этой границей, как в HistoryIndex
+
+    def load(self) -> list:
+        if not os.path.exists(self.path):
+            self.size, self.tail = 0, b''
+            return []
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.size, self.tail = len(data), data[-self.TAIL:]
+        return [line.strip() for line in data.decode('utf-8').splitlines() if line.strip()]
+
+    def _rewritten(self) -> bool:
+        # Файл переписали извне (например, в редакторе): он стал короче или изменилось
+        # содержимое перед прочитанной границей. Дочитывать с прежнего смещения тогда нельзя
+        return file_size(self.path) < self.size or read_tail(self.path, self.size, self.TAIL) != self.tail
+
+    def _remember(self, size):
+        self.size, self.tail = size, read_tail(self.path, size, self.TAIL)
+
+    def append(self, lines):
+        with file_lock(self.path):
+            extra = None if self._rewritten() else read_lines_from(self.path, self.size)
+            self._remember(append_lines(self.path, lines))
+        return extra
+
+    def save(self, lines) -> list:
+        with file_lock(self.path):
+            # Если файл переписали извне, приоритет у памяти: в ней результаты push
+            if not self._rewritten():
+                lines = list(lines) + read_lines_from(self.path, self.size)
+            self._remember(write_lines(self.path, lines))
+        return lines
+
+    def stat(self):
+        stat = file_stat(self.path)
+        return stat if stat is not None and stat[1] == self.size else None
+
+    def export_for_edit(self) -> str:
+        return self.path
+
+
+# Статус строки по признаку disabled в WorklogEntry
+ENTRY_STATUS = {None: 'pending', '#': 'disabled', 'X': 'invalid'}
+HISTORY_STATUS = 'pushed'
+# fsync-политика [storage] -> PRAGMA synchronous
+SYNCHRONOUS = {'none': 'OFF', 'file': 'NORMAL', 'full': 'FULL'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    line TEXT NOT NULL,
+    date_ord INTEGER NOT NULL,
+    start_min INTEGER NOT NULL,
+    code TEXT,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date_ord, start_min);
+CREATE INDEX IF NOT EXISTS entries_code ON entries (code, date_ord);
+CREATE INDEX IF NOT EXISTS entries_status ON entries (status, date_ord);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    line TEXT NOT NULL,
+    date_ord INTEGER NOT NULL,
+    code TEXT,
+    worklog_id TEXT,
+    status TEXT NOT NULL,
+    content_hash BLOB
+);
+CREATE INDEX IF NOT EXISTS history_date ON history (date_ord);
+CREATE INDEX IF NOT EXISTS history_code ON history (code, date_ord);
+CREATE INDEX IF NOT EXISTS history_status ON history (status, date_ord);
+CREATE INDEX IF NOT EXISTS history_hash ON history (content_hash);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+INSERT_ENTRY = "INSERT INTO entries (line, date_ord, start_min, code, status) VALUES (?, ?, ?, ?, ?)"
+INSERT_HISTORY = ("INSERT INTO history (line, date_ord, code, worklog_id, status, content_hash) "
+                  "VALUES (?, ?, ?, ?, ?, ?)")
+UPDATE_HISTORY = ("UPDATE history SET line = ?, date_ord = ?, code = ?, worklog_id = ?, status = ?, content_hash = ? "
+                  "WHERE line = ?")
+
+
+def _entry_row(line) -> tuple:
+    entry = pars_line(line)
+    return line, entry.date_ord, entry.start_min, entry.code, ENTRY_STATUS[entry.disabled]
+
+
+def _history_row(line) -> tuple:
+    entry = pars_line(line)
+    return line, entry.date_ord, entry.code, entry.worklog_id, HISTORY_STATUS, entry.content_hash
+
+
+class _PushedHashes:
+    """Проверка «уже отправлено» по индексу history_hash без чтения всей истории"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __contains__(self, content_hash):
+        query = "SELECT 1 FROM history WHERE content_hash = ? LIMIT 1"
+        return self._conn.execute(query, (content_hash,)).fetchone() is not None
+
+
+class SqliteBackend(WorklogBackend):
+    """
+    Записи и история в одной базе SQLite с индексами по дате, коду задачи и статусу.
+    Строки хранятся дословно, поэтому экспорт обратно в текст не теряет данных.
+    Любая пачка строк пишется одной транзакцией.
+    """
+    layout = 'sqlite'
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.edit_file = os.path.join(os.path.dirname(path), EDIT_FILE)
+        self.last_id = 0     # Последняя строка entries, отражённая в памяти
+        self.generation = 0  # Счётчик перезаписей: меняется, когда строки удаляются
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            storage.ensure_config()
+            # Соединение используется и фоновым push (lit> push --bg), доступ упорядочен WorklogManager
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={SYNCHRONOUS[storage.FSYNC]}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextmanager
+    def _transaction(self, mode='IMMEDIATE'):
+        conn = self._connect()
+        conn.execute(f"BEGIN {mode}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _generation(conn) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _bump_generation(self, conn):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+
+    def _remember(self, conn):
+        """Запоминает, до какого места память совпадает с базой"""
+        self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+        self.generation = self._generation(conn)
+
+    def _lines_after(self, conn, last_id) -> list:
+        return [line for (line,) in conn.execute("SELECT line FROM entries WHERE id > ? ORDER BY id", (last_id,))]
+
+    def load(self) -> list:
+        with self._transaction('DEFERRED') as conn:
+            lines = self._lines_after(conn, 0)
+            self._remember(conn)
+        return lines
+
+    def append(self, lines):
+        with self._transaction() as conn:
+            rewritten = self._generation(conn) != self.generation
+            extra = None if rewritten else self._lines_after(conn, self.last_id)
+            conn.executemany(INSERT_ENTRY, map(_entry_row, lines))
+            if not rewritten:
+                self._remember(conn)
+        return extra
+
+    def save(self, lines) -> list:
+        """
+        Применяет разницу между памятью и базой: удаляются только исчезнувшие строки
+        и добавляются новые, поэтому push десятка записей не переписывает всю таблицу.
+        """
+        lines = list(lines)
+        with self._transaction() as conn:
+            if self._generation(conn) == self.generation:
+                extra = self._lines_after(conn, self.last_id)
+                known = conn.execute("SELECT id, line FROM entries WHERE id <= ?", (self.last_id,))
+            else:
+                # Строки переписали извне - как и в текстовом хранилище, приоритет у памяти
+                extra = []
+                known = conn.execute("SELECT id, line FROM entries")
+
+            wanted = Counter(lines)
+            stale = []
+            for row_id, line in known.fetchall():
+                if wanted[line] > 0:
+                    wanted[line] -= 1
+                else:
+                    stale.append((row_id,))
+
+            conn.executemany("DELETE FROM entries WHERE id = ?", stale)
+            conn.executemany(INSERT_ENTRY, map(_entry_row, wanted.elements()))
+            if stale:
+                self._bump_generation(conn)
+            self._remember(conn)
+        return lines + extra
+
+    def export_for_edit(self) -> str:
+        write_lines(self.edit_file, self.load())
+        return self.edit_file
+
+    def import_edit(self, path, stat_before=None):
+        try:
+            if stat_before is not None and file_stat(path) == stat_before:
+                return  # Файл не меняли
+            # last_id остался от export_for_edit, поэтому строки, дописанные
+            # во время редактирования, сохранятся
+            self.save(read_lines_from(path, 0))
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def append_history(self, lines):
+        if not lines:
+            return
+        with self._transaction() as conn:
+            conn.executemany(INSERT_HISTORY, map(_history_row, lines))
+
+    def read_history(self) -> list:
+        return [line for (line,) in self._connect().execute("SELECT line FROM history ORDER BY id")]
+
+    def pushed_hashes(self):
+        return _PushedHashes(self._connect())
+
+    def find_history(self, code=None, date_from=None, date_to=None) -> list:
+        conditions, params = [], []
+        if code:
+            conditions.append("code = ?")
+            params.append(code)
+        if date_from:
+            conditions.append("date_ord >= ?")
+            params.append(date_from.toordinal())
+        if date_to or date_from:
+            conditions.append("date_ord <= ?")
+            params.append(date_to.toordinal() if date_to else MAX_ORDINAL - 1)
+
+        query = "SELECT line FROM history"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date_ord, id"
+        return [line for (line,) in self._connect().execute(query, params)]
+
+    def update_history(self, changes):
+        with self._transaction() as conn:
+            for line, new_line in changes.items():
+                if new_line is None:
+                    conn.execute("DELETE FROM history WHERE line = ?", (line,))
+                else:
+                    conn.execute(UPDATE_HISTORY, _history_row(new_line) + (line,))
+
+    def replace_all(self, lines, history):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM history")
+            conn.executemany(INSERT_ENTRY, map(_entry_row, lines))
+            conn.executemany(INSERT_HISTORY, map(_history_row, history))
+            self._bump_generation(conn)
+            self._remember(conn)
+
+    def needs_migration(self, flat_store, history_file) -> bool:
+        """Есть .litstore или .lithistory, а базы ещё нет"""
+        return not os.path.exists(self.path) and (os.path.exists(flat_store) or os.path.exists(history_file))
+
+    def migrate(self, flat_store, history_file):
+        """Переносит .litstore и .lithistory в базу (lit store --migrate)"""
+        if not self.needs_migration(flat_store, history_file):
+            return
+        self.replace_all(read_lines_from(flat_store, 0), read_lines_from(history_file, 0))
+        for path in (flat_store, history_file):
+            if os.path.exists(path):
+                os.replace(path, path + '.migrated')
+        print(f"Записи из {flat_store} и {history_file} перенесены в {self.path}")
@@ -0,0 +1,14 @@
+import configparser
+import os
+
+LIT_DIR = os.path.join(os.path.expanduser("~"), ".lit")
+CONFIG_FILE = os.path.join(LIT_DIR, ".litconfig")
+
+
+def read_config(config_file=None) -> configparser.RawConfigParser:
+    """Настройки из .litconfig (по умолчанию ~/.lit/.litconfig). Нет файла - пустой конфиг."""
+    # Создаем конфиг-парсер с сохранением регистра
+    config = configparser.RawConfigParser()
+    config.optionxform = lambda option: option  # Отключаем авто-преобразование в lowercase
+    config.read(config_file or CONFIG_FILE)
+    return config
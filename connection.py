@@ -0,0 +1,246 @@
+import configparser
+import os
+import sys
+import threading
+import time
+
+from requests.exceptions import ConnectionError as HTTPConnectionError
+
+from config import LIT_DIR, read_config
+from jira_rest import JiraError, RestClient
+from storage import save_json
+from utils import load_dict
+
+HANDSHAKE_FILE = os.path.join(LIT_DIR, ".jirahandshake.json")
+
+# Клиент Jira, [jira] client: rest - встроенный (jira_rest.py), jira - библиотека jira, если установлена
+CLIENTS = ('rest', 'jira')
+DEFAULT_CLIENT = 'rest'
+DEFAULT_HANDSHAKE_TTL = 12 * 60 * 60  # Секунды, [jira] handshake_ttl; 0 - проверять при каждом подключении
+CONNECT_CALLS = 2                     # Живая проверка подключения: serverInfo и myself
+# Поля myself, нужные current_user() (аватары и прочее не храним)
+MYSELF_FIELDS = ('name', 'key', 'accountId', 'displayName')
+
+# Ответы Jira, после которых клиент создаётся заново: авторизация больше не действует
+RECONNECT_STATUSES = {401}
+
+
+def read_jira_config(config_file=None):
+    """Адрес, учётные данные Jira, срок жизни проверки подключения и вид клиента из .litconfig"""
+    config = read_config(config_file)
+    return (config.get('jira', 'url'), config.get('jira', 'login'), config.get('jira', 'pass'),
+            config.getint('jira', 'handshake_ttl', fallback=DEFAULT_HANDSHAKE_TTL),
+            config.get('jira', 'client', fallback=DEFAULT_CLIENT))
+
+
+class HandshakeCache:
+    """
+    Результат проверки подключения (версия сервера и текущий пользователь) по серверу и логину.
+    Пока запись свежая, клиент создаётся без запросов serverInfo и myself.
+    """
+
+    def __init__(self, path=HANDSHAKE_FILE):
+        self.path = path
+
+    @staticmethod
+    def key(url, login) -> str:
+        return f"{url.rstrip('/')}|{login}"
+
+    def get(self, key, ttl):
+        info = load_dict(self.path).get(key)
+        if info is None or ttl <= 0 or time.time() - info.get('checked', 0) > ttl:
+            return None
+        return info
+
+    def put(self, key, jira):
+        data = load_dict(self.path)
+        data[key] = {
+            'version': list(jira._version),
+            'deployment': jira.deploymentType,
+            'myself': {field: jira._myself[field] for field in MYSELF_FIELDS if field in jira._myself},
+            'checked': time.time(),
+        }
+        self._save(data)
+
+    def drop(self, key):
+        data = load_dict(self.path)
+        if data.pop(key, None) is not None:
+            self._save(data)
+
+    def _save(self, data):
+        try:
+            save_json(self.path, data)
+        except OSError as e:
+            # Без кэша lit работает, просто проверяет подключение каждый раз
+            print(f"Не удалось сохранить {self.path}: {e}")
+
+
+def jira_errors() -> tuple:
+    """
+    Классы ответов Jira с кодом ошибки. JIRAError возможна, только если библиотека jira
+    уже импортирована, поэтому ради проверки её не импортируем.
+    """
+    exceptions = sys.modules.get('jira.exceptions')
+    return (JiraError, exceptions.JIRAError) if exceptions is not None else (JiraError,)
+
+
+def needs_reconnect(error) -> bool:
+    """Ошибка авторизации или транспорта: клиента нужно пересоздать"""
+    if isinstance(error, jira_errors()):
+        return error.status_code in RECONNECT_STATUSES
+    return isinstance(error, HTTPConnectionError)
+
+
+class JiraProvider:
+    """
+    Одно подключение к Jira на процесс: в сессии lit> push, pull, amend и revert
+    пользуются одним клиентом и одним пулом TLS-соединений.
+    Клиент создаётся при первом обращении. Проверка подключения (serverInfo и myself)
+    кэшируется на диске на handshake_ttl секунд, пока кэш свежий - запросов при подключении нет.
+    После ошибки авторизации или транспорта клиент сбрасывается и создаётся заново,
+    после 401 ещё и сбрасывается кэш проверки, поэтому следующее подключение проверяется вживую.
+    """
+
+    def __init__(self, config_file=None, handshake=None):
+        self.config_file = config_file
+        self.handshake = handshake or HandshakeCache()
+        self.checked = False  # Последнее подключение проверено вживую, а не взято из кэша
+        self._jira = None
+        self._key = None
+        self._from_cache = None  # Клиент, созданный по кэшу проверки без запросов serverInfo и myself
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        """Уже созданный клиент или None, новое подключение не создаётся"""
+        return self._jira
+
+    def get(self):
+        with self._lock:
+            if self._jira is None:
+                self._jira = self._create()
+            return self._jira
+
+    def connect_calls(self) -> int:
+        """Сколько запросов сделает подключение: 0, если клиент уже есть или проверка в кэше"""
+        if self._jira is not None:
+            return 0
+        try:
+            url, login, password, ttl, kind = read_jira_config(self.config_file)
+        except configparser.Error:
+            return CONNECT_CALLS
+        return 0 if self.handshake.get(self.handshake.key(url, login), ttl) else CONNECT_CALLS
+
+    def _create(self):
+        url, login, password, ttl, kind = read_jira_config(self.config_file)
+        self._key = self.handshake.key(url, login)
+        cached = self.handshake.get(self._key, ttl)
+        jira = self._client(url, login, password, get_server_info=cached is None, kind=kind)
+        if cached:
+            # То, что JIRA узнаёт из serverInfo и myself, берётся из кэша
+            jira._version = tuple(cached['version'])
+            jira.deploymentType = cached['deployment']
+            jira._myself = cached['myself']
+            self.checked = False
+            self._from_cache = jira
+        else:
+            # Проверка учётных данных (401 - исключение), ответ нужен и current_user()
+            jira._myself = jira.myself()
+            self.handshake.put(self._key, jira)
+            self.checked = True
+            self._from_cache = None
+        return jira
+
+    @staticmethod
+    def _client(url, login, password, get_server_info=True, kind=DEFAULT_CLIENT):
+        if kind not in CLIENTS:
+            print(f"Неизвестный клиент Jira '{kind}' (допустимо: {', '.join(CLIENTS)}), используется {DEFAULT_CLIENT}")
+        elif kind == 'jira':
+            try:
+                return JiraProvider._library_client(url, login, password, get_server_info)
+            except ImportError:
+                print("Библиотека jira не установлена, используется встроенный клиент")
+        # Встроенный клиент: быстрый импорт, без лишних запросов при создании
+        return RestClient(server=url, basic_auth=(login, password), timeout=20, verify=True,
+                          get_server_info=get_server_info)
+
+    @staticmethod
+    def _library_client(url, login, password, get_server_info):
+        # Библиотека jira - запасной вариант: импортируется долго и не обязательна
+        from jira import JIRA
+
+        # Создаем клиент Jira с базовой аутентификацией
+        return JIRA(
+            server=url,
+            basic_auth=(login, password),
+            options={
+                'server': url,
+                'rest_api_version': '2',  # Явно указываем версию API
+                'verify': True
+            },
+            timeout=20,
+            # Повторы делает push (pusher.py) по видам ошибок. Встроенные повторы jira
+            # молча ждут до минуты и повторяют POST даже после обрыва уже отправленного запроса
+            max_retries=0,
+            get_server_info=get_server_info
+        )
+
+    def reset(self, jira=None):
+        """Сбрасывает клиент. Если передан jira - только если это всё ещё текущий клиент."""
+        with self._lock:
+            if self._jira is None or (jira is not None and jira is not self._jira):
+                return
+            # Старый клиент не закрываем: им могут ещё пользоваться потоки отправки
+            self._jira = None
+
+    def recheck(self, jira):
+        """
+        Живая проверка подключения после 401 у клиента jira. Клиент, созданный по кэшу проверки,
+        мог пережить смену пароля: кэш сбрасывается и подключение проверяется запросами serverInfo и myself.
+        Возвращает проверенный клиент или None, если учётные данные не подходят и команду нужно прервать.
+        """
+        with self._lock:
+            if jira is not self._from_cache:
+                # Клиент уже проверен вживую - 401 и есть ответ на проверку
+                return None
+            self._from_cache = None
+        if self._key is not None:
+            self.handshake.drop(self._key)
+        self.reset(jira)
+        try:
+            return self.get()
+        except Exception as e:
+            print(f"Ошибка подключения: {e}")
+            return None
+
+    def report(self, jira, error):
+        """Вызывается при ошибке запроса: сбрасывает клиент, если ошибка того требует"""
+        if needs_reconnect(error):
+            if isinstance(error, jira_errors()) and self._key is not None:
+                # Учётные данные больше не подходят - кэшу проверки верить нельзя
+                self.handshake.drop(self._key)
+            self.reset(jira)
+
+
+PROVIDER = JiraProvider()
+
+
+def connect(report_error=None):
+    """
+    Клиент Jira для команды. В интерактивном режиме переиспользуется между командами.
+    report_error(e) - вывод ответа Jira с ошибкой при подключении (по умолчанию текст ошибки).
+    """
+    created = PROVIDER.current is None
+    try:
+        jira = PROVIDER.get()
+    except Exception as e:
+        if report_error and isinstance(e, jira_errors()):
+            report_error(e)
+        else:
+            print(f"Ошибка подключения: {e}")
+        exit()
+
+    if created and PROVIDER.checked:
+        print(f"Успешное подключение к Jira {'.'.join(map(str, jira._version))}")
+        print(f"Авторизованы как: {jira.current_user()}")
+    return jira
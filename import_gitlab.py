@@ -2,22 +2,20 @@ import requests
 from datetime import datetime, timedelta
 import re
 import os
-import json
 import configparser
+from storage import save_json
+
 
-#TODO В утилсы
 def save_commits(data: dict):
     """Сохранение коммитов в файл с атомарной записью"""
     try:
-        with open(COMMITS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_json(COMMITS_FILE, data)
     except Exception as e:
         print(f"Error saving commits: {str(e)}")
 
 
 #TODO Конфигурация дублируется, вынести в отдельный код
 LIT_DIR = os.path.join(os.path.expanduser("~"), ".lit")
-os.makedirs(LIT_DIR, exist_ok=True)
 COMMITS_FILE = os.path.join(LIT_DIR, "commits.json")
 CONFIG_FILE = os.path.join(LIT_DIR, ".litconfig")
 
@@ -1,23 +1,26 @@
-from jira import JIRA, exceptions
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from bs4 import BeautifulSoup
 import os
-import json
 import configparser
+from connection import PROVIDER, connect
+from pusher import DEFAULT_WORKERS
+from storage import save_json
+from utils import load_dict
+
 
-#TODO В утилсы
 def save_commits(data: dict):
     """Сохранение коммитов в файл с атомарной записью"""
     try:
-        with open(TASKS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_json(TASKS_FILE, data)
     except Exception as e:
         print(f"Error saving commits: {str(e)}")
 
 #TODO Конфигурация дублируется, вынести в отдельный код
 LIT_DIR = os.path.join(os.path.expanduser("~"), ".lit")
-os.makedirs(LIT_DIR, exist_ok=True)
 TASKS_FILE = os.path.join(LIT_DIR, "tasks.json")
+# Метка последней синхронизации и дата обновления каждой задачи из tasks.json
+SYNC_FILE = os.path.join(LIT_DIR, ".jirasync.json")
 CONFIG_FILE = os.path.join(LIT_DIR, ".litconfig")
 
 JIRA_URL = ''
@@ -25,9 +28,17 @@ JIRA_URL = ''
 PASS = ''
 TARGET_USER = ''
 DAYS = ''
+PAGE_SIZE = 100
+SEARCH_WORKERS = DEFAULT_WORKERS
+
+# Больше задач на страницу Jira не отдаёт (jira.search.views.default.max), сервер может урезать и сильнее
+MAX_PAGE_SIZE = 1000
+SEARCH_FIELDS = 'key,summary,status,assignee,updated'
+# JQL сравнивает даты в часовом поясе профиля Jira, а не локальном: перекрытие в сутки покрывает разницу
+SYNC_OVERLAP = timedelta(days=1)
 
 def load_config():
-    global JIRA_URL, PASS, TARGET_USER, DAYS
+    global JIRA_URL, PASS, TARGET_USER, DAYS, PAGE_SIZE, SEARCH_WORKERS
     # Создаем конфиг-парсер с сохранением регистра
     config = configparser.RawConfigParser()
     config.optionxform = lambda option: option  # Отключаем авто-преобразование в lowercase
@@ -37,6 +48,8 @@ def load_config():
     PASS = config.get('jira', 'pass')
     TARGET_USER = config.get('jira', 'login')
     DAYS = int(config.get('jira', 'days'))
+    PAGE_SIZE = max(1, min(config.getint('jira', 'search_page_size', fallback=PAGE_SIZE), MAX_PAGE_SIZE))
+    SEARCH_WORKERS = max(1, config.getint('jira', 'search_workers', fallback=DEFAULT_WORKERS))
 
 #TODO вынести в отдельный конектор или утилсы
 def pars_error_jira(e):
@@ -57,92 +70,153 @@ def pars_error_jira(e):
         print(f"HTTP ошибка {e.status_code}: {e.text}")
 
 
+def get_all_issues(jira, jql_query, page_size=PAGE_SIZE, workers=SEARCH_WORKERS):
+    """
+    Все задачи по JQL-запросу. Первая страница даёт total, остальные startAt запрашиваются
+    параллельно, не больше workers запросов одновременно. Задачи без повторов, в порядке страниц.
+    Возвращает (задачи, прочитаны ли все страницы).
+    """
+    if getattr(jira, 'deploymentType', None) == 'Cloud':
+        return _get_issues_by_token(jira, jql_query, page_size)
+
+    def fetch(start_at):
+        try:
+            return jira.search_issues(jql_query, startAt=start_at, maxResults=page_size, fields=SEARCH_FIELDS)
+        except Exception as e:
+            PROVIDER.report(jira, e)
+            print(f"Ошибка при выполнении запроса: {e}")
+            return None
+
+    first = fetch(0)
+    if first is None:
+        return [], False
+    # Сервер урезает maxResults до своего максимума - шаг страниц берётся из ответа
+    step = min(getattr(first, 'maxResults', 0) or page_size, page_size)
+    total = getattr(first, 'total', len(first))
+    offsets = range(step, total, step) if len(first) >= step else range(0)
+
+    pages = [first]
+    if offsets:
+        with ThreadPoolExecutor(max_workers=min(workers, len(offsets)), thread_name_prefix='lit-search') as pool:
+            # Ошибка одной страницы не отменяет остальные
+            pages.extend(pool.map(fetch, offsets))
+
+    # Пока страницы читаются, задачи могут сдвинуться между ними - повторы убираются
+    issues = {}
+    for page in pages:
+        for issue in page or ():
+            issues.setdefault(issue.key, issue)
+    return list(issues.values()), None not in pages
+
+
+def _get_issues_by_token(jira, jql_query, page_size):
+    """
+    Jira Cloud: total и startAt в поиске search/jql нет, страницы читаются
+    по nextPageToken одна за другой. Возвращает то же, что get_all_issues.
+    """
+    issues = {}
+    token = None
+    while True:
+        try:
+            page = jira.enhanced_search_issues(jql_query, nextPageToken=token, maxResults=page_size,
+                                              fields=SEARCH_FIELDS)
+        except Exception as e:
+            PROVIDER.report(jira, e)
+            print(f"Ошибка при выполнении запроса: {e}")
+            return list(issues.values()), False
+        for issue in page:
+            issues.setdefault(issue.key, issue)
+        token = getattr(page, 'nextPageToken', None)
+        if not token or getattr(page, 'isLast', False):
+            return list(issues.values()), True
+
+
+def sync_since(state, source, window_start):
+    """
+    С какой даты искать обновлённые задачи или None, если нужна загрузка за всё окно days:
+    синхронизации ещё не было, она была с другим сервером или логином, либо давно.
+    """
+    if state.get('source') != source or not state.get('watermark') or not os.path.exists(TASKS_FILE):
+        return None
+    try:
+        since = (datetime.fromisoformat(state['watermark']) - SYNC_OVERLAP).date()
+    except (TypeError, ValueError):
+        return None
+    return since if since > window_start else None
+
+
+def merge_tasks(tasks, updated, issues, expire_before) -> int:
+    """
+    Вливает найденные задачи в кэш tasks за один проход и убирает задачи, которые не обновлялись
+    с expire_before (дата в ISO). updated - дата обновления каждой задачи, меняется вместе с tasks.
+    Возвращает число убранных задач.
+    """
+    today = date.today().isoformat()
+    for issue in issues:
+        tasks[issue.key] = issue.fields.summary
+        # Дата из "2024-03-05T10:00:00.000+0300"; задача найдена - значит, обновлялась не раньше окна
+        day = (getattr(issue.fields, 'updated', None) or today)[:10]
+        if day > updated.get(issue.key, ''):
+            updated[issue.key] = day
+
+    expired = [key for key in tasks if updated.get(key, '') < expire_before]
+    for key in expired:
+        del tasks[key]
+    for key in [key for key in updated if key not in tasks]:
+        del updated[key]
+    return len(expired)
+
+
 def load_tasks_from_jira():
     load_config()
-    #TODO вынести в отдельный конектор
-    AUTH = (TARGET_USER, PASS)
-    # Создаем клиент Jira с базовой аутентификацией
-    try:
-        jira = JIRA(
-            server=JIRA_URL,
-            basic_auth=AUTH,
-            options={
-                'server': JIRA_URL,
-                'rest_api_version': '2',  # Явно указываем версию API
-                'verify': True
-            },
-            timeout=20
-        )
-    except exceptions.JIRAError as e:
-        pars_error_jira(e)
-        exit()
-
-    # Проверка подключения
-    try:
-        print(f"Успешное подключение к Jira {jira.server_info()['version']}")
-        print(f"Авторизованы как: {jira.current_user()}")
-    except exceptions.JIRAError as e:
-        pars_error_jira(e)
-        exit()
+    # Клиент общий с push: в интерактивном режиме подключение переиспользуется
+    jira = connect(report_error=pars_error_jira)
 
-    # Рассчитываем даты за прошлый месяц
-    today = datetime.today()
-    first_day_previous_month = today - timedelta(days=DAYS)
+    # Метка берётся до запросов: задачи, обновлённые во время загрузки, попадут в следующую
+    now = datetime.now()
+    window_start = (now - timedelta(days=DAYS)).date()
+    source = f"{JIRA_URL.rstrip('/')}|{TARGET_USER}"
+    state = load_dict(SYNC_FILE)
+    since = sync_since(state, source, window_start)
 
     date_format = '%Y-%m-%d'
-    start_date = first_day_previous_month.strftime(date_format)
-    end_date = today.strftime(date_format)
-
-    # Формируем JQL запросы
-    jql_assignee = f'assignee = "{TARGET_USER}" AND updated >= "{start_date}"'
-    jql_worklog = f'worklogAuthor = "{TARGET_USER}" AND worklogDate >= "{start_date}"'
-
-    def get_all_issues(jql_query):
-        """Получаем все задачи по JQL-запросу с пагинацией"""
-        issues = []
-        start_at = 0
-        max_results = 50
-
-        while True:
-            try:
-                chunk = jira.search_issues(
-                    jql_query,
-                    startAt=start_at,
-                    maxResults=max_results,
-                    fields='key,summary,status,assignee'
-                )
-            except Exception as e:
-                print(f"Ошибка при выполнении запроса: {e}")
-                break
-
-            issues.extend(chunk)
-            start_at += len(chunk)
-            if len(chunk) < max_results:
-                break
-        return issues
+    start_date = window_start.strftime(date_format)
+
+    # Формируем JQL запросы. Порядок по ключу не меняется от обновлений задач, страницы не съезжают.
+    # Новый ворклог обновляет задачу, поэтому и задачи по ворклогам отбираются по updated
+    updated_from = (since or window_start).strftime(date_format)
+    jql_assignee = f'assignee = "{TARGET_USER}" AND updated >= "{updated_from}" ORDER BY key'
+    jql_worklog = f'worklogAuthor = "{TARGET_USER}" AND worklogDate >= "{start_date}"' \
+                  + (f' AND updated >= "{updated_from}"' if since else '') + ' ORDER BY key'
+
+    if since:
+        print(f"Задачи, обновлённые с {since.strftime('%d.%m.%Y')}")
 
     # Получаем задачи
     print("Поиск задач...", end="", flush=True)
-    assignee_issues = get_all_issues(jql_assignee)
+    assignee_issues, assignee_complete = get_all_issues(jira, jql_assignee, PAGE_SIZE, SEARCH_WORKERS)
     print(f"\rНайдено задач: {len(assignee_issues)}")  # Пробелы для затирания старого текста
 
     print("Поиск задач по ворклогам...", end="", flush=True)
-    worklog_issues = get_all_issues(jql_worklog)
+    worklog_issues, worklog_complete = get_all_issues(jira, jql_worklog, PAGE_SIZE, SEARCH_WORKERS)
     print(f"\rВ задач логал: {len(worklog_issues)}" + " " * 30)
 
-    # Объединяем и удаляем дубликаты
-    all_issues = assignee_issues + worklog_issues
-    unique_issues = {issue.key: issue for issue in all_issues}.values()
+    # Кэш другого сервера или логина не объединяется с новым
+    same_source = state.get('source') == source
+    tasks = load_dict(TASKS_FILE) if same_source else {}
+    updated = state.get('updated', {}) if same_source else {}
+    expired = merge_tasks(tasks, updated, assignee_issues + worklog_issues, window_start.isoformat())
 
     # Выводим результаты
-    print(f"Всего уникальных задач: {len(unique_issues)}")
+    print(f"Всего задач: {len(tasks)}" + (f", устарело: {expired}" if expired else ""))
 
-    TASKS = {}
-    tasks = {}
-    for idx, issue in enumerate(unique_issues, 1):
-        TASKS = {
-            issue.key: issue.fields.summary
-            for issue in unique_issues
-        }
-
-    save_commits(TASKS)
+    save_commits(tasks)
+    if assignee_complete and worklog_complete:
+        watermark = now.isoformat(timespec='seconds')
+    else:
+        # После неполной загрузки метка не сдвигается: пропущенное догрузится в следующий раз
+        watermark = state.get('watermark') if same_source else None
+    try:
+        save_json(SYNC_FILE, {'source': source, 'watermark': watermark, 'updated': updated})
+    except OSError as e:
+        print(f"Не удалось сохранить {SYNC_FILE}: {e}")
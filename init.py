@@ -1,29 +1,33 @@
-import configparser
 import os
 import questionary
-from configparser import ConfigParser
+from configparser import RawConfigParser
 from pathlib import Path
 
+from config import read_config
+
 # TODO Конфигурация дублируется, вынести в отдельный код
 LIT_DIR = os.path.join(os.path.expanduser("~"), ".lit")
-os.makedirs(LIT_DIR, exist_ok=True)
 COMMITS_FILE = os.path.join(LIT_DIR, "commits.json")
 CONFIG_FILE = os.path.join(LIT_DIR, ".litconfig")
 
-# Создаем конфиг-парсер с сохранением регистра
-config = configparser.RawConfigParser()
-config.optionxform = lambda option: option  # Отключаем авто-преобразование в lowercase
-config.read(CONFIG_FILE)
 
+def _update_section(config, section, values):
+    """Записывает ответы в секцию, не трогая остальные её ключи (push_workers, client и т.п.)"""
+    if not config.has_section(section):
+        config.add_section(section)
+    for key, value in values.items():
+        config.set(section, key, value)
 
-def init_config():
-    """Интерактивная настройка конфигурации"""
-    config = ConfigParser()
 
-    # Проверяем существующий конфиг для дефолтных значений
-    default = ConfigParser()
-    if Path(CONFIG_FILE).exists():
-        default.read(CONFIG_FILE)
+def init_config():
+    """
+    Интерактивная настройка конфигурации.
+    Секции и ключи, о которых init не спрашивает ([storage], [jira] push_workers и т.п.), сохраняются.
+    """
+    # Существующий конфиг: значения по умолчанию для вопросов и основа для записи
+    exists = Path(CONFIG_FILE).exists()
+    default = read_config(CONFIG_FILE) if exists else RawConfigParser()
+    config = read_config(CONFIG_FILE) if exists else RawConfigParser()
 
     # Секция [user]
     user_email = questionary.text(
@@ -48,11 +52,11 @@ def init_config():
         instruction="\n  [Команда или путь до текстового редактора для команды edit (не обязательно)]"
     ).ask()
 
-    config["user"] = {
+    _update_section(config, "user", {
         "login": user_login,
         "email": user_email,
         "editor": editor
-    }
+    })
 
     # Секция [jira]
     jira_login = questionary.text(
@@ -65,7 +69,7 @@ def init_config():
         default=default.get("jira", "pass", fallback="")
     ).ask()
 
-    config["jira"] = {
+    _update_section(config, "jira", {
         "login": jira_login,
         "email": questionary.text(
             "Jira email:",
@@ -80,7 +84,7 @@ def init_config():
             "Days to sync:",
             default=default.get("jira", "days", fallback="30")
         ).ask()
-    }
+    })
 
     # Секция [gitlab]
     gitlab_login = questionary.text(
@@ -97,7 +101,7 @@ def init_config():
     # Теперь используем полученный URL для формирования инструкции
     gitlab_token_instruction = f"\n  [Получить токен: {gitlab_url}/-/user_settings/personal_access_tokens]"
 
-    config["gitlab"] = {
+    _update_section(config, "gitlab", {
         "login": gitlab_login,
         "email": questionary.text(
             "GitLab email:",
@@ -113,9 +117,10 @@ def init_config():
             "Days to sync:",
             default=default.get("gitlab", "days", fallback="30")
         ).ask()
-    }
+    })
 
     # Сохраняем конфиг
+    os.makedirs(LIT_DIR, exist_ok=True)
     with open(CONFIG_FILE, "w") as f:
         config.write(f)
 
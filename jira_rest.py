@@ -0,0 +1,199 @@
+import json
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_PATH = "rest/api/2"
+# Соединений с сервером в пуле: хватает потокам push и параллельному поиску
+POOL_SIZE = 10
+
+
+class JiraError(Exception):
+    """
+    Ответ Jira с кодом ошибки. Поля те же, что у jira.exceptions.JIRAError,
+    поэтому ошибки обоих клиентов обрабатываются одинаково (см. connection.jira_errors).
+    """
+
+    def __init__(self, text=None, status_code=None, url=None, request=None, response=None):
+        super().__init__(text)
+        self.text = text
+        self.status_code = status_code
+        self.url = url
+        self.request = request
+        self.response = response
+
+    def __str__(self):
+        message = f"JiraError HTTP {self.status_code}"
+        if self.url:
+            message += f" url: {self.url}"
+        if self.text:
+            message += f"\n\ttext: {self.text}"
+        return message
+
+
+def _error_text(response) -> str:
+    """Текст ошибки из ответа Jira: errorMessages, errors или тело как есть"""
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text
+    if not isinstance(data, dict):
+        return response.text
+    messages = list(data.get('errorMessages') or [])
+    errors = data.get('errors')
+    if isinstance(errors, dict):
+        messages.extend(str(error) for error in errors.values())
+    if not messages and data.get('message'):
+        messages.append(data['message'])
+    return ', '.join(messages) or response.text
+
+
+def _to_object(value):
+    """JSON -> объекты с доступом через точку, как ресурсы jira (issue.fields.summary)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_object(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_object(item) for item in value]
+    return value
+
+
+class ResultList(list):
+    """Страница результатов поиска с total (или nextPageToken в Jira Cloud), как jira.client.ResultList"""
+
+    def __init__(self, items, start_at=0, max_results=0, total=None, next_page_token=None, is_last=None):
+        super().__init__(items)
+        self.startAt = start_at
+        self.maxResults = max_results
+        self.total = total if total is not None else len(self)
+        self.nextPageToken = next_page_token
+        self.isLast = is_last
+
+
+class _Session(requests.Session):
+    """Сессия с таймаутом по умолчанию: ответ с ошибкой -> JiraError, как у ResilientSession в jira"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        response = super().request(method, url, **kwargs)
+        if not response.ok:
+            raise JiraError(_error_text(response), response.status_code, response.url, response.request, response)
+        return response
+
+
+class RestClient:
+    """
+    Встроенный клиент Jira Server/Data Center и Cloud (REST API v2) для того немногого, что нужно lit:
+    поиск задач, ворклоги, myself и serverInfo.
+    Интерфейс - подмножество jira.JIRA, поэтому push и import_jira работают с любым из клиентов.
+    Импортируется быстро и держит один пул соединений. Конструктор делает запрос serverInfo
+    только при get_server_info=True, других запросов при создании нет.
+    Повторов нет: их делает push (pusher.py) по видам ошибок.
+    """
+
+    def __init__(self, server, basic_auth, timeout=20, verify=True, get_server_info=True, pool_size=POOL_SIZE):
+        self.server = server.rstrip('/')
+        self._version = (0, 0, 0)
+        self.deploymentType = None
+
+        self._session = _Session(timeout)
+        self._session.auth = basic_auth
+        self._session.verify = verify
+        self._session.headers.update({'Accept': 'application/json', 'Content-Type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        if get_server_info:
+            info = self.server_info()
+            self._version = tuple(info['versionNumbers'])
+            self.deploymentType = info.get('deploymentType')
+
+    def _get_url(self, path) -> str:
+        return f"{self.server}/{API_PATH}/{path}"
+
+    def _get_json(self, path, params=None):
+        return self._session.get(self._get_url(path), params=params).json()
+
+    def server_info(self) -> dict:
+        return self._get_json('serverInfo')
+
+    def myself(self) -> dict:
+        return self._get_json('myself')
+
+    def current_user(self, field=None) -> str:
+        """accountId (Cloud) или name текущего пользователя, как JIRA.current_user"""
+        if not hasattr(self, '_myself'):
+            self._myself = self.myself()
+        if field is None:
+            field = 'accountId' if self.deploymentType == 'Cloud' else 'name'
+        return self._myself[field]
+
+    def search_issues(self, jql_str, startAt=0, maxResults=50, validate_query=True, fields=None):
+        """
+        Одна страница поиска по JQL, задачи с полями fields (строка через запятую или список).
+        В Jira Cloud поиск search со startAt отключён: первая страница берётся из search/jql,
+        как в JIRA.search_issues, следующие - через enhanced_search_issues.
+        """
+        if self.deploymentType == 'Cloud':
+            if startAt:
+                raise JiraError("В Jira Cloud нет поиска со startAt, страницы читаются по nextPageToken")
+            return self.enhanced_search_issues(jql_str, maxResults=maxResults, fields=fields)
+        params = {'jql': jql_str, 'startAt': startAt, 'maxResults': maxResults,
+                  'validateQuery': 'true' if validate_query else 'false'}
+        if fields:
+            params['fields'] = fields if isinstance(fields, str) else ','.join(fields)
+        data = self._get_json('search', params)
+        return ResultList([_to_object(issue) for issue in data.get('issues', [])],
+                          data.get('startAt', startAt), data.get('maxResults', maxResults), data.get('total'))
+
+    def enhanced_search_issues(self, jql_str, nextPageToken=None, maxResults=50, fields=None):
+        """Страница поиска Jira Cloud (search/jql): без total, следующая страница - по nextPageToken"""
+        params = {'jql': jql_str, 'maxResults': maxResults}
+        if fields:
+            params['fields'] = fields if isinstance(fields, str) else ','.join(fields)
+        if nextPageToken:
+            params['nextPageToken'] = nextPageToken
+        data = self._get_json('search/jql', params)
+        return ResultList([_to_object(issue) for issue in data.get('issues', [])], 0, maxResults,
+                          next_page_token=data.get('nextPageToken'), is_last=data.get('isLast'))
+
+    def add_worklog(self, issue, timeSpent=None, comment=None, started=None) -> str:
+        """Создаёт ворклог и возвращает его id"""
+        data = {}
+        if timeSpent is not None:
+            data['timeSpent'] = timeSpent
+        if comment is not None:
+            data['comment'] = comment
+        if started is not None:
+            # Формат как в JIRA.add_worklog: "2014-06-03T08:21:01.000+0000"
+            data['started'] = started.strftime("%Y-%m-%dT%H:%M:%S.000") + (started.strftime("%z") or "+0000")
+        response = self._session.post(self._get_url(f"issue/{issue}/worklog"), data=json.dumps(data))
+        return str(response.json()['id'])
+
+    def worklogs(self, issue, startedAfter=None, startedBefore=None) -> list:
+        """
+        Все ворклоги задачи, страница за страницей. startedAfter/startedBefore - границы начала
+        ворклога в миллисекундах от эпохи: Jira Cloud отдаёт только ворклоги в этом промежутке.
+        """
+        period = {}
+        if startedAfter is not None:
+            period['startedAfter'] = startedAfter
+        if startedBefore is not None:
+            period['startedBefore'] = startedBefore
+        worklogs, start_at = [], 0
+        while True:
+            data = self._get_json(f"issue/{issue}/worklog", {'startAt': start_at, **period})
+            page = data.get('worklogs', [])
+            worklogs.extend(_to_object(worklog) for worklog in page)
+            start = data.get('startAt', start_at)
+            if not page or start + data.get('maxResults', len(page)) >= data.get('total', 0):
+                return worklogs
+            start_at = start + len(page)
+
+    def close(self):
+        self._session.close()
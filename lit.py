@@ -1,46 +1,153 @@
 import configparser
 import os
 import argparse
+import bisect
+import itertools
 import shlex
 import re
 import subprocess
-import tomllib
-from datetime import datetime, timedelta, time as dt_time
+import sys
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta, time as dt_time
+from operator import attrgetter
 from pathlib import Path
-from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import Completer, Completion
-from prompt_toolkit.patch_stdout import patch_stdout
-from init import init_config
-from parser import pars_store
-from import_jira import load_tasks_from_jira
-from import_gitlab import load_commits_from_gitlab
-from push import add_worklog, jira_connect
-from utils import sort_key, load_dict, safe_split
+import storage
+from models import MAX_ORDINAL
+from parser import ParseCache, history_line, pars_line, pars_store, pars_store_iter
+from pusher import DEFAULT_WORKERS, UNAUTHORIZED, PushJournal, build_payloads, group_by_issue, push_concurrently
+from backends import SqliteBackend, TextBackend
+from shards import ShardedStore
+from utils import safe_split, LazyDict
+from storage import file_stat, read_lines_from, write_lines
 
 #TODO Конфигурация дублируется, вынести в отдельный код
 LIT_DIR = os.path.join(os.path.expanduser("~"), ".lit")
-os.makedirs(LIT_DIR, exist_ok=True)
 LIT_STORE = os.path.join(LIT_DIR, ".litstore")
 LIT_HISTORY = os.path.join(LIT_DIR, ".lithistory")
+LIT_SHARDS_DIR = os.path.join(LIT_DIR, "store")
+LIT_DB = os.path.join(LIT_DIR, "lit.db")
+LIT_PUSH_JOURNAL = os.path.join(LIT_DIR, ".litpush.journal")
+LIT_AMEND_FILE = os.path.join(LIT_DIR, "amend.lithistory")
 COMMITS_FILE = os.path.join(LIT_DIR, "commits.json")
 TASKS_FILE = os.path.join(LIT_DIR, "tasks.json")
 CONFIG_FILE = os.path.join(LIT_DIR, ".litconfig")
 
-COMMITS = load_dict(COMMITS_FILE)
-TASKS = load_dict(TASKS_FILE)
+# Справочники читаются только когда нужны команде и живут до конца сессии
+COMMITS = LazyDict(COMMITS_FILE)
+TASKS = LazyDict(TASKS_FILE)
 CUSTOM_EDITOR = ''
+PUSH_WORKERS = DEFAULT_WORKERS
+
+# Пометки записей, которые push не отправил
+ALREADY_PUSHED = 'Уже отправлено в Jira (есть в истории)'
+DUPLICATE_IN_BATCH = 'Повтор записи выше, отправлена одна'
+ISSUE_NOT_FOUND = 'Задача не найдена в Jira или нет доступа'
+ALREADY_IN_JIRA = 'Уже есть в Jira (ворклог с той же датой, началом и длительностью)'
+
+# Интеграции (jira, bs4, requests, tzlocal) и prompt_toolkit тяжело импортируются,
+# а add/status/edit в них не нуждаются. Поэтому модули подгружаются при первом вызове.
+def PromptSession(*args, **kwargs):
+    from prompt_toolkit import PromptSession
+    return PromptSession(*args, **kwargs)
+
+
+def patch_stdout(*args, **kwargs):
+    from prompt_toolkit.patch_stdout import patch_stdout
+    return patch_stdout(*args, **kwargs)
+
+
+def init_config():
+    from init import init_config
+    return init_config()
+
+
+def load_tasks_from_jira():
+    from import_jira import load_tasks_from_jira
+    return load_tasks_from_jira()
+
+
+def load_commits_from_gitlab():
+    from import_gitlab import load_commits_from_gitlab
+    return load_commits_from_gitlab()
+
+
+def jira_connect():
+    from push import jira_connect
+    return jira_connect()
+
+
+def jira_recheck(*args, **kwargs):
+    from push import jira_recheck
+    return jira_recheck(*args, **kwargs)
+
+
+def send_worklog(*args, **kwargs):
+    from push import send_worklog
+    return send_worklog(*args, **kwargs)
+
+
+def update_worklog(*args, **kwargs):
+    from push import update_worklog
+    return update_worklog(*args, **kwargs)
+
+
+def delete_worklog(*args, **kwargs):
+    from push import delete_worklog
+    return delete_worklog(*args, **kwargs)
+
+
+def plan_calls(*args, **kwargs):
+    from push import plan_calls
+    return plan_calls(*args, **kwargs)
+
+
+def find_missing_issues(*args, **kwargs):
+    from push import find_missing_issues
+    return find_missing_issues(*args, **kwargs)
+
+
+def fetch_user_worklogs(*args, **kwargs):
+    from push import fetch_user_worklogs
+    return fetch_user_worklogs(*args, **kwargs)
+
 
 def load_config():
-    global GITLAB_URL, CUSTOM_EDITOR
+    global GITLAB_URL, CUSTOM_EDITOR, PUSH_WORKERS
     # Создаем конфиг-парсер с сохранением регистра
     config = configparser.RawConfigParser()
     config.optionxform = lambda option: option  # Отключаем авто-преобразование в lowercase
     config.read(CONFIG_FILE)
 
     CUSTOM_EDITOR = config.get('user', 'editor', fallback='')
+    # Сколько задач отправлять в Jira одновременно (записи одной задачи всегда идут по очереди)
+    PUSH_WORKERS = config.getint('jira', 'push_workers', fallback=DEFAULT_WORKERS)
+
+def parse_date_arg(value):
+    """Дата из аргумента командной строки в формате дд.мм.гггг"""
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Неверный формат даты: {value}. Ожидается дд.мм.гггг")
+
+
+def parse_regex_arg(value):
+    """Регулярное выражение из аргумента командной строки, без учёта регистра"""
+    try:
+        return re.compile(value, re.IGNORECASE)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"Неверное регулярное выражение: {value} ({e})")
+
+
+class WorklogCompleter:
+    """Автодополнение интерактивного режима.
 
-class WorklogCompleter(Completer):
+    Не наследуется от prompt_toolkit.Completer, чтобы модуль не тянул prompt_toolkit
+    при импорте. Для PromptSession оборачивается в make_completer().
+    """
     def get_completions(self, document, complete_event):
+        from prompt_toolkit.completion import Completion
+
         text = safe_split(document.text_before_cursor)
         add_arg_params = {
             '-d': 'Дата (дд.мм.гггг)',
@@ -51,7 +158,7 @@ class WorklogCompleter(Completer):
         if len(text) <= 1 and not document.text_before_cursor.endswith(" "):
             current_input_part = text[0] if text else ''
             current_input = current_input_part.lower()
-            for cmd in ['add', 'status', 'push', 'pull', 'edit', 'init']:
+            for cmd in ['add', 'status', 'push', 'history', 'amend', 'revert', 'pull', 'edit', 'init', 'store']:
                 if cmd.startswith(current_input):
                     yield Completion(
                         cmd,
@@ -131,6 +238,12 @@ class WorklogCompleter(Completer):
                 for key in ['--jira', '--gitlab']:
                     yield Completion(key, start_position=0)
 
+        # Автодополнение для команды store
+        if text[0] == 'store':
+            if len(text) == 1:
+                for key in ['--export', '--import', '--migrate']:
+                    yield Completion(key, start_position=0)
+
         # Другие команды (status, push) не требуют автодополнения
         return
 
@@ -138,31 +251,124 @@ class WorklogManager:
     def __init__(self):
         self.entries = []
         self.history = []
+        self._parse_cache = None
+        # Фоновый push (push --bg) и команды интерактивного режима работают с одними записями
+        self._lock = threading.RLock()
+        self._push_job = None
+        self.backend = self._make_backend()
         self._load()
 
+    @staticmethod
+    def _stored_layouts() -> list:
+        """Раскладки, в которые записи уже перенесены: их данные лежат в ~/.lit независимо от настройки"""
+        stored = []
+        if os.path.exists(os.path.join(LIT_SHARDS_DIR, 'manifest.json')):
+            stored.append('monthly')
+        if os.path.exists(LIT_DB):
+            stored.append('sqlite')
+        return stored
+
+    @staticmethod
+    def _make_backend(migrate=False):
+        """
+        Хранилище записей по настройке [storage] layout.
+        Файлы переносятся в новую раскладку только по lit store --migrate (migrate=True),
+        до этого записи читаются из плоского .litstore.
+        Если записи уже перенесены в другую раскладку, используется она: плоские файлы
+        после миграции переименованы, и без неё записи и история пропали бы из lit.
+        """
+        storage.ensure_config()
+        layout = storage.LAYOUT
+        stored = WorklogManager._stored_layouts()
+        if stored and layout not in stored:
+            print(f"⚠️ В .litconfig [storage] layout = {layout}, но записи хранятся в раскладке '{stored[0]}', "
+                  f"используется она. Укажите layout = {stored[0]}")
+            layout = stored[0]
+
+        if layout == 'monthly':
+            backend, sources = ShardedStore(LIT_SHARDS_DIR, LIT_HISTORY), (LIT_STORE,)
+        elif layout == 'sqlite':
+            backend, sources = SqliteBackend(LIT_DB), (LIT_STORE, LIT_HISTORY)
+        else:
+            return TextBackend(LIT_STORE, LIT_HISTORY)
+
+        if backend.needs_migration(*sources):
+            if not migrate:
+                print(f"⚠️ Раскладка '{layout}' ещё не применена, записи читаются из {LIT_STORE}. "
+                      f"Перенести их: lit store --migrate")
+                return TextBackend(LIT_STORE, LIT_HISTORY)
+            backend.migrate(*sources)
+        return backend
+
+    def _line_key(self, line):
+        """Порядок записей в памяти: дата и время начала (строки берутся из кэша разбора)"""
+        entry = self._get_parse_cache().entry(line)
+        return entry.date_ord, entry.start_min
+
+    def _set_entries(self, lines):
+        """Заменяет записи в памяти, упорядочивая их по дате и времени начала"""
+        parsed = self._get_parse_cache().parse(lines)
+        order = sorted(range(len(lines)), key=lambda i: (parsed[i].date_ord, parsed[i].start_min))
+        self.entries = [lines[i] for i in order]
+
+    def _insert_entries(self, lines):
+        """Вставка новых строк бинарным поиском без пересортировки всего списка"""
+        for line in lines:
+            bisect.insort(self.entries, line, key=self._line_key)
+
     def _load(self):
-        if os.path.exists(LIT_STORE):
-            try:
-                with open(LIT_STORE, 'r', encoding='utf-8') as f:
-                    self.entries = [line.strip() for line in f.readlines() if line.strip()]
-            except Exception as e:
-                print(f"Ошибка при загрузке: {e}")
+        try:
+            with self._lock:
+                self._set_entries(self.backend.load())
+        except Exception as e:
+            print(f"Ошибка при загрузке: {e}")
+
+    def _append(self, entry):
+        """Быстрая запись новой строки без перезаписи хранилища"""
+        try:
+            with self._lock:
+                extra = self.backend.append([entry])
+                if extra is None:
+                    # Хранилище переписали извне (например, в редакторе) - перечитываем целиком
+                    self._load()
+                else:
+                    self._insert_entries(extra + [entry])
+        except Exception as e:
+            print(f"Ошибка при сохранении: {e}")
 
     def _save(self):
+        """Полная перезапись хранилища. Нужна только когда меняются существующие строки (push)."""
         try:
-            with open(LIT_STORE, 'w', encoding='utf-8') as f:
-                f.write("\n".join(self.entries) + "\n")  # Добавить + "\n"
+            with self._lock:
+                self._set_entries(self.backend.save(self.entries))
             # print("Файл успешно сохранён.")
+            return True
         except Exception as e:
             print(f"Ошибка при сохранении: {e}")
+            return False
+
+    def _get_parse_cache(self):
+        if self._parse_cache is None:
+            self._parse_cache = ParseCache()
+        return self._parse_cache
+
+    def parsed(self):
+        """Разобранные записи. Через кэш разбора: заново разбираются только новые и изменённые строки."""
+        with self._lock:
+            cache = self._get_parse_cache()
+            # Состояние файла хранилище отдаёт только если self.entries совпадают с ним
+            entries = cache.parse(self.entries, self.backend.stat())
+        return entries
 
     def _history(self):
         try:
-            with open(LIT_HISTORY, 'a', encoding='utf-8') as f:
-                f.write("\n".join(self.history) + "\n")  # Добавить + "\n"
+            with self._lock:
+                self.backend.append_history(self.history)
             # print("Файл успешно сохранён.")
+            return True
         except Exception as e:
             print(f"Ошибка при сохранении: {e}")
+            return False
 
     def add_entry(self, args):
         if isinstance(args, dict):  # Если аргументы пришли из CLI
@@ -231,87 +437,399 @@ class WorklogManager:
                 f"{formatted_date} [{start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}] "
                 f"{opts.code} {opts.hours} `{message}`"
             )
-            self.entries.append(entry)
-            self._save()
+            self._append(entry)
 
         except Exception as e:
             print(f"⛔ Ошибка: {str(e)}")
 
-    def show_status(self):
+    def show_status(self, args=None):
+        if isinstance(args, dict):  # Если аргументы пришли из CLI
+            opts = argparse.Namespace(**args)
+        elif args:  # Если из интерактивного режима
+            parser = argparse.ArgumentParser(prog='lit status', exit_on_error=False)
+            self._configure_status_parser(parser)
+            try:
+                opts = parser.parse_args(args)
+            except (SystemExit, argparse.ArgumentError) as e:
+                if isinstance(e, argparse.ArgumentError):
+                    print(f"⛔ Ошибка: {e}")
+                return
+        else:
+            opts = argparse.Namespace(date_from=None, date_to=None)
+
         if not self.entries:
             print("Нет подготовленных записей.")
             return
 
-        store_dist = pars_store(self.entries)
+        # Записи в памяти уже упорядочены по дате и времени, сортировка не нужна
+        sorted_data = self.parsed()
+        if opts.date_from or opts.date_to:
+            sorted_data = self._date_range(sorted_data, opts.date_from, opts.date_to)
+            if not sorted_data:
+                print("Нет записей за выбранный период.")
+                return
+
+        self._print_entries(sorted_data)
 
-        sorted_data = sorted(store_dist, key=sort_key)
+        if self.backend.archived_count():
+            print(f"\nВ прошлых месяцах без отправляемых записей ещё строк: "
+                  f"{self.backend.archived_count()} (см. lit edit)")
 
+    @staticmethod
+    def _print_entries(sorted_data):
+        """Записи к отправке и отключённые записи с группировкой по датам"""
         print("\nПодготовленные записи:")
 
         current_date = None
         for entry in sorted_data:
-            if entry['disabled'] is None:
-                date_part = entry['date']
+            if entry.disabled is None:
+                date_part = entry.date
 
                 # Проверяем изменилась ли дата
                 if date_part != current_date:
                     print(f"\n{date_part}")
                     current_date = date_part
 
-                print(f"  {entry['log'].split(date_part)[1].strip('\n')}")
+                print(f"  {entry.log.split(date_part)[1].strip('\n')}")
 
         print("\nНе будут оправляться:")
 
         current_date = None
         for entry in sorted_data:
-            if entry['disabled'] is not None:
-                date_part = entry['date']
+            if entry.disabled is not None:
+                if entry.date is None:
+                    # Строка не разобрана, показываем как есть
+                    print(f"  {entry.log}")
+                    continue
+
+                date_part = entry.date
 
                 # Проверяем изменилась ли дата
                 if date_part != current_date:
                     print(f"\n{date_part}")
                     current_date = date_part
 
-                print(f"  {entry['log'].split(date_part)[1].strip('\n')}")
+                print(f"  {entry.log.split(date_part)[1].strip('\n')}")
+
+    @staticmethod
+    def _date_bounds(entries, date_from=None, date_to=None):
+        """Границы [lo, hi) упорядоченных записей за период [date_from, date_to] бинарным поиском"""
+        key = attrgetter('date_ord')
+        lo = bisect.bisect_left(entries, date_from.toordinal(), key=key) if date_from else 0
+        # Строки без корректной даты лежат в конце и в период не попадают
+        hi = bisect.bisect_left(entries, MAX_ORDINAL, lo=lo, key=key)
+        if date_to:
+            hi = bisect.bisect_right(entries, date_to.toordinal(), lo=lo, hi=hi, key=key)
+        return lo, hi
+
+    @classmethod
+    def _date_range(cls, entries, date_from=None, date_to=None):
+        """Срез упорядоченных записей за период [date_from, date_to]"""
+        lo, hi = cls._date_bounds(entries, date_from, date_to)
+        return entries[lo:hi]
+
+    @classmethod
+    def _select(cls, entries, opts) -> list:
+        """Позиции записей к отправке, подходящих под фильтры push (--from/--to/--code/--grep)"""
+        lo, hi = cls._date_bounds(entries, opts.date_from, opts.date_to)
+        if not (opts.date_from or opts.date_to):
+            hi = len(entries)  # Без периода строки без корректной даты тоже проверяются
+        return [index for index in range(lo, hi)
+                if not entries[index].disabled
+                and (not opts.code or entries[index].code.upper() == opts.code)
+                and (not opts.grep or opts.grep.search(entries[index].message))]
+
+    def _resume_push(self, journal):
+        """
+        Учитывает записи, которые прерванный push уже отправил в Jira:
+        убирает их из хранилища и дописывает в историю без повторной отправки.
+        """
+        acked = [(line, id) for line, id, err in journal.read() if id]
+        if acked:
+            print(f"⚠️ Предыдущая отправка была прервана. Уже отправлено в Jira записей: {len(acked)}, "
+                  f"повторно они не отправятся")
+            remaining = Counter(line for line, id in acked)
+            entries = []
+            for line in self.entries:
+                if remaining[line] > 0:
+                    remaining[line] -= 1
+                else:
+                    entries.append(line)
+
+            # Историю могли успеть дописать до сбоя
+            known = set(self.backend.read_history())
+            self.entries = entries
+            self.history = [line for line in (history_line(line, id) for line, id in acked) if line not in known]
+            if not (self._save() and self._history()):
+                return
+        journal.remove()
+
+    def push_entries(self, args=None):
+        if isinstance(args, dict):  # Если аргументы пришли из CLI
+            opts = argparse.Namespace(**args)
+        else:  # Если из интерактивного режима
+            parser = argparse.ArgumentParser(prog='lit push', exit_on_error=False)
+            self._configure_push_parser(parser)
+            # Фоновая отправка есть только в интерактивном режиме: из CLI процесс завершился бы раньше
+            parser.add_argument('--bg', action='store_true',
+                                help='Отправлять в фоне, не блокируя ввод команд')
+            try:
+                opts = parser.parse_args(args or [])
+            except (SystemExit, argparse.ArgumentError) as e:
+                if isinstance(e, argparse.ArgumentError):
+                    print(f"⛔ Ошибка: {e}")
+                return
+
+        if self.push_running():
+            print("⛔ Предыдущая отправка ещё идёт в фоне.")
+            return
+
+        if opts.plan:
+            entries = self.parsed()
+            self._print_plan(entries, self._select(entries, opts), opts)
+            return
+
+        journal = PushJournal(LIT_PUSH_JOURNAL)
+        if journal.exists():
+            self._resume_push(journal)
 
-    def push_entries(self):
         if not self.entries:
             print("Нет записей для отправки.")
             return
 
-        self.show_status()
+        with self._lock:
+            snapshot = list(self.entries)
+            entries = self.parsed()
+        filtered = any((opts.date_from, opts.date_to, opts.code, opts.grep))
+        # Невыбранные записи остаются в хранилище как есть
+        selected = self._select(entries, opts)
+        if filtered:
+            if not selected:
+                print("Нет записей для отправки по заданным условиям.")
+                return
+            self._print_entries([entries[index] for index in selected])
+        else:
+            self.show_status()
         session = PromptSession()
         confirm = session.prompt("\nВы уверены что хотите отправить эти записи? [y/N]: ").strip().lower()
 
-        if confirm == 'y':
-            print("\nОтправка записей в Jira...")
-
-            store_dist = pars_store(self.entries)
+        if confirm != 'y':
+            print("Отмена отправки.")
+            return
 
-            errors = []
-            saved = []
+        load_config()
+        jira = jira_connect()
+        if getattr(opts, 'bg', False):
+            # Запросы к Jira идут в фоне, вывод попадает над приглашением через patch_stdout
+            print("\nОтправка записей в Jira в фоне, можно продолжать работу...")
+            self._push_job = threading.Thread(
+                target=self._send_in_background, args=(jira, snapshot, entries, selected, opts, journal),
+                name='lit-push-bg', daemon=True
+            )
+            self._push_job.start()
+        else:
+            print("\nОтправка записей в Jira...")
+            self._send_entries(jira, snapshot, entries, selected, opts, journal)
+
+    def _find_duplicates(self, entries, selected) -> dict:
+        """
+        Позиции записей, которые уже есть в истории или повторяются в этой отправке, с причиной пропуска:
+        в Jira они не уходят. Одинаковые строки разбираются в один и тот же объект, поэтому помечаются позиции.
+        """
+        seen = set()
+        skip = {}
+        with self._lock:
+            pushed = self.backend.pushed_hashes()
+            for index in selected:
+                log = entries[index]
+                if log.content_hash in pushed:
+                    skip[index] = ALREADY_PUSHED
+                elif log.content_hash in seen:
+                    skip[index] = DUPLICATE_IN_BATCH
+                seen.add(log.content_hash)
+        return skip
 
-            jira = jira_connect()
+    @staticmethod
+    def _print_duplicates(skip):
+        """Итог _find_duplicates: сколько записей пропущено по каждой причине"""
+        reasons = Counter(skip.values())
+        if reasons[ALREADY_PUSHED]:
+            print(f"Пропущено уже отправленных записей: {reasons[ALREADY_PUSHED]}")
+        if reasons[DUPLICATE_IN_BATCH]:
+            print(f"Пропущено повторов в этой отправке: {reasons[DUPLICATE_IN_BATCH]}")
 
-            for log in store_dist:
-                if not log['disabled']:
-                    message = log['message'].replace("\\n", '\n')
-                    id, err = add_worklog(jira, log['code'], log['duration'], message, log['date'], log['start'])
-                    if not id:
-                        errors.append(f'# {log['log'].strip('\n')} # {err}')
-                    else:
-                        saved.append(f'{log['log'].strip('\n')} # {id}')
+    @staticmethod
+    def _validate_codes(jira, codes):
+        """
+        Коды задач, которых нет в Jira (см. push.find_missing_issues), и клиент для дальнейшей отправки.
+        После 401 у клиента, созданного по кэшу проверки подключения, подключение проверяется вживую
+        и поиск повторяется. Ошибки авторизации и сети пробрасываются.
+        """
+        try:
+            return jira, find_missing_issues(jira, codes) or set()
+        except Exception as e:
+            checked = jira_recheck(jira) if getattr(e, 'status_code', None) == 401 else None
+            if checked is None:
+                raise
+        return checked, find_missing_issues(checked, codes) or set()
+
+    def _print_plan(self, entries, selected, opts):
+        """push --plan: тела запросов и число HTTP-запросов без обращения к Jira"""
+        skip = self._find_duplicates(entries, selected)
+        to_send = [entries[index] for index in selected if index not in skip]
+        payloads = build_payloads(to_send)
+        codes = {payload.code for payload in payloads}
+
+        print("\nПлан отправки:")
+        for indices in group_by_issue(payloads):
+            print(f"\n{payloads[indices[0]].code}: ворклогов {len(indices)}")
+            for index in indices:
+                payload = payloads[index]
+                started = payload.started.isoformat() if payload.started else 'неверные дата или время'
+                print(f"  {started} {payload.time_spent} `{to_send[index].message}`")
+
+        invalid = sum(payload.started is None for payload in payloads)
+        print(f"\nЗаписей к отправке: {len(payloads) - invalid}, задач: {len(codes)}")
+        if invalid:
+            print(f"Не будут отправлены из-за неверной даты или времени: {invalid}")
+        self._print_duplicates(skip)
+        calls = plan_calls(codes, payloads, opts.reconcile)
+        stages = {'connect': 'подключение', 'validate': 'проверка задач', 'reconcile': 'ворклоги в Jira',
+                  'worklogs': 'отправка'}
+        details = ', '.join(f"{stages[stage]} {count}" for stage, count in calls.items())
+        print(f"HTTP-запросов: {sum(calls.values())} ({details}), без учёта повторов после временных ошибок")
+        if PushJournal(LIT_PUSH_JOURNAL).exists():
+            print("⚠️ Есть журнал прерванной отправки: подтверждённые в нём записи push перенесёт в историю")
+
+    def _send_in_background(self, *args):
+        try:
+            self._send_entries(*args, background=True)
+        except Exception as e:
+            # Неотправленное останется в хранилище, отправленное - в журнале
+            print(f"Ошибка фоновой отправки: {e}")
+
+    def push_running(self) -> bool:
+        """Идёт ли фоновая отправка (push --bg)"""
+        return self._push_job is not None and self._push_job.is_alive()
+
+    def wait_push(self):
+        """Дожидается фоновой отправки перед выходом из интерактивного режима"""
+        if self.push_running():
+            print("Ожидание завершения фоновой отправки...")
+            self._push_job.join()
+
+    def _send_entries(self, jira, snapshot, entries, selected, opts, journal, background=False):
+        """
+        Отправка выбранных записей и обновление хранилища.
+        snapshot - строки хранилища, по которым разобраны entries: всё, что добавили
+        за время отправки (add в интерактивном режиме), сохраняется после результатов push.
+        """
+        errors = []
+        saved = []
+
+        skip = self._find_duplicates(entries, selected)
+        duplicates = dict(skip)
+
+        # Коды задач проверяются заранее одним поиском, а не ошибкой 404 на каждую запись
+        codes = {entries[index].code for index in selected if index not in skip}
+        try:
+            jira, missing = self._validate_codes(jira, codes)
+        except Exception as e:
+            # Ошибка авторизации или сети: записи не отправлены, хранилище не меняется
+            print(f"⛔ Отправка отменена, нет доступа к Jira: {e}")
+            return
+        if missing:
+            print(f"⚠️ Задачи не найдены в Jira или нет доступа: {', '.join(sorted(missing))}")
+        for index in selected:
+            if index not in skip and entries[index].code in missing:
+                skip[index] = ISSUE_NOT_FOUND
+
+        # Ворклоги, внесённые в Jira вручную, сверяются по дате, началу и длительности
+        reconciled = 0
+        if opts.reconcile:
+            pending = [index for index in selected if index not in skip]
+            days = [entries[index].date_ord for index in pending if entries[index].date_ord != MAX_ORDINAL]
+            existing = fetch_user_worklogs(jira, {entries[index].code for index in pending},
+                                           date.fromordinal(min(days)) if days else None,
+                                           date.fromordinal(max(days)) if days else None, workers=PUSH_WORKERS)
+            for index in pending:
+                log = entries[index]
+                key = (log.code.upper(), log.date, log.start, log.minutes)
+                if existing[key] > 0:
+                    existing[key] -= 1
+                    skip[index] = ALREADY_IN_JIRA
+                    reconciled += 1
+
+        to_send = [entries[index] for index in selected if index not in skip]
+        # Тела запросов собираются заранее, потоки отправки только передают их в Jira
+        payloads = build_payloads(to_send)
+        selected = set(selected)
+
+        done = itertools.count(1)
+
+        def on_result(index, result):
+            # Каждый ответ Jira сразу попадает в журнал, чтобы прерванный push можно было продолжить
+            journal.record(to_send[index].log, result[0], result[1])
+            if background:
+                log = to_send[index]
+                status = 'отправлено' if result[0] else f'ошибка: {result[1]}'
+                print(f"  [{next(done)}/{len(to_send)}] {log.code} {log.date} {log.start}: {status}")
+
+        journal.open()
+        try:
+            results = push_concurrently(payloads, lambda payload: send_worklog(jira, payload), PUSH_WORKERS,
+                                        on_result=on_result)
+        finally:
+            journal.close()
+        if any(getattr(err, 'kind', None) == UNAUTHORIZED for worklog_id, err, attempts in results) \
+                and jira_recheck(jira) is None:
+            # Подтверждённые ответы остались в журнале, их перенесёт в историю следующий push
+            print("⛔ Jira не принимает логин и пароль из .litconfig, отправка прервана, хранилище не изменено.")
+            return
+        # Ответы приходят в порядке записей, поэтому saved/errors и .lithistory не зависят от потоков
+        results = iter(results)
+
+        retried = 0
+        untouched = 0
+        for index, log in enumerate(entries):
+            if index not in selected:
+                if not log.disabled:
+                    untouched += 1
+                errors.append(f'{log.log.strip('\n')}')
+            elif index in skip:
+                print(f"  {log.code} {log.date} {log.start}: пропущено - {skip[index]}")
+                errors.append(f'# {log.log.strip('\n')} # {skip[index]}')
+            else:
+                worklog_id, err, attempts = next(results)
+                if attempts > 1:
+                    retried += 1
+                    print(f"  {log.code} {log.date} {log.start}: попыток {attempts}")
+                if not worklog_id:
+                    if attempts > 1:
+                        err = f"{err} (попыток: {attempts})"
+                    errors.append(f'# {log.log.strip('\n')} # {err}')
                 else:
-                    errors.append(f'{log['log'].strip('\n')}')
+                    saved.append(history_line(log.log.strip('\n'), worklog_id))
 
-            self.entries = errors
+        with self._lock:
+            # Строки, добавленные во время отправки, в snapshot не было - их сохраняем как есть
+            added = Counter(self.entries)
+            added.subtract(snapshot)
+            self.entries = errors + list((+added).elements())
             self.history = saved
-            self._save()
-            self._history()
-            print(f"Записей успешно отправлено: {len(saved)}")
-            print(f"Записей неотправленных записей: {len(errors)}")
-        else:
-            print("Отмена отправки.")
+            if self._save() and self._history():
+                journal.remove()
+        if background:
+            print("\nФоновая отправка завершена.")
+        print(f"Записей успешно отправлено: {len(saved)}")
+        self._print_duplicates(duplicates)
+        if reconciled:
+            print(f"Пропущено записей, которые уже есть в Jira: {reconciled}")
+        if retried:
+            print(f"Записей с повторными попытками после временных ошибок: {retried}")
+        if untouched:
+            print(f"Оставлено без изменений (не выбрано фильтром): {untouched}")
+        print(f"Записей неотправленных записей: {len(errors) - untouched}")
 
     @staticmethod
     def _configure_add_parser(parser):
@@ -326,32 +844,303 @@ class WorklogManager:
                             default=datetime.now().strftime('%H:%M'),
                             help='Время (чч:мм)')
 
-    def edit_entries(self):
-        """Открыть файл .litstore в редакторе"""
+    @staticmethod
+    def _configure_status_parser(parser):
+        """Настройка парсера для команды status."""
+        parser.add_argument('--from', dest='date_from', type=parse_date_arg,
+                            help='Показать записи начиная с даты (дд.мм.гггг)')
+        parser.add_argument('--to', dest='date_to', type=parse_date_arg,
+                            help='Показать записи по дату включительно (дд.мм.гггг)')
+
+    @staticmethod
+    def _configure_push_parser(parser):
+        """Настройка парсера для команды push."""
+        parser.add_argument('--plan', action='store_true',
+                            help='Показать запросы и их число без отправки')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Сверить записи с ворклогами, которые уже есть в Jira, и не отправлять совпадающие')
+        parser.add_argument('--from', dest='date_from', type=parse_date_arg,
+                            help='Отправить записи начиная с даты (дд.мм.гггг)')
+        parser.add_argument('--to', dest='date_to', type=parse_date_arg,
+                            help='Отправить записи по дату включительно (дд.мм.гггг)')
+        parser.add_argument('-c', '--code', type=str.upper, help='Отправить записи только этой задачи')
+        parser.add_argument('-g', '--grep', metavar='REGEX', type=parse_regex_arg,
+                            help='Отправить записи, сообщение которых подходит под регулярное выражение')
+
+    @staticmethod
+    def _configure_history_parser(parser):
+        """Настройка парсера для команды history."""
+        parser.add_argument('-c', '--code', type=str.upper, help='Код задачи (например, TASK-123)')
+        WorklogManager._configure_status_parser(parser)
+
+    @staticmethod
+    def _configure_amend_parser(parser):
+        """Настройка парсера для команд amend и revert."""
+        WorklogManager._configure_history_parser(parser)
+        parser.add_argument('-g', '--grep', metavar='REGEX', type=parse_regex_arg,
+                            help='Только записи, сообщение которых подходит под регулярное выражение')
+
+    @staticmethod
+    def _configure_store_parser(parser):
+        """Настройка парсера для команды store."""
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--export', dest='export_dir', metavar='DIR',
+                           help='Выгрузить записи и историю в .litstore и .lithistory в директории DIR')
+        group.add_argument('--import', dest='import_dir', metavar='DIR',
+                           help='Заменить записи и историю содержимым .litstore и .lithistory из DIR')
+        group.add_argument('--migrate', action='store_true',
+                           help='Перенести записи в раскладку из настройки [storage] layout')
+
+    def show_history(self, args=None):
+        """Отправленные записи по коду задачи и периоду"""
+        if isinstance(args, dict):  # Если аргументы пришли из CLI
+            opts = argparse.Namespace(**args)
+        else:  # Если из интерактивного режима
+            parser = argparse.ArgumentParser(prog='lit history', exit_on_error=False)
+            self._configure_history_parser(parser)
+            try:
+                opts = parser.parse_args(args or [])
+            except (SystemExit, argparse.ArgumentError) as e:
+                if isinstance(e, argparse.ArgumentError):
+                    print(f"⛔ Ошибка: {e}")
+                return
+
+        lines = self.backend.find_history(opts.code, opts.date_from, opts.date_to)
+        if not lines:
+            print("Отправленных записей не найдено.")
+            return
+
+        for line in lines:
+            print(f"  {line}")
+        minutes = sum(pars_line(line).minutes for line in lines)
+        print(f"\nЗаписей: {len(lines)}, всего {minutes // 60}h {minutes % 60}m")
+
+    def _select_history(self, args, prog, require_filter=False):
+        """Отправленные записи с id ворклога по фильтрам amend/revert, None - ошибка в аргументах"""
+        if isinstance(args, dict):  # Если аргументы пришли из CLI
+            opts = argparse.Namespace(**args)
+        else:  # Если из интерактивного режима
+            parser = argparse.ArgumentParser(prog=prog, exit_on_error=False)
+            self._configure_amend_parser(parser)
+            try:
+                opts = parser.parse_args(args or [])
+            except (SystemExit, argparse.ArgumentError) as e:
+                if isinstance(e, argparse.ArgumentError):
+                    print(f"⛔ Ошибка: {e}")
+                return None
+        if require_filter and not any((opts.code, opts.date_from, opts.date_to, opts.grep)):
+            # Без фильтров revert удалил бы из Jira всю историю
+            print("⛔ Укажите записи: --code, --from/--to или --grep")
+            return None
+
+        entries = [entry for entry in pars_store_iter(self.backend.find_history(opts.code, opts.date_from, opts.date_to))
+                   if not opts.grep or (entry.message is not None and opts.grep.search(entry.message))]
+        # Без id (строка испорчена или записана до того, как lit стал его сохранять) ворклог не найти
+        with_id = [entry for entry in entries if entry.worklog_id]
+        if len(with_id) < len(entries):
+            print(f"⚠️ Пропущено записей без id ворклога: {len(entries) - len(with_id)}")
+        return with_id
+
+    @staticmethod
+    def _history_payloads(entries):
+        """Тела запросов для строк истории: id ворклога берётся из комментария '# <id>'"""
+        payloads = build_payloads(entries)
+        for entry, payload in zip(entries, payloads):
+            payload.worklog_id = entry.worklog_id
+        return payloads
+
+    def _confirm(self, question) -> bool:
+        session = PromptSession()
+        return session.prompt(f"\n{question} [y/N]: ").strip().lower() == 'y'
+
+    def amend_history(self, args=None):
+        """
+        lit amend: отправленные записи открываются в редакторе, по каждой изменённой строке
+        уходит один PUT по id ворклога из истории, история обновляется.
+        """
+        if self.push_running():
+            print("⛔ Дождитесь завершения фоновой отправки.")
+            return
+        entries = self._select_history(args, 'lit amend')
+        if not entries:
+            if entries is not None:
+                print("Отправленных записей не найдено.")
+            return
+
+        load_config()
+        originals = {entry.worklog_id: entry for entry in entries}
+        write_lines(LIT_AMEND_FILE, [entry.log for entry in entries])
+        try:
+            subprocess.run([self._editor(), LIT_AMEND_FILE], shell=(os.name == 'nt'), check=True, encoding='utf-8')
+            edited = pars_store(read_lines_from(LIT_AMEND_FILE, 0))
+        except subprocess.CalledProcessError as e:
+            print(f"⚠ Ошибка редактора: {str(e)}")
+            return
+        finally:
+            if os.path.exists(LIT_AMEND_FILE):
+                os.remove(LIT_AMEND_FILE)
+
+        changed = []
+        for entry in edited:
+            original = originals.get(entry.worklog_id)
+            if entry.disabled is not None or original is None:
+                print(f"⚠️ Строка пропущена, нет id отправленной записи: {entry.log}")
+            elif entry.log == original.log:
+                continue
+            elif entry.code.upper() != original.code.upper():
+                # Jira не переносит ворклоги между задачами
+                print(f"⚠️ Задачу менять нельзя, используйте lit revert и lit push: {entry.log}")
+            else:
+                changed.append((original, entry))
+        if not changed:
+            print("Изменений нет.")
+            return
+
+        for original, entry in changed:
+            print(f"  {original.log}\n→ {entry.log}")
+        if not self._confirm(f"Изменить ворклоги в Jira: {len(changed)}?"):
+            print("Отмена изменения.")
+            return
+
+        jira = jira_connect()
+        payloads = self._history_payloads([entry for original, entry in changed])
+        results = push_concurrently(payloads, lambda payload: update_worklog(jira, payload), PUSH_WORKERS)
+
+        updates = {}
+        for (original, entry), (worklog_id, err, attempts) in zip(changed, results):
+            if worklog_id:
+                updates[original.log] = entry.log
+            else:
+                print(f"  {entry.code} {entry.date} {entry.start}: {err}")
+        with self._lock:
+            self.backend.update_history(updates)
+        print(f"Ворклогов изменено: {len(updates)}, с ошибками: {len(changed) - len(updates)}")
+
+    def revert_history(self, args=None):
+        """lit revert: один DELETE на каждый выбранный отправленный ворклог, строки удаляются из истории"""
+        if self.push_running():
+            print("⛔ Дождитесь завершения фоновой отправки.")
+            return
+        entries = self._select_history(args, 'lit revert', require_filter=True)
+        if not entries:
+            if entries is not None:
+                print("Отправленных записей не найдено.")
+            return
+
+        for entry in entries:
+            print(f"  {entry.log}")
+        if not self._confirm(f"Удалить ворклоги из Jira: {len(entries)}?"):
+            print("Отмена удаления.")
+            return
+
         load_config()
+        jira = jira_connect()
+        results = push_concurrently(self._history_payloads(entries), lambda payload: delete_worklog(jira, payload),
+                                    PUSH_WORKERS)
+
+        removed = {}
+        for entry, (worklog_id, err, attempts) in zip(entries, results):
+            if worklog_id:
+                removed[entry.log] = None
+            else:
+                print(f"  {entry.code} {entry.date} {entry.start}: {err}")
+        with self._lock:
+            self.backend.update_history(removed)
+        print(f"Ворклогов удалено: {len(removed)}, с ошибками: {len(entries) - len(removed)}")
+
+    def store_command(self, args=None):
+        """lit store: аргументы из CLI (dict) или интерактивного режима (список)"""
+        if isinstance(args, dict):  # Если аргументы пришли из CLI
+            opts = argparse.Namespace(**args)
+        else:  # Если из интерактивного режима
+            parser = argparse.ArgumentParser(prog='lit store', exit_on_error=False)
+            self._configure_store_parser(parser)
+            try:
+                opts = parser.parse_args(args or [])
+            except (SystemExit, argparse.ArgumentError) as e:
+                if isinstance(e, argparse.ArgumentError):
+                    print(f"⛔ Ошибка: {e}")
+                return
+        if self.push_running():
+            print("⛔ Дождитесь завершения фоновой отправки.")
+            return
+        self.transfer_store(export_dir=opts.export_dir, import_dir=opts.import_dir, migrate=opts.migrate)
+
+    def transfer_store(self, export_dir=None, import_dir=None, migrate=False):
+        """Выгрузка и загрузка хранилища в текстовом формате без потерь, перенос в новую раскладку (lit store)"""
+        if migrate:
+            with self._lock:
+                self.backend = self._make_backend(migrate=True)
+                self._load()
+            print(f"Раскладка хранилища: {self.backend.layout}")
+            return
+
+        if export_dir:
+            write_lines(os.path.join(export_dir, '.litstore'), self.backend.load_all())
+            write_lines(os.path.join(export_dir, '.lithistory'), self.backend.read_history())
+            # load_all у хранилища по месяцам подгружает все месяцы - возвращаем рабочий набор
+            self._load()
+            print(f"Записи и история выгружены в {export_dir}")
+            return
+
+        store_file = os.path.join(import_dir, '.litstore')
+        history_file = os.path.join(import_dir, '.lithistory')
+        if not (os.path.exists(store_file) and os.path.exists(history_file)):
+            # Недостающий файл прочитался бы как пустой и стёр бы записи или историю с id ворклогов
+            print(f"В {import_dir} нужны оба файла .litstore и .lithistory (пустой файл - чтобы очистить)")
+            return
+
+        session = PromptSession()
+        confirm = session.prompt("Текущие записи и история будут заменены. Продолжить? [y/N]: ").strip().lower()
+        if confirm != 'y':
+            print("Отмена загрузки.")
+            return
+
+        self.backend.replace_all(read_lines_from(store_file, 0), read_lines_from(history_file, 0))
+        self._load()
+        print(f"Записи и история загружены из {import_dir}")
 
+    @staticmethod
+    def _editor():
+        """Редактор из конфига или окружения"""
         # Определяем редактор по умолчанию для Windows
         if os.name == 'nt':
             default_editor = 'notepad'
         else:
             default_editor = 'vim'
 
-        editor = CUSTOM_EDITOR or os.environ.get('EDITOR') or os.environ.get('VISUAL') or default_editor
+        return CUSTOM_EDITOR or os.environ.get('EDITOR') or os.environ.get('VISUAL') or default_editor
+
+    def edit_entries(self):
+        """Открыть файл .litstore в редакторе"""
+        if self.push_running():
+            # Результаты фоновой отправки перезаписали бы правки
+            print("⛔ Дождитесь завершения фоновой отправки.")
+            return
+        load_config()
+        editor = self._editor()
 
         try:
             # Создаем файл если его нет
             # if not os.path.exists(LIT_STORE):
             #     open(LIT_STORE, 'w').close()
 
-            cmd = [editor, LIT_STORE]
+            # При разбивке по месяцам и в SQLite редактируется общий текстовый файл
+            store_file = self.backend.export_for_edit()
+            stat_before = file_stat(store_file)
+
+            cmd = [editor, store_file]
             print(cmd)
-            subprocess.run(
-                cmd,
-                shell=(os.name == 'nt'),  # Для Windows используем shell
-                check=True,
-                encoding='utf-8',  # Для корректного отображения ошибок
-                # timeout=3600  # Таймаут 1 час на редактирование
-            )
+            try:
+                subprocess.run(
+                    cmd,
+                    shell=(os.name == 'nt'),  # Для Windows используем shell
+                    check=True,
+                    encoding='utf-8',  # Для корректного отображения ошибок
+                    # timeout=3600  # Таймаут 1 час на редактирование
+                )
+            finally:
+                self.backend.import_edit(store_file, stat_before)
 
             # Перезагружаем данные в любом случае
             self._load()
@@ -392,16 +1181,35 @@ class WorklogManager:
         # Загрузка данных
         if load_jira:
             load_tasks_from_jira()
+            TASKS.invalidate()
         if load_gitlab:
             load_commits_from_gitlab()
+            COMMITS.invalidate()
 
     def init_config(self):
         """Обертка для инициализации конфига"""
         init_config()
+        # Адрес или учётные данные Jira могли поменяться - следующая команда подключится заново.
+        # Если connection ещё не импортирован, подключения не было и сбрасывать нечего.
+        connection = sys.modules.get('connection')
+        if connection is not None:
+            connection.PROVIDER.reset()
+
+
+def make_completer():
+    """WorklogCompleter с базовым классом prompt_toolkit для PromptSession"""
+    from prompt_toolkit.completion import Completer
+
+    class PromptCompleter(WorklogCompleter, Completer):
+        pass
+
+    return PromptCompleter()
 
 
 def get_version():
     """Получить версию из pyproject.toml"""
+    import tomllib
+
     try:
         path = Path(__file__).parent / "pyproject.toml"
         with open(path, "rb") as f:
@@ -420,7 +1228,7 @@ def main(parser):
 
     print("\033[36m" + welcome_art + "\033[0m")  # Цвет cyan
     manager = WorklogManager()
-    session = PromptSession(completer=WorklogCompleter())
+    session = PromptSession(completer=make_completer())
 
     with patch_stdout():
         while True:
@@ -443,15 +1251,23 @@ def main(parser):
                 if command == 'add':
                     manager.add_entry(args[1:])
                 elif command == 'status':
-                    manager.show_status()
+                    manager.show_status(args[1:])
                 elif command == 'push':
-                    manager.push_entries()
+                    manager.push_entries(args[1:])
+                elif command == 'history':
+                    manager.show_history(args[1:])
+                elif command == 'amend':
+                    manager.amend_history(args[1:])
+                elif command == 'revert':
+                    manager.revert_history(args[1:])
                 elif command == 'pull':
                     manager.pull_entries(args[1:])
                 elif command == 'edit':
                     manager.edit_entries()
                 elif command == 'init':
                     manager.init_config()
+                elif command == 'store':
+                    manager.store_command(args[1:])
                 else:
                     print("Неизвестная команда")
 
@@ -461,6 +1277,8 @@ def main(parser):
             except Exception as e:
                 print(f"Ошибка: {str(e)}")
 
+        manager.wait_push()
+
 def create_argument_parser():
     """Создает и возвращает настроенный парсер аргументов"""
     parser = argparse.ArgumentParser(description="Утилита для работы с ворклогами.")
@@ -478,10 +1296,22 @@ def create_argument_parser():
     WorklogManager._configure_add_parser(add_parser)
 
     # Парсер для команды status
-    subparsers.add_parser('status', help='Показать статус ворклога')
+    status_parser = subparsers.add_parser('status', help='Показать статус ворклога')
+    WorklogManager._configure_status_parser(status_parser)
 
     # Парсер для команды push
-    subparsers.add_parser('push', help='Отправить записи в Jira')
+    push_parser = subparsers.add_parser('push', help='Отправить записи в Jira')
+    WorklogManager._configure_push_parser(push_parser)
+
+    # Парсер для команды history
+    history_parser = subparsers.add_parser('history', help='Показать отправленные записи')
+    WorklogManager._configure_history_parser(history_parser)
+
+    # Парсеры для команд amend и revert
+    amend_parser = subparsers.add_parser('amend', help='Изменить отправленные ворклоги в Jira через редактор')
+    WorklogManager._configure_amend_parser(amend_parser)
+    revert_parser = subparsers.add_parser('revert', help='Удалить отправленные ворклоги из Jira')
+    WorklogManager._configure_amend_parser(revert_parser)
 
     # Изменённый блок для команды pull
     pull_parser = subparsers.add_parser('pull', help='Получить задачи из Jira и коммиты из gitlab')
@@ -494,6 +1324,10 @@ def create_argument_parser():
     # Парсер для команды init
     subparsers.add_parser('init', help='Настроить конфигурацию')
 
+    # Парсер для команды store
+    store_parser = subparsers.add_parser('store', help='Выгрузить, загрузить или перенести записи и историю')
+    WorklogManager._configure_store_parser(store_parser)
+
     return parser
 
 def process_arguments(args=None):
@@ -505,15 +1339,23 @@ def process_arguments(args=None):
     if args.command == 'add':
         manager.add_entry(vars(args))
     elif args.command == 'status':
-        manager.show_status()
+        manager.show_status(vars(args))
     elif args.command == 'push':
-        manager.push_entries()
+        manager.push_entries(vars(args))
+    elif args.command == 'history':
+        manager.show_history(vars(args))
+    elif args.command == 'amend':
+        manager.amend_history(vars(args))
+    elif args.command == 'revert':
+        manager.revert_history(vars(args))
     elif args.command == 'pull':
         manager.pull_entries(jira=args.jira, gitlab=args.gitlab)
     elif args.command == 'edit':
         manager.edit_entries()
     elif args.command == 'init':
         manager.init_config()
+    elif args.command == 'store':
+        manager.store_command(vars(args))
     else:
         main(parser)
 
@@ -0,0 +1,106 @@
+import hashlib
+import re
+from datetime import date
+from functools import lru_cache
+
+MAX_ORDINAL = date.max.toordinal() + 1  # Для строк без корректной даты - в конец списка
+MAX_MINUTES = 24 * 60                    # Для строк без корректного времени
+
+_DURATION_PART = re.compile(r'(\d+(?:[.,]\d+)?)([dhm])', re.IGNORECASE)
+_UNIT_MINUTES = {'d': 8 * 60, 'h': 60, 'm': 1}
+_WORKLOG_ID = re.compile(r'(?:^|#)\s*(\d+)\s*$')
+
+
+# Даты, время и длительности в хранилище сильно повторяются, поэтому преобразования кэшируются
+@lru_cache(maxsize=4096)
+def date_ordinal(value) -> int:
+    """'дд.мм.гггг' -> порядковый номер дня без datetime.strptime"""
+    try:
+        return date(int(value[6:10]), int(value[3:5]), int(value[0:2])).toordinal()
+    except (TypeError, ValueError):
+        return MAX_ORDINAL
+
+
+@lru_cache(maxsize=4096)
+def time_minutes(value) -> int:
+    """'чч:мм' -> минуты от начала суток"""
+    try:
+        hours, minutes = int(value[0:2]), int(value[3:5])
+    except (TypeError, ValueError):
+        return MAX_MINUTES
+    if hours > 23 or minutes > 59:
+        return MAX_MINUTES
+    return hours * 60 + minutes
+
+
+@lru_cache(maxsize=4096)
+def duration_minutes(value) -> int:
+    """'1h 30m' / '1,5h' / '1d' -> минуты (1d = 8h)"""
+    if not value:
+        return 0
+    total = 0.0
+    for number, unit in _DURATION_PART.findall(value):
+        total += float(number.replace(',', '.')) * _UNIT_MINUTES[unit.lower()]
+    return round(total)
+
+
+class WorklogEntry:
+    """
+    Разобранная строка .litstore.
+    Числовые поля (дата, время, длительность) считаются один раз при разборе,
+    поэтому сортировка сводится к сравнению кортежей целых чисел.
+    """
+    __slots__ = (
+        'disabled', 'date', 'start', 'end', 'code', 'duration', 'message', 'error', 'log',
+        'date_ord', 'start_min', 'end_min', 'minutes',
+    )
+
+    def __init__(self, log, disabled=None, date=None, start=None, end=None,
+                 code=None, duration=None, message=None, error=None):
+        self.log = log
+        self.disabled = disabled  # None - к отправке, '#' - закомментирована, 'X' - не разобрана
+        self.date = date
+        self.start = start
+        self.end = end
+        self.code = code
+        self.duration = duration
+        self.message = message
+        self.error = error
+
+        self.date_ord = date_ordinal(date)
+        self.start_min = time_minutes(start)
+        self.end_min = time_minutes(end)
+        self.minutes = duration_minutes(duration)
+
+    @classmethod
+    def invalid(cls, log):
+        """Строка, которую не удалось разобрать"""
+        return cls(log, disabled='X')
+
+    @property
+    def content_hash(self) -> bytes:
+        """
+        Хэш содержимого записи: дата, начало, задача, длительность и сообщение.
+        Не зависит от признака отключения и комментария с id или ошибкой, длительность
+        сравнивается в минутах, поэтому '1,5h' и '1h 30m' дают одинаковый хэш.
+        """
+        key = '\x1f'.join((str(self.date), str(self.start), str(self.code).upper(), str(self.minutes), str(self.message)))
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+    @property
+    def worklog_id(self):
+        """
+        id ворклога из комментария строки истории '# <id>' или None.
+        Берётся последний сегмент '# <цифры>': у повторно отправленной строки
+        перед id может остаться текст прежней ошибки.
+        """
+        match = _WORKLOG_ID.search(self.error or '')
+        return match.group(1) if match else None
+
+    def __repr__(self):
+        return f"WorklogEntry({self.log!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, WorklogEntry):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
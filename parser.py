@@ -1,25 +1,101 @@
 import re
+from models import WorklogEntry
 
+STORE_PATTERN = re.compile(r'''
+^
+    (?:(?P<disabled>\#)\s?)?                                 # Признак, что строка отключена
+    (?P<date>\d{2}\.\d{2}\.\d{4})\s+                         # Дата
+    \[(?P<start>\d{2}:\d{2})\s*-\s*(?P<end>\d{2}:\d{2})]\s+  # Время
+    (?P<code>\S+)\s+                                         # Код задачи
+    (?P<duration>\d+[.,]?\d*[dhm]\s*(?:\d+[.,]?\d*m)?)\s+    # Длительность
+    `(?P<message>.*?)`\s?                                    # Сообщение
+    (?:\#\s?(?P<error>.*))?                                  # Ошибка (опционально)
+$
+''', re.IGNORECASE | re.VERBOSE)
 
-def pars_store(file):
-    pattern = re.compile(r'''
-    ^
-        (?:(?P<disabled>\#)\s?)?                                 # Признак, что строка отключена
-        (?P<date>\d{2}\.\d{2}\.\d{4})\s+                         # Дата
-        \[(?P<start>\d{2}:\d{2})\s*-\s*(?P<end>\d{2}:\d{2})]\s+  # Время
-        (?P<code>\S+)\s+                                         # Код задачи
-        (?P<duration>\d+[.,]?\d*[dhm]\s*(?:\d+[.,]?\d*m)?)\s+    # Длительность
-        `(?P<message>.*?)`\s?                                    # Сообщение
-        (?:\#\s?(?P<error>.*))?                                  # Ошибка (опционально)
-    $
-    ''', re.IGNORECASE | re.VERBOSE)
-
-    logs = []
+_LINE_START = frozenset('#0123456789')
+
+
+def _may_match(line):
+    """Дешёвая проверка перед регуляркой: отсекает заведомо неподходящие строки"""
+    return bool(line) and line[0] in _LINE_START and '[' in line and '`' in line
+
+
+def pars_line(line):
+    """Разбор одной строки хранилища"""
+    match = STORE_PATTERN.match(line) if _may_match(line) else None
+    if match:
+        # Порядок групп в STORE_PATTERN совпадает с порядком аргументов WorklogEntry
+        return WorklogEntry(line, *match.groups())
+    return WorklogEntry.invalid(line)
+
+
+def history_line(line, worklog_id) -> str:
+    """Строка истории: строка хранилища без комментария с прежней ошибкой и с id ворклога"""
+    match = STORE_PATTERN.match(line)
+    if match and match.group('error') is not None:
+        line = line[:match.start('error')].rstrip().removesuffix('#').rstrip()
+    return f'{line} # {worklog_id}'
+
+
+def pars_store_iter(file):
+    """Разбирает строки хранилища в WorklogEntry по одной, не собирая весь список в памяти"""
     for line in file:
-        match = pattern.match(line)
-        if match:
-            logs.append(match.groupdict() | {"log": line})
-        else:
-            logs.append({'disabled': 'X', 'log': line})
+        yield pars_line(line)
+
+
+def pars_store(file):
+    return list(pars_store_iter(file))
+
+
+class ParseCache:
+    """
+    Кэш разбора строк .litstore по их содержимому на время процесса (интерактивной сессии).
+    При повторном разборе заново обрабатываются только новые или изменённые строки.
+    Если тот же список строк передаётся повторно и файл (mtime, size) не менялся,
+    возвращается готовый результат без обхода строк.
+    """
+
+    def __init__(self):
+        self._by_line = {}
+        self._lines = None
+        self._stat = None
+        self._parsed = None
+
+    def parse(self, lines, stat=None):
+        """
+        Разбирает lines в список WorklogEntry в том же порядке.
+        stat - (mtime_ns, size) файла, если lines сейчас совпадают с его содержимым.
+        """
+        if stat is not None and lines is self._lines and stat == self._stat \
+                and len(self._parsed) == len(lines):
+            return self._parsed
+
+        by_line = self._by_line
+        fresh = {}
+        parsed = []
+        for line in lines:
+            entry = by_line.get(line)
+            if entry is None:
+                entry = pars_line(line)
+            fresh[line] = entry
+            parsed.append(entry)
+
+        self._by_line = fresh  # Удалённые строки выпадают из кэша
+        self._lines = lines if stat is not None else None
+        self._stat = stat
+        self._parsed = parsed
+        return parsed
+
+    def entry(self, line):
+        """Разобранная строка: из кэша, если она уже встречалась"""
+        entry = self._by_line.get(line)
+        if entry is None:
+            entry = self._by_line[line] = pars_line(line)
+        return entry
 
-    return logs
+    def invalidate(self):
+        """Сбросить готовый результат (разобранные строки остаются в кэше)"""
+        self._lines = None
+        self._stat = None
+        self._parsed = None
@@ -1,72 +1,183 @@
-from jira import JIRA
-from jira.exceptions import JIRAError
-from datetime import datetime
+from requests.exceptions import ConnectionError as HTTPConnectionError, ConnectTimeout
+from urllib3.exceptions import NewConnectionError
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
 from tzlocal import get_localzone
-import os
-import configparser
-
-# TODO Конфигурация дублируется, вынести в отдельный код
-LIT_DIR = os.path.join(os.path.expanduser("~"), ".lit")
-os.makedirs(LIT_DIR, exist_ok=True)
-CONFIG_FILE = os.path.join(LIT_DIR, ".litconfig")
-
-JIRA_URL = ''
-# USER_EMAIL = config.get('jira', 'email')
-PASS = ''
-TARGET_USER = ''
-DAYS = ''
-
-def load_config():
-    global JIRA_URL, PASS, TARGET_USER, DAYS
-    # Создаем конфиг-парсер с сохранением регистра
-    config = configparser.RawConfigParser()
-    config.optionxform = lambda option: option  # Отключаем авто-преобразование в lowercase
-    config.read(CONFIG_FILE)
-
-    JIRA_URL = config.get('jira', 'url')
-    PASS = config.get('jira', 'pass')
-    TARGET_USER = config.get('jira', 'login')
-    DAYS = int(config.get('jira', 'days'))
-
-# TODO вынести в отдельный конектор
+import json
+import re
+
+from connection import PROVIDER, connect, jira_errors, needs_reconnect
+from jira_rest import RestClient
+from pusher import (
+    DEFAULT_WORKERS, NETWORK, RATE_LIMITED, UNAUTHORIZED, UNAVAILABLE, VALIDATE_CHUNK, PushError, WorklogPayload,
+    parse_retry_after,
+)
+
+# Ответы Jira, после которых запрос можно повторить: ворклог точно не создан
+RETRY_STATUSES = {429: RATE_LIMITED, 502: UNAVAILABLE, 503: UNAVAILABLE, 504: UNAVAILABLE}
+
+ISSUE_KEY = re.compile(r'^[A-Z][A-Z0-9_]*-\d+$', re.IGNORECASE)
+
 def jira_connect():
-    load_config()
-    AUTH = (TARGET_USER, PASS)
-    # Создаем клиент Jira с базовой аутентификацией
-    try:
-        jira = JIRA(
-            server=JIRA_URL,
-            basic_auth=AUTH,
-            options={
-                'server': JIRA_URL,
-                'rest_api_version': '2',  # Явно указываем версию API
-                'verify': True
-            },
-            timeout=20
-        )
-    except Exception as e:
-        print(f"Ошибка подключения: {e}")
-        exit()
+    """Общий клиент Jira (см. connection.JiraProvider)"""
+    return connect()
 
-    # Проверка подключения
-    try:
-        print(f"Успешное подключение к Jira {jira.server_info()['version']}")
-        print(f"Авторизованы как: {jira.current_user()}")
-    except Exception as e:
-        print(f"Ошибка проверки подключения: {e}")
-        exit()
 
-    return jira
+def jira_recheck(jira):
+    """Живая проверка подключения после 401: проверенный клиент или None (см. JiraProvider.recheck)"""
+    return PROVIDER.recheck(jira)
 
-def add_worklog(jira, issue, time_spent, comment, day, time):
 
-    start_time = datetime.strptime(f"{day} {time}", "%d.%m.%Y %H:%M").replace(tzinfo=get_localzone())
-    try:
-        id = jira.add_worklog(issue, timeSpent=time_spent, comment=comment, started=start_time)
-    except JIRAError as e:
-        return None, e.text
+def send_worklog(jira, payload):
+    """Один запрос на создание ворклога из готового тела (см. pusher.build_payloads)"""
+    if payload.started is None:
+        return None, "Неверная дата или время начала"
+    return _request(jira, lambda: jira.add_worklog(payload.code, timeSpent=payload.time_spent, comment=payload.comment,
+                                             started=payload.started))
 
+
+def update_worklog(jira, payload):
+    """Один PUT по id ворклога из истории (lit amend)"""
+    if payload.started is None:
+        return None, "Неверная дата или время начала"
+    body = {'timeSpent': payload.time_spent, 'comment': payload.comment, 'started': _jira_time(payload.started)}
+    url = jira._get_url(f"issue/{payload.code}/worklog/{payload.worklog_id}")
+    # Resource.update() после PUT перечитывает ворклог ещё одним GET, поэтому запрос отправляется напрямую
+    response, err = _request(jira, lambda: jira._session.put(url, data=json.dumps(body)))
+    return (None, err) if err else (payload.worklog_id, None)
+
+
+def delete_worklog(jira, payload):
+    """Один DELETE по id ворклога из истории (lit revert)"""
+    url = jira._get_url(f"issue/{payload.code}/worklog/{payload.worklog_id}")
+    response, err = _request(jira, lambda: jira._session.delete(url))
+    return (None, err) if err else (payload.worklog_id, None)
+
+
+def _request(jira, call):
+    """Выполняет запрос к Jira: (результат, None) или (None, ошибка для повтора или вывода)"""
+    try:
+        result = call()
+    except (*jira_errors(), HTTPConnectionError) as e:
+        # После ошибки авторизации или сети следующая команда подключится заново
+        PROVIDER.report(jira, e)
+        return None, _push_error(e)
     except Exception as e:
         return None, str(e)
     else:
-        return id, None
+        return result, None
+
+
+def _push_error(e):
+    """Ошибка Jira или сети -> текст ошибки, с видом ошибки, если запрос можно повторить"""
+    if isinstance(e, jira_errors()):
+        return _jira_error(e)
+    if _not_connected(e):
+        return PushError(str(e), NETWORK)
+    return str(e)
+
+
+def _jira_time(started):
+    """Формат started, который ждёт Jira (как в JIRA.add_worklog)"""
+    return started.strftime("%Y-%m-%dT%H:%M:%S.000") + started.strftime("%z")
+
+
+def _jira_error(e):
+    """Ответ Jira с ошибкой -> PushError с видом ошибки и Retry-After для повтора"""
+    headers = e.response.headers if e.response is not None else {}
+    kind = UNAUTHORIZED if e.status_code == 401 else RETRY_STATUSES.get(e.status_code)
+    return PushError(e.text, kind, parse_retry_after(headers.get('Retry-After')))
+
+
+def _not_connected(e):
+    """Соединение не установлено - запрос точно не дошёл до Jira и повтор не создаст дубль"""
+    reason = getattr(e.args[0], 'reason', None) if e.args else None
+    return isinstance(e, ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+
+def find_missing_issues(jira, codes, chunk_size=VALIDATE_CHUNK):
+    """
+    Проверяет коды задач пачками поисков key in (...) вместо отдельного запроса на каждую запись.
+    Возвращает коды, которых нет в Jira или к которым нет доступа, либо None, если проверить не удалось.
+    Ошибки авторизации и сети пробрасываются: отправка без проверки с ними тоже не пройдёт.
+    """
+    # Строка, которая не похожа на ключ, сломала бы JQL - её и проверять не нужно
+    missing = {code for code in codes if not ISSUE_KEY.match(code)}
+    keys = sorted({code.upper() for code in codes if code not in missing})
+    found = set()
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        try:
+            # validate_query=False: несуществующие ключи не ломают весь запрос, а просто не попадают в ответ
+            issues = jira.search_issues(f"key in ({', '.join(chunk)})", maxResults=len(chunk),
+                                        fields='key', validate_query=False)
+        except Exception as e:
+            PROVIDER.report(jira, e)
+            if needs_reconnect(e):
+                raise
+            print(f"Не удалось проверить задачи перед отправкой: {e}")
+            return None
+        found.update(issue.key.upper() for issue in issues)
+    return missing | {code for code in codes if code not in missing and code.upper() not in found}
+
+
+def _day_ms(day, zone) -> int:
+    """Начало дня day в часовом поясе zone, в миллисекундах от эпохи"""
+    return int(datetime.combine(day, time.min, tzinfo=zone).timestamp() * 1000)
+
+
+def fetch_user_worklogs(jira, codes, date_from=None, date_to=None, workers=DEFAULT_WORKERS) -> Counter:
+    """
+    Ворклоги текущего пользователя в задачах codes, по задаче на поток.
+    date_from/date_to (включительно) ограничивают запрос днями сверяемых записей.
+    Возвращает счётчик ключей (КОД, дд.мм.гггг, чч:мм, минуты) в локальном часовом поясе.
+    """
+    if not codes:
+        return Counter()
+    me = jira.current_user()
+    zone = get_localzone()
+    period = {}
+    # Границы промежутка в Jira строгие, ворклог ровно в полночь тоже нужен
+    if date_from:
+        period['startedAfter'] = _day_ms(date_from, zone) - 1
+    if date_to:
+        period['startedBefore'] = _day_ms(date_to + timedelta(days=1), zone)
+
+    def fetch(code):
+        try:
+            if isinstance(jira, RestClient):
+                return code, jira.worklogs(code, **period)
+            # Библиотека jira не принимает промежуток и отдаёт ворклоги одним ответом
+            return code, jira.worklogs(code)
+        except Exception as e:
+            PROVIDER.report(jira, e)
+            # Без ворклогов одной задачи сверка остальных всё равно полезна
+            print(f"Не удалось получить ворклоги {code}: {e}")
+            return code, []
+
+    existing = Counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(codes))), thread_name_prefix='lit-reconcile') as pool:
+        for code, worklogs in pool.map(fetch, sorted(codes)):
+            for worklog in worklogs:
+                author = getattr(worklog, 'author', None)
+                if me not in (getattr(author, 'accountId', None), getattr(author, 'name', None)):
+                    continue
+                started = datetime.strptime(worklog.started, "%Y-%m-%dT%H:%M:%S.%f%z").astimezone(zone)
+                existing[(code.upper(), started.strftime('%d.%m.%Y'), started.strftime('%H:%M'),
+                          worklog.timeSpentSeconds // 60)] += 1
+    return existing
+
+
+def plan_calls(codes, payloads, reconcile=False) -> dict:
+    """
+    Сколько HTTP-запросов сделает push без учёта повторов, по этапам.
+    Тела с неверной датой или временем (started is None) не отправляются и не считаются.
+    """
+    keys = {code.upper() for code in codes if ISSUE_KEY.match(code)}
+    calls = {'connect': PROVIDER.connect_calls(), 'validate': -(-len(keys) // VALIDATE_CHUNK),
+             'worklogs': sum(payload.started is not None for payload in payloads)}
+    if reconcile and codes:
+        # current_user() берётся из проверки подключения, отдельного запроса нет
+        calls['reconcile'] = len(codes)
+    return calls
@@ -0,0 +1,252 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timezone
+from email.utils import parsedate_to_datetime
+
+import storage
+
+DEFAULT_WORKERS = 4
+# Ключей в одном запросе key in (...): длинный JQL упирается в ограничение длины URL
+VALIDATE_CHUNK = 100
+
+# Виды ошибок, после которых отправку можно повторить: запрос до Jira не дошёл или не был обработан
+RATE_LIMITED = 'rate_limited'  # 429
+UNAVAILABLE = 'unavailable'    # 502, 503, 504
+NETWORK = 'network'            # Не удалось установить соединение
+MAX_RETRY_AFTER = 300          # Больше не ждём, даже если Jira просит
+# Ошибка авторизации (401): не повторяется, push проверяет подключение вживую
+UNAUTHORIZED = 'unauthorized'
+
+
+class PushError(str):
+    """
+    Текст ошибки отправки. Остаётся строкой для .litstore, но знает вид ошибки
+    и сколько секунд просит подождать Jira (Retry-After).
+    """
+
+    def __new__(cls, text, kind=None, retry_after=None):
+        error = super().__new__(cls, text)
+        error.kind = kind
+        error.retry_after = retry_after
+        return error
+
+
+def parse_retry_after(value, now=None):
+    """Заголовок Retry-After (секунды или HTTP-дата) -> секунды ожидания, None если не разобрать"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((moment - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """Сколько раз пробовать и как долго ждать между попытками для одного вида ошибок"""
+
+    def __init__(self, attempts, base_delay, max_delay):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None) -> float:
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_AFTER)
+        # Экспоненциальная задержка со случайной половиной, чтобы потоки не били в Jira одновременно
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+RETRY_POLICIES = {
+    RATE_LIMITED: RetryPolicy(attempts=5, base_delay=2, max_delay=60),
+    UNAVAILABLE: RetryPolicy(attempts=4, base_delay=1, max_delay=30),
+    NETWORK: RetryPolicy(attempts=3, base_delay=1, max_delay=10),
+}
+
+
+class Cooldown:
+    """Общая пауза для всех потоков: лимит запросов в Jira считается на пользователя, а не на задачу"""
+
+    def __init__(self, sleep=time.sleep):
+        self._sleep = sleep
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    def extend(self, delay):
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + delay)
+
+    def wait(self):
+        with self._lock:
+            delay = self._until - time.monotonic()
+        if delay > 0:
+            self._sleep(delay)
+
+
+class WorklogPayload:
+    """Готовое тело запроса на создание (или изменение, если задан worklog_id) ворклога"""
+    __slots__ = ('code', 'time_spent', 'comment', 'started', 'worklog_id')
+
+    def __init__(self, code, time_spent, comment, started, worklog_id=None):
+        self.code = code
+        self.time_spent = time_spent
+        self.comment = comment
+        self.started = started  # datetime с часовым поясом, None - в записи неверные дата или время
+        self.worklog_id = worklog_id
+
+
+def build_payloads(entries, zone=None) -> list:
+    """
+    Тела запросов для записей за один проход. Часовой пояс определяется один раз на отправку,
+    время начала собирается из уже разобранных чисел записи без strptime.
+    """
+    if zone is None:
+        from tzlocal import get_localzone
+        zone = get_localzone()
+    payloads = []
+    for entry in entries:
+        try:
+            started = datetime.combine(date.fromordinal(entry.date_ord),
+                                       dt_time(entry.start_min // 60, entry.start_min % 60), tzinfo=zone)
+        except ValueError:
+            started = None
+        payloads.append(WorklogPayload(entry.code, entry.duration, entry.message.replace("\\n", '\n'), started))
+    return payloads
+
+
+def group_by_issue(entries) -> list:
+    """Индексы записей, сгруппированные по коду задачи, в порядке первого появления"""
+    groups = {}
+    for index, entry in enumerate(entries):
+        groups.setdefault(entry.code, []).append(index)
+    return list(groups.values())
+
+
+def _safe_send(send, entry):
+    try:
+        return send(entry)
+    except Exception as e:
+        # Ошибка одной записи не должна останавливать остальные записи задачи
+        return None, str(e)
+
+
+def send_with_retries(send, entry, policies=RETRY_POLICIES, sleep=time.sleep, cooldown=None):
+    """Отправка одной записи с повторами по политике вида ошибки. Возвращает (id, err, попыток)."""
+    cooldown = cooldown or Cooldown(sleep)
+    attempt = 0
+    while True:
+        attempt += 1
+        cooldown.wait()
+        id, err = _safe_send(send, entry)
+        policy = policies.get(getattr(err, 'kind', None))
+        if id or policy is None or attempt >= policy.attempts:
+            return id, err, attempt
+
+        delay = policy.delay(attempt, err.retry_after)
+        if err.kind == RATE_LIMITED:
+            cooldown.extend(delay)
+        else:
+            sleep(delay)
+
+
+def push_concurrently(entries, send, workers=DEFAULT_WORKERS, policies=RETRY_POLICIES, sleep=time.sleep,
+                      on_result=None) -> list:
+    """
+    Отправляет записи через send(entry) -> (id, err) пулом из workers потоков.
+    Разные задачи отправляются параллельно, записи одной задачи - строго по очереди,
+    чтобы Jira не пересчитывала ворклоги и оставшуюся оценку задачи одновременно.
+    Временные ошибки повторяются (см. RETRY_POLICIES).
+    Результаты (id, err, попыток) возвращаются в порядке entries,
+    on_result(index, result) вызывается сразу после ответа по каждой записи.
+    """
+    results = [None] * len(entries)
+    groups = group_by_issue(entries)
+    cooldown = Cooldown(sleep)
+    stop = threading.Event()
+
+    def send_group(indices):
+        for index in indices:
+            if stop.is_set():
+                return
+            results[index] = send_with_retries(send, entries[index], policies, sleep, cooldown)
+            if on_result:
+                on_result(index, results[index])
+
+    if workers <= 1 or len(groups) <= 1:
+        for indices in groups:
+            send_group(indices)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(groups)), thread_name_prefix='lit-push') as pool:
+        futures = [pool.submit(send_group, indices) for indices in groups]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # Ctrl-C: дожидаемся только запросов, которые уже ушли в Jira
+            stop.set()
+            raise
+    return results
+
+
+class PushJournal:
+    """
+    Журнал отправки: строка JSON на каждую запись сразу после ответа Jira.
+    Удаляется, когда .litstore и .lithistory обновлены. Если push прервался,
+    следующий push находит журнал и не отправляет подтверждённые записи повторно.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read(self) -> list:
+        """Записи журнала: (строка, id ворклога или None, ошибка или None)"""
+        records = []
+        with open(self.path, encoding='utf-8') as f:
+            for raw in f:
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue  # Строку не дописали из-за сбоя
+                records.append((record['line'], record.get('id'), record.get('error')))
+        return records
+
+    def open(self):
+        storage.ensure_config()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, line, id, err):
+        """Вызывается из потоков отправки"""
+        data = {'line': line, 'id': str(id) if id else None, 'error': str(err) if err else None}
+        with self._lock:
+            self._file.write(json.dumps(data, ensure_ascii=False) + "\n")
+            self._file.flush()
+            if storage.FSYNC != 'none':
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,195 @@
+import os
+from datetime import date
+
+from backends import EDIT_FILE, WorklogBackend
+from models import MAX_ORDINAL
+from parser import pars_line
+from storage import append_lines, file_lock, file_size, file_stat, read_lines_from, save_json, write_lines
+from utils import load_dict
+
+UNDATED = 'undated'  # Строки без корректной даты
+SHARD_SUFFIX = '.litstore'
+
+
+def shard_key(line) -> str:
+    """Месяц записи в формате ГГГГ-ММ"""
+    entry = pars_line(line)
+    if entry.date is None or entry.date_ord == MAX_ORDINAL:
+        return UNDATED
+    return f"{entry.date[6:10]}-{entry.date[3:5]}"
+
+
+def _group(lines) -> dict:
+    groups = {}
+    for line in lines:
+        groups.setdefault(shard_key(line), []).append(line)
+    return groups
+
+
+def _shard_info(lines) -> dict:
+    return {
+        'count': len(lines),
+        'pending': sum(1 for line in lines if pars_line(line).disabled is None),
+    }
+
+
+class ShardedStore(WorklogBackend):
+    """
+    Хранилище ворклогов с разбивкой по месяцам: <dir>/ГГГГ-ММ.litstore и manifest.json
+    со счётчиками строк и неотправленных записей по каждому месяцу.
+    Загружаются только месяцы, где есть что отправлять, и текущий месяц,
+    поэтому старые отключённые строки не читаются при каждом status и push.
+    """
+    layout = 'monthly'
+
+    def __init__(self, directory, history_file=None):
+        super().__init__(history_file)
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, 'manifest.json')
+        self.manifest = {}
+        self.loaded = {}  # Месяц -> размер его файла в байтах, уже отражённый в памяти
+
+    def shard_file(self, shard) -> str:
+        return os.path.join(self.directory, f"{shard}{SHARD_SUFFIX}")
+
+    def _lock(self):
+        return file_lock(self.manifest_file)
+
+    def _read_manifest(self):
+        self.manifest = load_dict(self.manifest_file)
+
+    def _save_manifest(self):
+        save_json(self.manifest_file, dict(sorted(self.manifest.items())))
+
+    def _all_shards(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(SHARD_SUFFIX)] for name in os.listdir(self.directory)
+            if name.endswith(SHARD_SUFFIX) and name != EDIT_FILE
+        )
+
+    def active_shards(self, today=None) -> list:
+        """Месяцы с неотправленными записями, текущий месяц и строки без даты"""
+        current = (today or date.today()).strftime('%Y-%m')
+        return sorted(
+            shard for shard, info in self.manifest.items()
+            if info.get('pending') or shard in (current, UNDATED)
+        )
+
+    def archived_count(self) -> int:
+        """Количество строк в незагруженных месяцах"""
+        return sum(info.get('count', 0) for shard, info in self.manifest.items() if shard not in self.loaded)
+
+    def _read_shard(self, shard) -> list:
+        path = self.shard_file(shard)
+        lines = read_lines_from(path, 0)
+        self.loaded[shard] = file_size(path)
+        return lines
+
+    def needs_migration(self, flat_store) -> bool:
+        """Есть плоский .litstore, а разбивки по месяцам ещё нет"""
+        return not os.path.exists(self.manifest_file) and os.path.exists(flat_store)
+
+    def migrate(self, flat_store):
+        """Разносит плоский .litstore по месяцам (lit store --migrate)"""
+        if not self.needs_migration(flat_store):
+            return
+        with self._lock():
+            lines = read_lines_from(flat_store, 0)
+            for shard, shard_lines in _group(lines).items():
+                write_lines(self.shard_file(shard), shard_lines)
+                self.manifest[shard] = _shard_info(shard_lines)
+            self._save_manifest()
+            os.replace(flat_store, flat_store + '.migrated')
+        print(f"Записи из {flat_store} разнесены по месяцам в {self.directory}")
+
+    def load(self, shards=None) -> list:
+        """Строки выбранных месяцев (по умолчанию - активных)"""
+        with self._lock():
+            self._read_manifest()
+            self.loaded = {}
+            lines = []
+            for shard in (self.active_shards() if shards is None else shards):
+                lines.extend(self._read_shard(shard))
+        return lines
+
+    def load_all(self) -> list:
+        return self.load(self._all_shards())
+
+    def _sync_loaded(self) -> list:
+        """Строки, дописанные другими процессами в уже загруженные месяцы"""
+        appended = []
+        for shard, size in self.loaded.items():
+            path = self.shard_file(shard)
+            appended.extend(read_lines_from(path, size))
+            self.loaded[shard] = file_size(path)
+        return appended
+
+    def append(self, lines) -> list:
+        """
+        Дописывает строки в файлы их месяцев.
+        Возвращает строки, которых ещё нет в памяти: дописанные другими процессами
+        и прежнее содержимое месяцев, которые пришлось загрузить для записи.
+        """
+        with self._lock():
+            self._read_manifest()
+            extra = self._sync_loaded()
+            for shard, shard_lines in _group(lines).items():
+                if shard not in self.loaded:
+                    extra.extend(self._read_shard(shard))
+                self.loaded[shard] = append_lines(self.shard_file(shard), shard_lines)
+
+                info = self.manifest.setdefault(shard, {'count': 0, 'pending': 0})
+                added = _shard_info(shard_lines)
+                info['count'] += added['count']
+                info['pending'] += added['pending']
+            self._save_manifest()
+        return extra
+
+    def save(self, lines) -> list:
+        """
+        Перезаписывает загруженные месяцы строками lines, остальные месяцы не трогает.
+        Возвращает итоговый список строк в памяти (с учётом дописанных другими процессами).
+        """
+        with self._lock():
+            self._read_manifest()
+            lines = list(lines) + self._sync_loaded()
+            groups = _group(lines)
+            for shard in groups:
+                if shard not in self.loaded:
+                    # Месяц не был загружен - сохраняем его прежние строки
+                    existing = self._read_shard(shard)
+                    groups[shard] = existing + groups[shard]
+                    lines.extend(existing)
+
+            for shard in list(self.loaded):
+                shard_lines = groups.get(shard)
+                if shard_lines:
+                    self.loaded[shard] = write_lines(self.shard_file(shard), shard_lines)
+                    self.manifest[shard] = _shard_info(shard_lines)
+                else:
+                    if os.path.exists(self.shard_file(shard)):
+                        os.remove(self.shard_file(shard))
+                    self.manifest.pop(shard, None)
+                    del self.loaded[shard]
+            self._save_manifest()
+        return lines
+
+    def export_for_edit(self) -> str:
+        """Собирает все месяцы в один файл для lit edit и возвращает путь к нему"""
+        path = os.path.join(self.directory, EDIT_FILE)
+        write_lines(path, self.load_all())
+        return path
+
+    def import_edit(self, path, stat_before=None):
+        """Раскладывает отредактированный файл обратно по месяцам"""
+        try:
+            if stat_before is not None and file_stat(path) == stat_before:
+                return  # Файл не меняли
+            # self.loaded остался от export_for_edit, поэтому строки, дописанные
+            # во время редактирования, подтянутся в save и не потеряются
+            self.save(read_lines_from(path, 0))
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,199 @@
+import json
+import os
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+from config import read_config
+
+# Политика fsync при атомарной записи:
+#   none - без fsync, быстрее всего, но после сбоя питания файл может оказаться пустым
+#   file - fsync временного файла перед заменой (по умолчанию)
+#   full - дополнительно fsync директории после замены (только POSIX)
+FSYNC_POLICIES = ('none', 'file', 'full')
+FSYNC = None
+# Раскладка хранилища: flat - один файл .litstore, monthly - по файлу на месяц (store/ГГГГ-ММ.litstore),
+# sqlite - записи и история в базе lit.db
+LAYOUTS = ('flat', 'monthly', 'sqlite')
+LAYOUT = 'flat'
+
+
+def load_config():
+    global FSYNC, LAYOUT
+    config = read_config()
+
+    FSYNC = config.get('storage', 'fsync', fallback='file')
+    if FSYNC not in FSYNC_POLICIES:
+        print(f"⚠️ Неизвестная политика fsync '{FSYNC}', используется 'file'")
+        FSYNC = 'file'
+    LAYOUT = config.get('storage', 'layout', fallback='flat')
+    if LAYOUT not in LAYOUTS:
+        print(f"⚠️ Неизвестная раскладка хранилища '{LAYOUT}', используется 'flat'")
+        LAYOUT = 'flat'
+
+
+def ensure_config():
+    """Читает секцию [storage] при первом обращении"""
+    if FSYNC is None:
+        load_config()
+
+
+def _lock(fd):
+    if os.name == 'nt':
+        # msvcrt.locking сдается после 10 попыток, поэтому ждём в цикле
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    else:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _unlock(fd):
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Эксклюзивная рекомендательная блокировка файла между процессами.
+    Блокируется соседний файл path + '.lock', а не сам файл: его могут заменить целиком.
+    Вложенные вызовы для одного и того же файла не поддерживаются.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        _lock(fd)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def file_stat(path):
+    """(mtime_ns, size) файла или None, если файла нет"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def file_size(path) -> int:
+    """Размер файла в байтах, 0 если файла нет"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def read_tail(path, size, length=64) -> bytes:
+    """
+    Последние length байт файла перед смещением size. Если они не совпадают с запомненными,
+    файл до size переписали и дочитывать его с этого смещения нельзя.
+    """
+    if size == 0:
+        return b''
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(size - length, 0))
+            return f.read(min(size, length))
+    except OSError:
+        return b''
+
+
+def _ends_with_newline(path) -> bool:
+    if file_size(path) == 0:
+        return True
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def read_lines_from(path, offset: int) -> list:
+    """Непустые строки файла, начиная с байтового смещения offset"""
+    if file_size(path) <= offset:
+        return []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read().decode('utf-8')
+    return [line.strip() for line in data.splitlines() if line.strip()]
+
+
+def append_lines(path, lines) -> int:
+    """
+    Дописывает строки в конец файла (O_APPEND) и возвращает новый размер файла.
+    Вызывать под file_lock(path), чтобы не перемешать записи параллельных процессов.
+    """
+    prefix = '' if _ends_with_newline(path) else '\n'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(prefix + ''.join(f'{line}\n' for line in lines))
+    return file_size(path)
+
+
+def _fsync_dir(path):
+    if os.name == 'nt':
+        return
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, fsync=None):
+    """
+    Атомарная запись текстового файла: пишем во временный файл рядом и заменяем им
+    целевой через os.replace. При ошибке или прерывании старый файл остаётся целым.
+    """
+    if fsync is None:
+        ensure_config()
+        fsync = FSYNC
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            yield f
+            if fsync != 'none':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync == 'full':
+        _fsync_dir(path)
+
+
+def write_lines(path, lines, fsync=None) -> int:
+    """Атомарно перезаписывает файл строками и возвращает его новый размер"""
+    with atomic_write(path, fsync) as f:
+        f.write("\n".join(lines) + "\n")
+    return file_size(path)
+
+
+def save_json(path, data, fsync=None):
+    """
+    Атомарно сохраняет JSON. json.dump отдаёт текст по частям в буфер файла,
+    поэтому весь документ с отступами в памяти не собирается.
+    """
+    with atomic_write(path, fsync) as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
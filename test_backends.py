@@ -0,0 +1,278 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import parser
+from backends import HistoryIndex, SqliteBackend, TextBackend
+from parser import pars_line
+from storage import read_lines_from
+
+PENDING = "05.03.2024 [10:00 - 11:00] ABC-1 1h `К отправке`"
+DISABLED = "# 04.03.2024 [10:00 - 11:00] ABC-2 1h `Ошибка` # Задача не найдена"
+GARBAGE = "мусор"
+HISTORY = [
+    "10.01.2024 [10:00 - 12:00] ABC-123 2h `Январь` # 1001",
+    "15.02.2024 [10:00 - 11:00] XYZ-1 1h `Другая задача` # 1002",
+    "20.04.2024 [10:00 - 10:30] ABC-123 30m `Апрель` # 1003",
+]
+
+
+class BackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = os.path.join(self.tmp_dir.name, '.litstore')
+        self.history = os.path.join(self.tmp_dir.name, '.lithistory')
+        self.db = os.path.join(self.tmp_dir.name, 'lit.db')
+        patch('storage.FSYNC', 'none').start()
+        patch('builtins.print').start()
+
+    def tearDown(self):
+        patch.stopall()
+        self.tmp_dir.cleanup()
+
+    def _sqlite(self):
+        backend = SqliteBackend(self.db)
+        self.addCleanup(backend.close)
+        return backend
+
+
+class TestTextBackend(BackendTestCase):
+    def test_find_history(self):
+        backend = TextBackend(self.store, self.history)
+        backend.append_history(HISTORY)
+
+        self.assertEqual(backend.find_history(code='ABC-123'), [HISTORY[0], HISTORY[2]])
+        self.assertEqual(backend.find_history(date_from=date(2024, 2, 1), date_to=date(2024, 3, 31)), [HISTORY[1]])
+
+    def test_replace_all(self):
+        backend = TextBackend(self.store, self.history)
+        backend.append([GARBAGE])
+        backend.replace_all([PENDING], HISTORY)
+
+        self.assertEqual(read_lines_from(self.store, 0), [PENDING])
+        self.assertEqual(read_lines_from(self.history, 0), HISTORY)
+
+    def test_external_edit_that_grows_file(self):
+        first = "05.03.2024 [10:00 - 11:00] SK-1 1h `first`"
+        second = "05.03.2024 [11:00 - 12:00] SK-2 1h `second`"
+        backend = TextBackend(self.store, self.history)
+        backend.load()
+        backend.append([first, second])
+
+        # Сообщение поправили на месте: файл стал длиннее, прежнее смещение - посреди строки
+        for edited in ("05.03.2024 [10:00 - 11:00] SK-1 1h `первая, исправленная`",
+                       "05.03.2024 [10:00 - 11:00] SK-1 1h `ё`"):
+            with self.subTest(edited=edited):
+                with open(self.store, 'w', encoding='utf-8') as f:
+                    f.write(f"{edited}\n{second}\n")
+                self.assertIsNone(backend.append([PENDING]))
+                self.assertEqual(backend.load(), [edited, second, PENDING])
+
+    def test_appends_of_other_process_are_picked_up(self):
+        backend, other = TextBackend(self.store, self.history), TextBackend(self.store, self.history)
+        backend.load()
+        other.load()
+        other.append([DISABLED])
+        self.assertEqual(backend.append([PENDING]), [DISABLED])
+
+    def test_update_history(self):
+        backend = TextBackend(self.store, self.history)
+        backend.append_history(HISTORY)
+        pushed = backend.pushed_hashes()
+        amended = HISTORY[0].replace('2h', '1h')
+
+        backend.update_history({HISTORY[0]: amended, HISTORY[1]: None})
+
+        self.assertEqual(backend.read_history(), [amended, HISTORY[2]])
+        # Индекс замечает перезапись истории
+        pushed = backend.pushed_hashes()
+        self.assertIn(pars_line(amended).content_hash, pushed)
+        self.assertNotIn(pars_line(HISTORY[1]).content_hash, pushed)
+
+
+class TestHistoryIndex(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index_file = self.history + '.index'
+        self.backend = TextBackend(self.store, self.history)
+
+    def _index(self):
+        return HistoryIndex(self.history, self.index_file).load()
+
+    def test_pushed_lines_are_found(self):
+        self.backend.append_history(HISTORY[:2])
+        index = self.backend.pushed_hashes()
+
+        # Комментарий с id и формат длительности на совпадение не влияют
+        self.assertIn(pars_line("10.01.2024 [10:00 - 12:00] ABC-123 120m `Январь`").content_hash, index)
+        self.assertNotIn(pars_line(HISTORY[2]).content_hash, index)
+        self.assertNotIn(pars_line("10.01.2024 [10:00 - 12:00] ABC-123 2h `Другое`").content_hash, index)
+
+    def test_only_new_history_lines_are_parsed(self):
+        self.backend.append_history(HISTORY[:2])
+        self._index()
+        self.backend.append_history(HISTORY[2:])
+
+        with patch('parser.pars_line', wraps=parser.pars_line) as mock_parse:
+            index = self._index()
+        mock_parse.assert_called_once_with(HISTORY[2])
+        self.assertEqual(len(index), 3)
+
+    def test_rewritten_history_is_reindexed(self):
+        self.backend.append_history(HISTORY)
+        self._index()
+        # Та же длина файла, но другое содержимое
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write("\n".join(HISTORY[::-1]).replace('ABC-123', 'ABC-321') + "\n")
+
+        index = self._index()
+        self.assertNotIn(pars_line(HISTORY[0]).content_hash, index)
+        self.assertIn(pars_line(HISTORY[0].replace('ABC-123', 'ABC-321')).content_hash, index)
+
+    def test_index_is_plain_text(self):
+        self.backend.append_history(HISTORY)
+        self._index()
+        with open(self.index_file, encoding='utf-8') as f:
+            header, *hashes = f.read().split('\n')[:-1]
+
+        self.assertEqual(header.split()[:2], [str(HistoryIndex.VERSION), str(os.path.getsize(self.history))])
+        self.assertEqual(set(hashes), {pars_line(line).content_hash.hex() for line in HISTORY})
+        # Индекс с диска совпадает с построенным заново
+        with patch('parser.pars_line') as mock_parse:
+            self.assertEqual(len(self._index()), len(HISTORY))
+        mock_parse.assert_not_called()
+
+    def test_broken_index_is_rebuilt(self):
+        self.backend.append_history(HISTORY)
+        with open(self.index_file, 'wb') as f:
+            f.write(b'\x80\x04garbage')
+
+        self.assertIn(pars_line(HISTORY[0]).content_hash, self._index())
+
+
+class TestSqliteBackend(BackendTestCase):
+    def test_append_and_load(self):
+        backend = self._sqlite()
+        self.assertEqual(backend.load(), [])
+        self.assertEqual(backend.append([PENDING, DISABLED]), [])
+        self.assertEqual(self._sqlite().load(), [PENDING, DISABLED])
+
+    def test_append_returns_lines_of_other_process(self):
+        first, second = self._sqlite(), self._sqlite()
+        first.load()
+        second.load()
+
+        second.append([PENDING])
+        self.assertEqual(first.append([DISABLED]), [PENDING])
+
+    def test_save_touches_only_changed_rows(self):
+        backend = self._sqlite()
+        backend.load()
+        backend.append([PENDING, DISABLED])
+        other = self._sqlite()
+        other.load()
+        other.append([GARBAGE])
+
+        # Запись отправлена и ушла из хранилища, строку другого процесса не теряем
+        lines = backend.save([DISABLED])
+        self.assertEqual(lines, [DISABLED, GARBAGE])
+        self.assertEqual(self._sqlite().load(), [DISABLED, GARBAGE])
+
+        rows = backend._connect().execute("SELECT id, line FROM entries ORDER BY id").fetchall()
+        self.assertEqual(rows, [(2, DISABLED), (3, GARBAGE)])
+
+    def test_append_after_rewrite_requests_reload(self):
+        first, second = self._sqlite(), self._sqlite()
+        first.append([PENDING, DISABLED])
+        second.load()
+        first.save([DISABLED])
+
+        self.assertIsNone(second.append([GARBAGE]))
+        self.assertEqual(second.load(), [DISABLED, GARBAGE])
+
+    def test_status_is_indexed(self):
+        backend = self._sqlite()
+        backend.append([PENDING, DISABLED, GARBAGE])
+        conn = backend._connect()
+
+        statuses = conn.execute("SELECT line, status FROM entries ORDER BY id").fetchall()
+        self.assertEqual(statuses, [(PENDING, 'pending'), (DISABLED, 'disabled'), (GARBAGE, 'invalid')])
+
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT line FROM entries WHERE status = 'pending'").fetchall()
+        self.assertIn('entries_status', str(plan))
+
+    def test_find_history_uses_index(self):
+        backend = self._sqlite()
+        backend.append_history(HISTORY)
+
+        self.assertEqual(backend.find_history(code='ABC-123', date_from=date(2024, 4, 1)), [HISTORY[2]])
+        self.assertEqual(backend.find_history(date_to=date(2024, 2, 15)), HISTORY[:2])
+        self.assertEqual(backend.find_history(), HISTORY)
+
+        plan = backend._connect().execute(
+            "EXPLAIN QUERY PLAN SELECT line FROM history WHERE code = ? AND date_ord >= ?", ('ABC-123', 0)
+        ).fetchall()
+        self.assertIn('history_code', str(plan))
+
+    def test_pushed_hashes(self):
+        backend = self._sqlite()
+        backend.append_history(HISTORY[:1])
+        pushed = backend.pushed_hashes()
+
+        self.assertIn(pars_line(HISTORY[0]).content_hash, pushed)
+        self.assertNotIn(pars_line(HISTORY[1]).content_hash, pushed)
+
+    def test_update_history(self):
+        backend = self._sqlite()
+        backend.append_history(HISTORY)
+        amended = HISTORY[0].replace('2h', '1h')
+
+        backend.update_history({HISTORY[0]: amended, HISTORY[1]: None})
+
+        self.assertEqual(backend.read_history(), [amended, HISTORY[2]])
+        self.assertEqual(backend.find_history(code='XYZ-1'), [])
+        pushed = backend.pushed_hashes()
+        self.assertIn(pars_line(amended).content_hash, pushed)
+        self.assertNotIn(pars_line(HISTORY[0]).content_hash, pushed)
+
+    def test_bulk_insert_is_one_transaction(self):
+        backend = self._sqlite()
+        statements = []
+        backend._connect().set_trace_callback(statements.append)
+
+        backend.append_history([f"10.01.2024 [10:00 - 11:00] ABC-{i} 1h `Запись` # {i}" for i in range(500)])
+
+        self.assertEqual(statements.count('COMMIT'), 1)
+        self.assertEqual(len(backend.read_history()), 500)
+
+    def test_migrate_and_export_roundtrip(self):
+        lines = [PENDING, DISABLED, GARBAGE]
+        TextBackend(self.store, self.history).replace_all(lines, HISTORY)
+
+        backend = self._sqlite()
+        backend.migrate(self.store, self.history)
+
+        self.assertTrue(os.path.exists(self.store + '.migrated'))
+        self.assertTrue(os.path.exists(self.history + '.migrated'))
+        # Строки хранятся дословно - экспорт совпадает с исходными файлами
+        self.assertEqual(backend.load_all(), lines)
+        self.assertEqual(backend.read_history(), HISTORY)
+
+    def test_edit_roundtrip(self):
+        backend = self._sqlite()
+        backend.append([PENDING, DISABLED])
+        path = backend.export_for_edit()
+        self.assertEqual(read_lines_from(path, 0), [PENDING, DISABLED])
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(PENDING.replace('ABC-1', 'ABC-7') + "\n")
+        backend.import_edit(path)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self._sqlite().load(), [PENDING.replace('ABC-1', 'ABC-7')])
+
+
+if __name__ == '__main__':
+    unittest.main()
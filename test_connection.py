@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from jira.exceptions import JIRAError
+from requests.exceptions import ConnectionError
+
+import connection
+from connection import HandshakeCache, JiraProvider
+from jira_rest import JiraError
+
+
+def _client(**kwargs):
+    jira = MagicMock(_version=(9, 4, 0), deploymentType='Server')
+    jira.myself.return_value = {'name': 'user', 'key': 'user', 'avatarUrls': {'16x16': 'https://jira/avatar'}}
+    return jira
+
+
+class TestJiraProvider(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp_dir.name, '.jirahandshake.json')
+        self.mock_config = patch('connection.read_jira_config',
+                                 return_value=('https://jira', 'user', 'secret', 3600, 'rest')).start()
+        self.mock_jira_cls = patch('connection.RestClient', side_effect=_client).start()
+        patch('storage.FSYNC', 'none').start()
+        self.provider = self._provider()
+
+    def tearDown(self):
+        patch.stopall()
+        self.tmp_dir.cleanup()
+
+    def _provider(self):
+        """Новый процесс lit: своё подключение, общий кэш проверки на диске"""
+        return JiraProvider(handshake=HandshakeCache(self.cache_file))
+
+    def test_client_is_created_once(self):
+        jira = self.provider.get()
+        self.assertIs(self.provider.get(), jira)
+        self.mock_jira_cls.assert_called_once()
+        self.assertEqual(self.mock_jira_cls.call_args.kwargs['basic_auth'], ('user', 'secret'))
+
+    def test_library_client_is_optional_fallback(self):
+        self.mock_config.return_value = ('https://jira', 'user', 'secret', 3600, 'jira')
+        with patch('jira.JIRA', side_effect=_client) as mock_library:
+            self.provider.get()
+        self.assertEqual(mock_library.call_args.kwargs['max_retries'], 0)
+        self.mock_jira_cls.assert_not_called()
+
+        self.provider.reset()
+        with patch.dict('sys.modules', {'jira': None}), patch('builtins.print'):
+            self.provider.get()
+        self.mock_jira_cls.assert_called_once()
+
+    def test_fresh_handshake_skips_live_check(self):
+        live = self.provider.get()
+        self.assertTrue(self.mock_jira_cls.call_args.kwargs['get_server_info'])
+        live.myself.assert_called_once()
+
+        provider = self._provider()
+        self.assertEqual(provider.connect_calls(), 0)
+        cached = provider.get()
+
+        self.assertFalse(self.mock_jira_cls.call_args.kwargs['get_server_info'])
+        cached.myself.assert_not_called()
+        self.assertEqual(cached._version, (9, 4, 0))
+        # Для current_user() хранится только нужное
+        self.assertEqual(cached._myself, {'name': 'user', 'key': 'user'})
+        self.assertFalse(provider.checked)
+
+    def test_stale_handshake_is_checked_again(self):
+        self.provider.get()
+        with patch('connection.time.time', return_value=connection.time.time() + 3601):
+            provider = self._provider()
+            self.assertEqual(provider.connect_calls(), connection.CONNECT_CALLS)
+            provider.get().myself.assert_called_once()
+
+    def test_handshake_is_per_server_and_login(self):
+        self.provider.get()
+        self.mock_config.return_value = ('https://jira', 'other', 'secret', 3600, 'rest')
+        self.assertEqual(self._provider().connect_calls(), connection.CONNECT_CALLS)
+
+    def test_unauthorized_drops_handshake(self):
+        for error in (JiraError('Unauthorized', 401), JIRAError(status_code=401, text='Unauthorized')):
+            with self.subTest(error=type(error).__name__):
+                jira = self.provider.get()
+                self.provider.report(jira, error)
+
+                self.assertIsNot(self.provider.get(), jira)
+                # Следующее подключение проверено вживую
+                self.assertTrue(self.mock_jira_cls.call_args.kwargs['get_server_info'])
+                self.assertTrue(self.provider.checked)
+
+    def test_recheck_after_unauthorized_from_cached_client(self):
+        self.provider.get()
+        provider = self._provider()
+        cached = provider.get()
+
+        checked = provider.recheck(cached)
+
+        self.assertIsNot(checked, cached)
+        self.assertTrue(self.mock_jira_cls.call_args.kwargs['get_server_info'])
+        checked.myself.assert_called_once()
+        self.assertTrue(provider.checked)
+        # Проверенный вживую клиент повторно не проверяется: 401 от него - окончательный ответ
+        self.assertIsNone(provider.recheck(checked))
+
+    def test_failed_recheck(self):
+        self.provider.get()
+        provider = self._provider()
+        cached = provider.get()
+        rejected = _client()
+        rejected.myself.side_effect = JiraError('Unauthorized', 401)
+        self.mock_jira_cls.side_effect = [rejected]
+
+        with patch('builtins.print'):
+            self.assertIsNone(provider.recheck(cached))
+        # Кэш проверки сброшен, следующая команда проверит подключение вживую
+        self.assertEqual(self._provider().connect_calls(), connection.CONNECT_CALLS)
+
+    def test_transport_error_reconnects_but_keeps_handshake(self):
+        jira = self.provider.get()
+        self.provider.report(jira, ConnectionError('Connection reset'))
+
+        self.assertIsNot(self.provider.get(), jira)
+        self.assertFalse(self.mock_jira_cls.call_args.kwargs['get_server_info'])
+
+    def test_other_errors_keep_connection(self):
+        jira = self.provider.get()
+        self.provider.report(jira, JIRAError(status_code=404, text='Issue Does Not Exist'))
+        self.assertIs(self.provider.get(), jira)
+
+    def test_stale_client_does_not_reset_new_one(self):
+        old = self.provider.get()
+        self.provider.reset()
+        new = self.provider.get()
+
+        # Поток, который ещё работал со старым клиентом, сообщает об ошибке
+        self.provider.report(old, ConnectionError('Connection reset'))
+        self.assertIs(self.provider.get(), new)
+
+    def test_connect_greets_only_after_live_check(self):
+        with patch('connection.PROVIDER', self.provider), patch('builtins.print') as mock_print:
+            first = connection.connect()
+            second = connection.connect()
+        self.assertIs(first, second)
+        mock_print.assert_any_call("Успешное подключение к Jira 9.4.0")
+
+        with patch('connection.PROVIDER', self._provider()), patch('builtins.print') as mock_print:
+            connection.connect()
+        mock_print.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from jira_rest import JiraError, ResultList
+
+import import_jira
+from import_jira import get_all_issues, load_tasks_from_jira, merge_tasks
+
+
+def _issue(number, updated=None, summary=None):
+    return SimpleNamespace(key=f'ABC-{number}', fields=SimpleNamespace(summary=summary or f'Задача {number}',
+                                                                       updated=updated))
+
+
+class FakeSearch:
+    """search_issues с total, ограничением размера страницы на сервере и подсчётом одновременных запросов"""
+
+    def __init__(self, total, server_max=1000, fail_at=()):
+        self.total = total
+        self.server_max = server_max
+        self.fail_at = set(fail_at)
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, jql, startAt=0, maxResults=50, fields=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if startAt in self.fail_at:
+                raise JiraError('Internal Server Error', 500)
+            size = min(maxResults, self.server_max)
+            numbers = range(startAt, min(startAt + size, self.total))
+            return ResultList([_issue(number) for number in numbers], startAt, size, self.total)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestGetAllIssues(unittest.TestCase):
+    def setUp(self):
+        self.jira = MagicMock()
+        patch('builtins.print').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _offsets(self):
+        return sorted(c.kwargs['startAt'] for c in self.jira.search_issues.call_args_list)
+
+    def test_pages_after_first_by_total(self):
+        self.jira.search_issues.side_effect = FakeSearch(total=250)
+
+        issues, complete = get_all_issues(self.jira, 'jql', page_size=100, workers=4)
+
+        self.assertTrue(complete)
+        self.assertEqual([issue.key for issue in issues], [f'ABC-{n}' for n in range(250)])
+        self.assertEqual(self._offsets(), [0, 100, 200])
+        for c in self.jira.search_issues.call_args_list:
+            self.assertEqual(c.kwargs['fields'], import_jira.SEARCH_FIELDS)
+
+    def test_single_page(self):
+        self.jira.search_issues.side_effect = FakeSearch(total=30)
+
+        self.assertEqual(len(get_all_issues(self.jira, 'jql', page_size=100)[0]), 30)
+        self.jira.search_issues.assert_called_once()
+
+    def test_server_page_limit(self):
+        # Запрошено 1000 на страницу, сервер отдаёт не больше 100
+        self.jira.search_issues.side_effect = FakeSearch(total=350, server_max=100)
+
+        issues, complete = get_all_issues(self.jira, 'jql', page_size=1000)
+
+        self.assertEqual(len(issues), 350)
+        self.assertEqual(self._offsets(), [0, 100, 200, 300])
+
+    def test_pool_is_bounded(self):
+        search = FakeSearch(total=1000)
+        self.jira.search_issues.side_effect = search
+
+        get_all_issues(self.jira, 'jql', page_size=50, workers=3)
+
+        self.assertEqual(self.jira.search_issues.call_count, 20)
+        self.assertLessEqual(search.max_running, 3)
+
+    def test_duplicates_between_pages(self):
+        pages = {
+            0: ResultList([_issue(1), _issue(2)], 0, 2, 4),
+            # Задача 2 сдвинулась на следующую страницу, пока читалась первая
+            2: ResultList([_issue(2), _issue(3)], 2, 2, 4),
+        }
+        self.jira.search_issues.side_effect = lambda jql, startAt, **kwargs: pages[startAt]
+
+        issues, complete = get_all_issues(self.jira, 'jql', page_size=2)
+
+        self.assertEqual([issue.key for issue in issues], ['ABC-1', 'ABC-2', 'ABC-3'])
+
+    def test_failed_page_is_skipped(self):
+        self.jira.search_issues.side_effect = FakeSearch(total=300, fail_at={100})
+
+        with patch('import_jira.PROVIDER') as mock_provider:
+            issues, complete = get_all_issues(self.jira, 'jql', page_size=100)
+
+        self.assertFalse(complete)
+        self.assertEqual([issue.key for issue in issues], [f'ABC-{n}' for n in [*range(100), *range(200, 300)]])
+        mock_provider.report.assert_called_once()
+
+    def test_first_page_error(self):
+        self.jira.search_issues.side_effect = JiraError('Unauthorized', 401)
+
+        with patch('import_jira.PROVIDER'):
+            self.assertEqual(get_all_issues(self.jira, 'jql'), ([], False))
+        self.jira.search_issues.assert_called_once()
+
+    def test_cloud_pages_by_token(self):
+        self.jira.deploymentType = 'Cloud'
+        pages = {
+            None: ResultList([_issue(1), _issue(2)], next_page_token='p2', is_last=False),
+            'p2': ResultList([_issue(2), _issue(3)], next_page_token='p3', is_last=False),
+            'p3': ResultList([_issue(4)], is_last=True),
+        }
+        self.jira.enhanced_search_issues.side_effect = lambda jql, nextPageToken, **kwargs: pages[nextPageToken]
+
+        issues, complete = get_all_issues(self.jira, 'jql', page_size=2)
+
+        self.assertTrue(complete)
+        self.assertEqual([issue.key for issue in issues], ['ABC-1', 'ABC-2', 'ABC-3', 'ABC-4'])
+        self.jira.search_issues.assert_not_called()
+        self.assertEqual(self.jira.enhanced_search_issues.call_args.kwargs['fields'], import_jira.SEARCH_FIELDS)
+
+    def test_cloud_page_error(self):
+        self.jira.deploymentType = 'Cloud'
+        self.jira.enhanced_search_issues.side_effect = [
+            ResultList([_issue(1)], next_page_token='p2'), JiraError('Internal Server Error', 500),
+        ]
+
+        with patch('import_jira.PROVIDER'):
+            issues, complete = get_all_issues(self.jira, 'jql')
+
+        self.assertFalse(complete)
+        self.assertEqual([issue.key for issue in issues], ['ABC-1'])
+
+
+class TestMergeTasks(unittest.TestCase):
+    def test_merge_and_expire(self):
+        tasks = {'ABC-1': 'Старое название', 'ABC-2': 'Давняя', 'ABC-3': 'Без даты'}
+        updated = {'ABC-1': '2024-03-01', 'ABC-2': '2024-01-10', 'GONE-1': '2024-03-01'}
+
+        expired = merge_tasks(tasks, updated, [_issue(1, '2024-03-05T10:00:00.000+0300', 'Новое название'),
+                                               _issue(4, '2024-03-04T09:00:00.000+0300')], '2024-02-05')
+
+        # ABC-2 вышла из окна, у ABC-3 нет даты обновления (кэш до синхронизации по метке)
+        self.assertEqual(expired, 2)
+        self.assertEqual(tasks, {'ABC-1': 'Новое название', 'ABC-4': 'Задача 4'})
+        self.assertEqual(updated, {'ABC-1': '2024-03-05', 'ABC-4': '2024-03-04'})
+
+    def test_large_merge_is_linear(self):
+        tasks = {f'ABC-{n}': 'Задача' for n in range(20000)}
+        updated = dict.fromkeys(tasks, '2024-03-01')
+        issues = [_issue(n, '2024-03-05T10:00:00.000+0300') for n in range(10000, 30000)]
+
+        self.assertEqual(merge_tasks(tasks, updated, issues, '2024-02-05'), 0)
+        self.assertEqual(len(tasks), 30000)
+
+
+class TestLoadTasksFromJira(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tasks_file = os.path.join(self.tmp_dir.name, 'tasks.json')
+        self.sync_file = os.path.join(self.tmp_dir.name, '.jirasync.json')
+        patch('import_jira.TASKS_FILE', self.tasks_file).start()
+        patch('import_jira.SYNC_FILE', self.sync_file).start()
+        patch('import_jira.load_config').start()
+        patch('storage.FSYNC', 'none').start()
+        patch('builtins.print').start()
+        patch.multiple('import_jira', JIRA_URL='https://jira', TARGET_USER='user', DAYS=30).start()
+        self.jira = MagicMock()
+        self.jira.search_issues.return_value = []
+        patch('import_jira.connect', return_value=self.jira).start()
+        self.today = date.today()
+
+    def tearDown(self):
+        patch.stopall()
+        self.tmp_dir.cleanup()
+
+    def _read(self, path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _jql(self):
+        return [c.args[0] for c in self.jira.search_issues.call_args_list]
+
+    def _day(self, days_ago):
+        return (self.today - timedelta(days=days_ago)).isoformat()
+
+    def test_first_pull_loads_whole_window(self):
+        self.jira.search_issues.side_effect = lambda jql, **kwargs: (
+            [_issue(1, self._day(2)), _issue(2, self._day(5))] if jql.startswith('assignee') else [_issue(2, self._day(5))]
+        )
+
+        load_tasks_from_jira()
+
+        window_start = self._day(30)
+        self.assertEqual(self._jql(), [
+            f'assignee = "user" AND updated >= "{window_start}" ORDER BY key',
+            f'worklogAuthor = "user" AND worklogDate >= "{window_start}" ORDER BY key',
+        ])
+        self.assertEqual(self._read(self.tasks_file), {'ABC-1': 'Задача 1', 'ABC-2': 'Задача 2'})
+        state = self._read(self.sync_file)
+        self.assertEqual(state['source'], 'https://jira|user')
+        self.assertEqual(state['updated'], {'ABC-1': self._day(2), 'ABC-2': self._day(5)})
+        self.assertEqual(datetime.fromisoformat(state['watermark']).date(), self.today)
+
+    def test_next_pull_is_incremental(self):
+        with open(self.tasks_file, 'w', encoding='utf-8') as f:
+            json.dump({'ABC-1': 'Задача 1', 'ABC-2': 'Устаревшая'}, f)
+        watermark = datetime.now() - timedelta(days=3)
+        with open(self.sync_file, 'w', encoding='utf-8') as f:
+            json.dump({'source': 'https://jira|user', 'watermark': watermark.isoformat(),
+                       'updated': {'ABC-1': self._day(10), 'ABC-2': self._day(40)}}, f)
+        self.jira.search_issues.side_effect = lambda jql, **kwargs: (
+            [_issue(3, self._day(1))] if jql.startswith('assignee') else []
+        )
+
+        load_tasks_from_jira()
+
+        since = (watermark - timedelta(days=1)).date().isoformat()
+        self.assertEqual(self._jql(), [
+            f'assignee = "user" AND updated >= "{since}" ORDER BY key',
+            f'worklogAuthor = "user" AND worklogDate >= "{self._day(30)}" AND updated >= "{since}" ORDER BY key',
+        ])
+        # ABC-1 сохранилась без повторной загрузки, ABC-2 вышла из окна days
+        self.assertEqual(self._read(self.tasks_file), {'ABC-1': 'Задача 1', 'ABC-3': 'Задача 3'})
+
+    def test_failed_pull_keeps_watermark(self):
+        watermark = (datetime.now() - timedelta(days=3)).isoformat(timespec='seconds')
+        with open(self.tasks_file, 'w', encoding='utf-8') as f:
+            json.dump({}, f)
+        with open(self.sync_file, 'w', encoding='utf-8') as f:
+            json.dump({'source': 'https://jira|user', 'watermark': watermark, 'updated': {}}, f)
+        self.jira.search_issues.side_effect = JiraError('Internal Server Error', 500)
+
+        with patch('import_jira.PROVIDER'):
+            load_tasks_from_jira()
+
+        self.assertEqual(self._read(self.sync_file)['watermark'], watermark)
+
+    def test_other_account_starts_over(self):
+        with open(self.tasks_file, 'w', encoding='utf-8') as f:
+            json.dump({'OTHER-1': 'Чужая задача'}, f)
+        with open(self.sync_file, 'w', encoding='utf-8') as f:
+            json.dump({'source': 'https://other-jira|user', 'watermark': datetime.now().isoformat(),
+                       'updated': {'OTHER-1': self._day(1)}}, f)
+
+        load_tasks_from_jira()
+
+        self.assertNotIn('AND updated >= ', self._jql()[1])
+        self.assertEqual(self._read(self.tasks_file), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import os
 import configparser
 import importlib
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open, Mock
 from init import CONFIG_FILE
@@ -188,6 +189,35 @@ class TestInitConfig(unittest.TestCase):
         # Проверяем что сообщение было выведено
         mock_print.assert_called_with("\n✅ Конфигурация сохранена в .litconfig")
 
+    @patch("builtins.print")
+    @patch("init.questionary.password")
+    @patch("init.questionary.text")
+    def test_unprompted_settings_are_kept(self, mock_text, mock_password, mock_print):
+        """Повторный lit init не теряет [storage] и ключи [jira], о которых не спрашивает"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = os.path.join(tmp_dir, ".litconfig")
+            with open(config_file, "w", encoding="utf-8") as f:
+                f.write("[user]\nemail = old@example.com\nlogin = olduser\n\n"
+                        "[jira]\nlogin = oldjira\npass = p%ss\nurl = https://old.jira\ndays = 60\n"
+                        "push_workers = 8\nhandshake_ttl = 0\nclient = jira\nsearch_page_size = 500\n\n"
+                        "[storage]\nlayout = sqlite\nfsync = full\n")
+            mock_text.side_effect = lambda prompt, **kwargs: Mock(ask=lambda: kwargs.get("default", ""))
+            mock_password.side_effect = lambda prompt, **kwargs: Mock(ask=lambda: kwargs.get("default", ""))
+
+            with patch.multiple(self.module, LIT_DIR=tmp_dir, CONFIG_FILE=config_file):
+                self.module.init_config()
+
+            config = configparser.RawConfigParser()
+            config.read(config_file, encoding="utf-8")
+
+        self.assertEqual(dict(config["storage"]), {"layout": "sqlite", "fsync": "full"})
+        self.assertEqual(config.get("jira", "push_workers"), "8")
+        self.assertEqual(config.get("jira", "handshake_ttl"), "0")
+        self.assertEqual(config.get("jira", "client"), "jira")
+        self.assertEqual(config.get("jira", "search_page_size"), "500")
+        self.assertEqual(config.get("jira", "pass"), "p%ss")
+        self.assertEqual(config.get("gitlab", "login"), "olduser")
+
 
 if __name__ == '__main__':
     unittest.main()
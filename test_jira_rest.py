@@ -0,0 +1,160 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import requests
+
+from connection import needs_reconnect
+from jira_rest import JiraError, RestClient
+from push import _push_error
+from pusher import RATE_LIMITED
+
+
+def _response(status=200, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode() if body is not None else b''
+    response.headers.update(headers or {})
+    response.url = 'https://jira/rest/api/2/test'
+    return response
+
+
+class TestRestClient(unittest.TestCase):
+    def setUp(self):
+        self.mock_request = patch('requests.Session.request').start()
+        self.mock_request.return_value = _response(body={})
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _client(self, **kwargs):
+        return RestClient('https://jira/', ('user', 'secret'), get_server_info=False, **kwargs)
+
+    def _call(self, index=-1):
+        args, kwargs = self.mock_request.call_args_list[index]
+        return args[0], args[1], kwargs
+
+    def test_constructor_makes_no_requests(self):
+        self._client()
+        self.mock_request.assert_not_called()
+
+    def test_server_info_on_request(self):
+        self.mock_request.return_value = _response(body={'versionNumbers': [9, 4, 0], 'deploymentType': 'Server'})
+
+        client = RestClient('https://jira', ('user', 'secret'), timeout=5)
+
+        self.assertEqual(client._version, (9, 4, 0))
+        method, url, kwargs = self._call()
+        self.assertEqual((method, url), ('GET', 'https://jira/rest/api/2/serverInfo'))
+        self.assertEqual(kwargs['timeout'], 5)
+
+    def test_search_issues(self):
+        self.mock_request.return_value = _response(body={
+            'startAt': 0, 'maxResults': 2, 'total': 5,
+            'issues': [{'key': 'ABC-1', 'fields': {'summary': 'Первая'}},
+                       {'key': 'ABC-2', 'fields': {'summary': 'Вторая'}}],
+        })
+
+        issues = self._client().search_issues('project = ABC', maxResults=2, fields='key,summary',
+                                              validate_query=False)
+
+        self.assertEqual([issue.key for issue in issues], ['ABC-1', 'ABC-2'])
+        self.assertEqual(issues[1].fields.summary, 'Вторая')
+        self.assertEqual(issues.total, 5)
+        method, url, kwargs = self._call()
+        self.assertEqual(url, 'https://jira/rest/api/2/search')
+        self.assertEqual(kwargs['params'], {'jql': 'project = ABC', 'startAt': 0, 'maxResults': 2,
+                                            'validateQuery': 'false', 'fields': 'key,summary'})
+
+    def test_cloud_search_uses_search_jql(self):
+        self.mock_request.return_value = _response(body={
+            'issues': [{'key': 'ABC-1', 'fields': {'summary': 'Первая'}}], 'nextPageToken': 'next', 'isLast': False,
+        })
+        client = self._client()
+        client.deploymentType = 'Cloud'
+
+        issues = client.search_issues('project = ABC', maxResults=1, fields='key,summary', validate_query=False)
+
+        self.assertEqual([issue.key for issue in issues], ['ABC-1'])
+        self.assertEqual(issues.nextPageToken, 'next')
+        method, url, kwargs = self._call()
+        self.assertEqual(url, 'https://jira/rest/api/2/search/jql')
+        self.assertEqual(kwargs['params'], {'jql': 'project = ABC', 'maxResults': 1, 'fields': 'key,summary'})
+
+        client.enhanced_search_issues('project = ABC', nextPageToken='next', maxResults=1)
+        self.assertEqual(self._call()[2]['params'], {'jql': 'project = ABC', 'maxResults': 1, 'nextPageToken': 'next'})
+
+        # Поиска search со смещением в Cloud нет
+        with self.assertRaises(JiraError):
+            client.search_issues('project = ABC', startAt=50)
+
+    def test_add_worklog_returns_id(self):
+        self.mock_request.return_value = _response(201, {'id': 10001})
+        started = datetime(2024, 3, 5, 10, 0, tzinfo=timezone(timedelta(hours=3)))
+
+        worklog_id = self._client().add_worklog('ABC-1', timeSpent='1h', comment='Работа', started=started)
+
+        self.assertEqual(worklog_id, '10001')
+        method, url, kwargs = self._call()
+        self.assertEqual((method, url), ('POST', 'https://jira/rest/api/2/issue/ABC-1/worklog'))
+        self.assertEqual(json.loads(kwargs['data']), {'timeSpent': '1h', 'comment': 'Работа',
+                                                      'started': '2024-03-05T10:00:00.000+0300'})
+
+    def test_worklogs_and_current_user(self):
+        client = self._client()
+        client._myself = {'name': 'user', 'key': 'user'}
+        self.mock_request.return_value = _response(body={'worklogs': [
+            {'id': '1', 'author': {'name': 'user'}, 'started': '2024-03-05T10:00:00.000+0300', 'timeSpentSeconds': 3600},
+        ]})
+
+        worklogs = client.worklogs('ABC-1')
+
+        self.assertEqual(client.current_user(), 'user')
+        self.assertEqual(worklogs[0].author.name, 'user')
+        self.assertEqual(worklogs[0].timeSpentSeconds, 3600)
+        # current_user() взят из проверки подключения, запрос только за ворклогами
+        self.mock_request.assert_called_once()
+
+    def test_worklogs_are_paged(self):
+        worklog = {'id': '1', 'author': {'name': 'user'}, 'started': '2024-03-05T10:00:00.000+0300',
+                   'timeSpentSeconds': 3600}
+        self.mock_request.side_effect = [
+            _response(body={'startAt': 0, 'maxResults': 2, 'total': 3, 'worklogs': [worklog] * 2}),
+            _response(body={'startAt': 2, 'maxResults': 2, 'total': 3, 'worklogs': [worklog]}),
+        ]
+
+        worklogs = self._client().worklogs('ABC-1', startedAfter=1000, startedBefore=2000)
+
+        self.assertEqual(len(worklogs), 3)
+        self.assertEqual([self._call(index)[2]['params'] for index in range(2)], [
+            {'startAt': 0, 'startedAfter': 1000, 'startedBefore': 2000},
+            {'startAt': 2, 'startedAfter': 1000, 'startedBefore': 2000},
+        ])
+
+    def test_error_response(self):
+        self.mock_request.return_value = _response(404, {'errorMessages': ['Задача не существует'], 'errors': {}})
+
+        with self.assertRaises(JiraError) as ctx:
+            self._client().worklogs('ABC-404')
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(ctx.exception.text, 'Задача не существует')
+
+    def test_errors_are_handled_like_library_errors(self):
+        self.assertTrue(needs_reconnect(JiraError('Unauthorized', 401)))
+        self.assertFalse(needs_reconnect(JiraError('Not Found', 404)))
+
+        error = _push_error(JiraError('Too Many Requests', 429, response=_response(429, headers={'Retry-After': '7'})))
+        self.assertEqual((error.kind, error.retry_after), (RATE_LIMITED, 7))
+
+    def test_library_is_not_imported(self):
+        # В тестах библиотека jira может быть уже загружена, поэтому проверка в отдельном процессе
+        code = "import sys, push; sys.exit('jira' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__))).returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
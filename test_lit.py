@@ -3,15 +3,48 @@ import io
 import os
 import contextlib
 import argparse
-from unittest.mock import patch, mock_open
-from datetime import datetime
-from lit import WorklogManager, WorklogCompleter, TASKS, COMMITS, LIT_STORE, LIT_HISTORY
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import Counter
+from unittest.mock import patch, mock_open, call
+from datetime import date, datetime
+from tzlocal import get_localzone
+import lit
+import parser
+from lit import WorklogManager, WorklogCompleter, TASKS, COMMITS
 from prompt_toolkit.document import Document
+from jira_rest import JiraError
+from pusher import UNAUTHORIZED, PushError
 
 TASKS["TASK-123"] = "Test Task"
 
+# Файлы lit, которые тесты перенаправляют во временную директорию
+LIT_PATHS = {
+    'LIT_STORE': '.litstore', 'LIT_HISTORY': '.lithistory', 'LIT_SHARDS_DIR': 'store', 'LIT_DB': 'lit.db', 'LIT_PUSH_JOURNAL': '.litpush.journal',
+    'LIT_AMEND_FILE': 'amend.lithistory', 'CONFIG_FILE': '.litconfig',
+}
+
+
+def isolate_lit(test, layout='flat'):
+    """
+    Пути lit и настройки [storage] во временной директории на время теста:
+    настоящий ~/.lit и его .litconfig (раскладка, fsync) тесты не видят и не трогают.
+    Патчи снимаются через addCleanup, поэтому patch.stopall() в tearDown их не снимает.
+    """
+    tmp_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp_dir.cleanup)
+    stack = contextlib.ExitStack()
+    test.addCleanup(stack.close)
+    stack.enter_context(patch.multiple('lit', LIT_DIR=tmp_dir.name,
+                                       **{name: os.path.join(tmp_dir.name, file) for name, file in LIT_PATHS.items()}))
+    stack.enter_context(patch.multiple('storage', FSYNC='none', LAYOUT=layout))
+    return tmp_dir.name
+
 class TestWorklogManager(unittest.TestCase):
     def setUp(self):
+        isolate_lit(self)
         self.manager = WorklogManager()
         self.manager.entries = []
 
@@ -49,23 +82,30 @@ class TestWorklogManager(unittest.TestCase):
         self.manager.add_entry(['TASK-123', '1', message, '-d', '21.02.2024', '-t', '10:00'])
 
 
-        expected_content = (
-            "15.01.2023 [14:30 - 21:30] TASK-123 7h `Описание работы`\n"
-            "15.01.2023 [14:30 - 16:00] TASK-123 1,5h `Описание работы`\n"
-            "15.01.2023 [14:30 - 15:00] TASK-123 0,5h `Описание работы`\n"
-            "20.02.2024 [10:00 - 10:15] TASK-123 15m `Описание работы`\n"
-            "20.02.2024 [10:00 - 18:00] TASK-123 1d `Описание работы`\n"
-            "21.02.2024 [10:00 - 11:00] TASK-123 1h `первая строка\\n        вторая строка`\n"
-        )
-        mock_file().write.assert_called_with(expected_content)
-
-    @patch('lit.add_worklog')  # Добавляем мок для add_worklog
+        expected_lines = [
+            "15.01.2023 [14:30 - 21:30] TASK-123 7h `Описание работы`\n",
+            "15.01.2023 [14:30 - 16:00] TASK-123 1,5h `Описание работы`\n",
+            "15.01.2023 [14:30 - 15:00] TASK-123 0,5h `Описание работы`\n",
+            "20.02.2024 [10:00 - 10:15] TASK-123 15m `Описание работы`\n",
+            "20.02.2024 [10:00 - 18:00] TASK-123 1d `Описание работы`\n",
+            "21.02.2024 [10:00 - 11:00] TASK-123 1h `первая строка\\n        вторая строка`\n",
+        ]
+        # Каждая запись дописывается в конец файла, без перезаписи всего .litstore
+        mock_file().write.assert_has_calls([call(line) for line in expected_lines])
+        mock_file.assert_any_call(lit.LIT_STORE, 'a', encoding='utf-8')
+        self.assertNotIn(call(lit.LIT_STORE, 'w', encoding='utf-8'), mock_file.call_args_list)
+        self.assertEqual(self.manager.entries, [line.rstrip('\n') for line in expected_lines])
+
+    @patch('lit.find_missing_issues', return_value=set())
+    @patch('storage.os.fsync')
+    @patch('storage.os.replace')
+    @patch('lit.send_worklog')  # Добавляем мок для add_worklog
     @patch('lit.jira_connect')  # Добавляем мок для jira_connect
     @patch('lit.PromptSession')
     @patch('builtins.print')
     @patch('lit.datetime')
     @patch('builtins.open', new_callable=mock_open)
-    def test_push_command(self, mock_file, mock_datetime, mock_print, mock_prompt_session, mock_jira_connect, mock_add_worklog): # mock_add_worklog
+    def test_push_command(self, mock_file, mock_datetime, mock_print, mock_prompt_session, mock_jira_connect, mock_send_worklog, mock_replace, mock_fsync, mock_find_missing): # mock_send_worklog
         # Настройка моков
         mock_datetime.side_effect = lambda *args, **kw: self.MockedDateTime(*args, **kw)
         mock_datetime.now.return_value = self.MockedDateTime.now()
@@ -76,7 +116,7 @@ class TestWorklogManager(unittest.TestCase):
         mock_jira = mock_jira_connect.return_value
 
         # Мокируем успешный вызов add_worklog
-        mock_add_worklog.return_value = ('73546546', None)
+        mock_send_worklog.return_value = ('73546546', None)
 
         # Добавляем запись
         self.manager.add_entry(['TASK-123', '2', 'Тестовая запись'])
@@ -89,26 +129,25 @@ class TestWorklogManager(unittest.TestCase):
         # Выполняем push
         self.manager.push_entries()
 
-        # Проверяем, что .litstore сохранен с пустой строкой (после успешной отправки)
-        mock_file.assert_any_call(LIT_STORE, 'w', encoding='utf-8')
+        # Проверяем, что .litstore атомарно сохранен с пустой строкой (после успешной отправки)
+        tmp_store = f"{lit.LIT_STORE}.{os.getpid()}.tmp"
+        mock_file.assert_any_call(tmp_store, 'w', encoding='utf-8')
         mock_file().write.assert_any_call("\n")
+        mock_replace.assert_called_once_with(tmp_store, lit.LIT_STORE)
 
         # Проверяем, что .lithistory содержит успешную запись с ID
-        mock_file.assert_any_call(LIT_HISTORY, 'a', encoding='utf-8')
+        mock_file.assert_any_call(lit.LIT_HISTORY, 'a', encoding='utf-8')
         expected_history_entry = "15.01.2023 [14:30 - 16:30] TASK-123 2h `Тестовая запись` # 73546546\n"
         mock_file().write.assert_any_call(expected_history_entry)
 
         # Проверяет, что метод подключения к Jira был вызван ровно 1 раз.
         mock_jira_connect.assert_called_once()
         # Проверяет, что метод добавления ворклога вызывается с правильными параметрами
-        mock_add_worklog.assert_called_once_with(
-            mock_jira,
-            'TASK-123',
-            '2h',
-            'Тестовая запись',
-            '15.01.2023',
-            '14:30'
-        )
+        mock_send_worklog.assert_called_once()
+        jira, payload = mock_send_worklog.call_args.args
+        self.assertIs(jira, mock_jira)
+        self.assertEqual((payload.code, payload.time_spent, payload.comment), ('TASK-123', '2h', 'Тестовая запись'))
+        self.assertEqual(payload.started, datetime(2023, 1, 15, 14, 30, tzinfo=get_localzone()))
 
         # Проверяем вывод перед подтверждением
         mock_print.assert_any_call("\nПодготовленные записи:")
@@ -179,6 +218,636 @@ class TestWorklogManager(unittest.TestCase):
         # Проверяем, что запись корректно записана в файл
         mock_file().write.assert_called_with(expected_entry)
 
+class TestWorklogStoreFile(unittest.TestCase):
+    """Работа с настоящим файлом .litstore во временной директории"""
+    def setUp(self):
+        isolate_lit(self)
+        self.store = lit.LIT_STORE
+        patch('builtins.print').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _read_store(self):
+        with open(self.store, encoding='utf-8') as f:
+            return f.read()
+
+    def test_add_appends_to_existing_store(self):
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.write("10.01.2023 [10:00 - 11:00] TASK-123 1h `Старая запись`")  # Без перевода строки в конце
+
+        manager = WorklogManager()
+        manager.add_entry(['TASK-123', '2', 'Новая запись', '-d', '11.01.2023', '-t', '10:00'])
+
+        self.assertEqual(self._read_store(), (
+            "10.01.2023 [10:00 - 11:00] TASK-123 1h `Старая запись`\n"
+            "11.01.2023 [10:00 - 12:00] TASK-123 2h `Новая запись`\n"
+        ))
+
+    def test_concurrent_appends_are_not_lost(self):
+        first = WorklogManager()
+        second = WorklogManager()
+
+        first.add_entry(['TASK-123', '1', 'Первый процесс', '-d', '11.01.2023', '-t', '10:00'])
+        second.add_entry(['TASK-123', '1', 'Второй процесс', '-d', '11.01.2023', '-t', '11:00'])
+
+        # Второй менеджер видит запись первого, а полная перезапись её не теряет
+        self.assertEqual(len(second.entries), 2)
+        first.entries = first.entries[1:]
+        first.add_entry(['TASK-123', '1', 'Снова первый', '-d', '11.01.2023', '-t', '12:00'])
+        first._save()
+
+        self.assertEqual(self._read_store(), (
+            "11.01.2023 [11:00 - 12:00] TASK-123 1h `Второй процесс`\n"
+            "11.01.2023 [12:00 - 13:00] TASK-123 1h `Снова первый`\n"
+        ))
+
+    def test_external_rewrite_is_reloaded(self):
+        manager = WorklogManager()
+        manager.add_entry(['TASK-123', '1', 'Первая', '-d', '11.01.2023', '-t', '10:00'])
+        manager.add_entry(['TASK-123', '1', 'Вторая', '-d', '11.01.2023', '-t', '11:00'])
+
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.write("11.01.2023 [10:00 - 11:00] TASK-123 1h `Правка`\n")
+
+        manager.add_entry(['TASK-123', '1', 'Третья', '-d', '11.01.2023', '-t', '12:00'])
+        self.assertEqual(manager.entries, [
+            "11.01.2023 [10:00 - 11:00] TASK-123 1h `Правка`",
+            "11.01.2023 [12:00 - 13:00] TASK-123 1h `Третья`",
+        ])
+
+
+    def test_entries_are_ordered_by_date_and_start(self):
+        lines = [
+            "# 01.01.2023 [09:00 - 10:00] TASK-1 1h `Отключена`",
+            "мусор",
+            "16.01.2023 [09:00 - 10:00] TASK-1 1h `Третья`",
+            "15.01.2023 [14:30 - 15:30] TASK-1 1h `Вторая`",
+            "15.01.2023 [09:00 - 10:00] TASK-1 1h `Первая`",
+        ]
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+        manager = WorklogManager()
+        # Отключённые записи стоят на своей дате, строки без даты - в конце
+        self.assertEqual(manager.entries, [lines[0], lines[4], lines[3], lines[2], lines[1]])
+
+        manager.add_entry(['TASK-1', '1', 'Вставка', '-d', '15.01.2023', '-t', '12:00'])
+        self.assertEqual(manager.entries[2:4], ["15.01.2023 [12:00 - 13:00] TASK-1 1h `Вставка`", lines[3]])
+
+
+    def test_insert_does_not_reparse_loaded_lines(self):
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.writelines(f"{day:02}.01.2023 [10:00 - 11:00] TASK-123 1h `Запись {day}`\n" for day in range(1, 29))
+        manager = WorklogManager()
+
+        with patch('parser.pars_line', wraps=parser.pars_line) as mock_pars_line:
+            manager.add_entry(['TASK-123', '1', 'Вставка', '-d', '15.01.2023', '-t', '12:00'])
+
+        # Бинарный поиск сравнивает уже разобранные строки, регулярное выражение - только для новой
+        self.assertEqual(mock_pars_line.call_count, 1)
+        self.assertEqual(manager.entries[15], "15.01.2023 [12:00 - 13:00] TASK-123 1h `Вставка`")
+
+
+class TestStatusDateRange(unittest.TestCase):
+    def setUp(self):
+        isolate_lit(self)
+        self.mock_print = patch('builtins.print').start()
+
+        self.manager = WorklogManager()
+        for date, time in [('03.02.2023', '10:00'), ('01.02.2023', '12:00'), ('02.02.2023', '09:00'),
+                           ('01.02.2023', '09:00'), ('05.02.2023', '10:00')]:
+            self.manager.add_entry(['TASK-123', '1', f'Запись {date} {time}', '-d', date, '-t', time])
+        self.mock_print.reset_mock()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _printed_dates(self):
+        return [c.args[0].strip() for c in self.mock_print.call_args_list
+                if c.args and c.args[0].startswith('\n') and c.args[0].strip()[:1].isdigit()]
+
+    def test_entries_are_kept_sorted(self):
+        self.assertEqual([line[:17] for line in self.manager.entries], [
+            '01.02.2023 [09:00', '01.02.2023 [12:00', '02.02.2023 [09:00', '03.02.2023 [10:00', '05.02.2023 [10:00'
+        ])
+
+    def test_status_interactive_range(self):
+        self.manager.show_status(['--from', '02.02.2023', '--to', '03.02.2023'])
+        self.assertEqual(self._printed_dates(), ['02.02.2023', '03.02.2023'])
+
+    def test_status_cli_open_range(self):
+        self.manager.show_status({'command': 'status', 'date_from': datetime(2023, 2, 3).date(), 'date_to': None})
+        self.assertEqual(self._printed_dates(), ['03.02.2023', '05.02.2023'])
+
+        self.mock_print.reset_mock()
+        self.manager.show_status({'command': 'status', 'date_from': None, 'date_to': datetime(2023, 2, 1).date()})
+        self.assertEqual(self._printed_dates(), ['01.02.2023'])
+
+    def test_status_empty_range(self):
+        self.manager.show_status(['--from', '10.02.2023'])
+        self.mock_print.assert_any_call("Нет записей за выбранный период.")
+
+    def test_status_invalid_date(self):
+        with patch('sys.stderr', new_callable=io.StringIO):
+            self.manager.show_status(['--from', '2023-02-10'])
+        self.assertEqual(self._printed_dates(), [])
+
+
+class TestMonthlyLayout(unittest.TestCase):
+    def setUp(self):
+        isolate_lit(self, layout='monthly')
+        self.shards_dir = lit.LIT_SHARDS_DIR
+        self.mock_print = patch('builtins.print').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_add_and_status(self):
+        manager = WorklogManager()
+        manager.add_entry(['TASK-123', '2', 'Январь', '-d', '15.01.2023', '-t', '10:00'])
+        manager.add_entry(['TASK-123', '1', 'Февраль', '-d', '01.02.2023', '-t', '10:00'])
+
+        self.assertTrue(os.path.exists(os.path.join(self.shards_dir, '2023-01.litstore')))
+        self.assertTrue(os.path.exists(os.path.join(self.shards_dir, '2023-02.litstore')))
+
+        WorklogManager().show_status()
+        self.mock_print.assert_any_call("\n15.01.2023")
+        self.mock_print.assert_any_call("   [10:00 - 12:00] TASK-123 2h `Январь`")
+        self.mock_print.assert_any_call("\n01.02.2023")
+
+    def test_migration_only_by_command(self):
+        line = "15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь`"
+        with open(lit.LIT_STORE, 'w', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+        manager = WorklogManager()
+        manager.show_status()
+
+        # Чтение не переносит файлы, записи берутся из плоского .litstore
+        self.assertFalse(os.path.exists(self.shards_dir))
+        self.assertEqual(manager.entries, [line])
+
+        manager.transfer_store(migrate=True)
+
+        self.assertFalse(os.path.exists(lit.LIT_STORE))
+        self.assertTrue(os.path.exists(os.path.join(self.shards_dir, '2023-01.litstore')))
+        self.assertEqual(WorklogManager().entries, [line])
+
+    def test_shards_are_used_when_setting_is_lost(self):
+        manager = WorklogManager()
+        manager.add_entry(['TASK-123', '2', 'Январь', '-d', '15.01.2023', '-t', '10:00'])
+
+        # layout пропал из .litconfig, а записи уже разнесены по месяцам
+        with patch('storage.LAYOUT', 'flat'):
+            manager = WorklogManager()
+
+        self.assertEqual(manager.backend.layout, 'monthly')
+        self.assertEqual(manager.entries, ["15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь`"])
+        self.assertFalse(os.path.exists(lit.LIT_STORE))
+
+
+class TestSqliteLayout(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = isolate_lit(self, layout='sqlite')
+        self.store = lit.LIT_STORE
+        self.history = lit.LIT_HISTORY
+        patch('lit.find_missing_issues', return_value=set()).start()
+        self.mock_print = patch('builtins.print').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    @patch('lit.send_worklog', return_value=('1001', None))
+    @patch('lit.jira_connect')
+    @patch('lit.PromptSession')
+    def test_push_and_history(self, mock_prompt_session, mock_jira_connect, mock_send_worklog):
+        mock_prompt_session.return_value.prompt.return_value = 'y'
+        manager = WorklogManager()
+        manager.add_entry(['TASK-123', '2', 'Январь', '-d', '15.01.2023', '-t', '10:00'])
+        manager.add_entry(['TASK-7', '1', 'Февраль', '-d', '01.02.2023', '-t', '10:00'])
+        self.assertFalse(os.path.exists(self.store))
+
+        manager.push_entries()
+        self.assertEqual(WorklogManager().entries, [])
+
+        self.mock_print.reset_mock()
+        manager.show_history(['--code', 'task-123', '--to', '31.01.2023'])
+        self.mock_print.assert_any_call("  15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь` # 1001")
+        self.mock_print.assert_any_call("\nЗаписей: 1, всего 2h 0m")
+
+    def test_migration_only_by_command(self):
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write("10.01.2023 [10:00 - 11:00] TASK-1 1h `Отправлена` # 1001\n")
+
+        WorklogManager().show_history([])
+        # Чтение истории не создаёт базу и не переименовывает файлы
+        self.assertFalse(os.path.exists(lit.LIT_DB))
+        self.assertTrue(os.path.exists(self.history))
+
+        WorklogManager().transfer_store(migrate=True)
+
+        self.assertTrue(os.path.exists(lit.LIT_DB))
+        self.assertFalse(os.path.exists(self.history))
+        self.mock_print.reset_mock()
+        WorklogManager().show_history([])
+        self.mock_print.assert_any_call("  10.01.2023 [10:00 - 11:00] TASK-1 1h `Отправлена` # 1001")
+
+    def test_database_is_used_when_setting_is_lost(self):
+        WorklogManager().add_entry(['TASK-123', '2', 'Январь', '-d', '15.01.2023', '-t', '10:00'])
+
+        with patch('storage.LAYOUT', 'flat'):
+            manager = WorklogManager()
+
+        self.assertEqual(manager.backend.layout, 'sqlite')
+        self.assertEqual(manager.entries, ["15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь`"])
+
+    def test_import_needs_both_files(self):
+        history = ["10.01.2023 [10:00 - 11:00] TASK-1 1h `Отправлена` # 1001"]
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write("\n".join(history) + "\n")
+        manager = WorklogManager()
+        manager.transfer_store(migrate=True)
+        import_dir = os.path.join(self.tmp_dir, 'import')
+        os.makedirs(import_dir)
+        with open(os.path.join(import_dir, '.litstore'), 'w', encoding='utf-8') as f:
+            f.write("15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь`\n")
+
+        with patch('lit.PromptSession') as mock_prompt_session:
+            manager.store_command(['--import', import_dir])
+
+        mock_prompt_session.assert_not_called()
+        self.assertEqual(manager.entries, [])
+        self.assertEqual(manager.backend.read_history(), history)
+
+    def test_store_command_in_interactive_mode(self):
+        export_dir = os.path.join(self.tmp_dir, 'export')
+        os.makedirs(export_dir)
+        manager = WorklogManager()
+        manager.add_entry(['TASK-123', '2', 'Январь', '-d', '15.01.2023', '-t', '10:00'])
+
+        manager.store_command(['--export', export_dir])
+        with open(os.path.join(export_dir, '.litstore'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь`\n")
+
+        with patch('sys.stderr', new_callable=io.StringIO):
+            manager.store_command(['--export', export_dir, '--migrate'])
+        self.mock_print.assert_any_call("⛔ Ошибка: argument --migrate: not allowed with argument --export")
+
+    def test_export_is_lossless(self):
+        lines = ["15.01.2023 [10:00 - 12:00] TASK-123 2h `Январь`", "мусор"]
+        history = ["10.01.2023 [10:00 - 11:00] TASK-1 1h `Отправлена` # 1001"]
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write("\n".join(history) + "\n")
+
+        manager = WorklogManager()
+        manager.transfer_store(migrate=True)
+        self.assertIsInstance(manager.backend, lit.SqliteBackend)
+        export_dir = os.path.join(self.tmp_dir, 'export')
+        os.makedirs(export_dir)
+        manager.transfer_store(export_dir=export_dir)
+
+        with open(os.path.join(export_dir, '.litstore'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "\n".join(lines) + "\n")
+        with open(os.path.join(export_dir, '.lithistory'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "\n".join(history) + "\n")
+
+
+class TestPushJournal(unittest.TestCase):
+    LINES = [
+        "15.01.2023 [10:00 - 11:00] TASK-1 1h `Первая`",
+        "15.01.2023 [11:00 - 12:00] TASK-1 1h `Вторая`",
+        "15.01.2023 [12:00 - 13:00] TASK-2 1h `Третья`",
+    ]
+
+    def setUp(self):
+        isolate_lit(self)
+        self.store = lit.LIT_STORE
+        self.history = lit.LIT_HISTORY
+        self.journal = lit.LIT_PUSH_JOURNAL
+        patch('lit.PUSH_WORKERS', 1).start()
+        patch('lit.load_config').start()
+        self.mock_jira_connect = patch('lit.jira_connect').start()
+        self.mock_find_missing = patch('lit.find_missing_issues', return_value=set()).start()
+        patch('lit.PromptSession').start().return_value.prompt.return_value = 'y'
+        self.mock_print = patch('builtins.print').start()
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.write("\n".join(self.LINES) + "\n")
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _read(self, path):
+        with open(path, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def test_interrupted_push_is_journaled(self):
+        with patch('lit.send_worklog', side_effect=[('1001', None), KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                WorklogManager().push_entries()
+
+        # Хранилище не тронуто, но журнал знает об отправленной записи
+        self.assertEqual(self._read(self.store), self.LINES)
+        self.assertEqual(len(self._read(self.journal)), 1)
+
+        with patch('lit.send_worklog', side_effect=[('1002', None), ('1003', None)]) as mock_send_worklog:
+            WorklogManager().push_entries()
+
+        sent = [c.args[1].started.strftime('%d.%m.%Y %H:%M') for c in mock_send_worklog.call_args_list]
+        self.assertEqual(sent, ['15.01.2023 11:00', '15.01.2023 12:00'])
+        ids = ('1001', '1002', '1003')
+        self.assertEqual(self._read(self.history), [f"{line} # {id}" for line, id in zip(self.LINES, ids)])
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_resume_does_not_duplicate_history(self):
+        acked = f"{self.LINES[0]} # 1001"
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write(acked + "\n")
+        with open(self.journal, 'w', encoding='utf-8') as f:
+            f.write(f'{{"line": "{self.LINES[0]}", "id": "1001", "error": null}}\n{{"line": "обрыв')
+
+        with patch('lit.PromptSession') as mock_prompt_session:
+            mock_prompt_session.return_value.prompt.return_value = 'N'
+            manager = WorklogManager()
+            manager.push_entries()
+
+        self.assertEqual(manager.entries, self.LINES[1:])
+        self.assertEqual(self._read(self.history), [acked])
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_already_pushed_entries_are_skipped(self):
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write(f"{self.LINES[0]} # 1001\n")
+        with open(self.store, 'a', encoding='utf-8') as f:
+            f.write(self.LINES[2] + "\n")  # Скопировали строку в lit edit
+
+        with patch('lit.send_worklog', return_value=('1002', None)) as mock_send_worklog:
+            WorklogManager().push_entries()
+
+        self.assertEqual(mock_send_worklog.call_count, 2)
+        self.assertEqual(self._read(self.store), [
+            f"# {self.LINES[0]} # Уже отправлено в Jira (есть в истории)",
+            f"# {self.LINES[2]} # Повтор записи выше, отправлена одна",
+        ])
+        self.mock_print.assert_any_call("Пропущено уже отправленных записей: 1")
+        self.mock_print.assert_any_call("Пропущено повторов в этой отправке: 1")
+
+    def test_missing_issues_are_disabled_before_push(self):
+        self.mock_find_missing.return_value = {'TASK-1'}
+
+        with patch('lit.send_worklog', return_value=('1003', None)) as mock_send_worklog:
+            WorklogManager().push_entries()
+
+        # Коды проверяются одним вызовом, записи несуществующей задачи в Jira не уходят
+        self.assertEqual(self.mock_find_missing.call_args.args[1], {'TASK-1', 'TASK-2'})
+        self.assertEqual(mock_send_worklog.call_count, 1)
+        self.assertEqual(self._read(self.store), [
+            f"# {self.LINES[0]} # Задача не найдена в Jira или нет доступа",
+            f"# {self.LINES[1]} # Задача не найдена в Jira или нет доступа",
+        ])
+        self.assertEqual(self._read(self.history), [f"{self.LINES[2]} # 1003"])
+
+    def test_retried_line_is_saved_without_old_error(self):
+        with open(self.store, 'w', encoding='utf-8') as f:
+            f.write(f"{self.LINES[2]} # Issue does not exist\n")
+
+        with patch('lit.send_worklog', return_value=('1003', None)):
+            WorklogManager().push_entries()
+
+        self.assertEqual(self._read(self.history), [f"{self.LINES[2]} # 1003"])
+
+    def test_unauthorized_validation_aborts_push(self):
+        self.mock_find_missing.side_effect = JiraError('Unauthorized', 401)
+
+        # Живая проверка подключения тоже не прошла
+        with patch('lit.jira_recheck', return_value=None) as mock_recheck, \
+                patch('lit.send_worklog') as mock_send_worklog:
+            WorklogManager().push_entries()
+
+        mock_recheck.assert_called_once_with(self.mock_jira_connect.return_value)
+        mock_send_worklog.assert_not_called()
+        self.assertEqual(self._read(self.store), self.LINES)
+        self.assertFalse(os.path.exists(self.history))
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_validation_retried_after_live_check(self):
+        self.mock_find_missing.side_effect = [JiraError('Unauthorized', 401), set()]
+
+        with patch('lit.jira_recheck') as mock_recheck, \
+                patch('lit.send_worklog', return_value=('1001', None)) as mock_send_worklog:
+            WorklogManager().push_entries()
+
+        checked = mock_recheck.return_value
+        self.assertIs(self.mock_find_missing.call_args.args[0], checked)
+        self.assertEqual(mock_send_worklog.call_count, 3)
+        self.assertIs(mock_send_worklog.call_args.args[0], checked)
+
+    def test_unauthorized_send_aborts_before_store_rewrite(self):
+        with patch('lit.jira_recheck', return_value=None) as mock_recheck, \
+                patch('lit.send_worklog', side_effect=[('1001', None)] + [(None, PushError('Unauthorized', UNAUTHORIZED))] * 2):
+            WorklogManager().push_entries()
+
+        mock_recheck.assert_called_once()
+        self.assertEqual(self._read(self.store), self.LINES)
+        self.assertFalse(os.path.exists(self.history))
+        # Отправленную запись перенесёт в историю следующий push
+        self.assertTrue(os.path.exists(self.journal))
+
+    def test_reconcile_skips_worklogs_already_in_jira(self):
+        existing = Counter({('TASK-1', '15.01.2023', '11:00', 60): 1, ('TASK-2', '15.01.2023', '12:00', 30): 1})
+
+        with patch('lit.fetch_user_worklogs', return_value=existing) as mock_fetch, \
+                patch('lit.send_worklog', return_value=('1001', None)) as mock_send_worklog:
+            WorklogManager().push_entries(['--reconcile'])
+
+        self.assertEqual(mock_fetch.call_args.args[1:], ({'TASK-1', 'TASK-2'}, date(2023, 1, 15), date(2023, 1, 15)))
+        # Совпала только вторая запись: у третьей в Jira другая длительность
+        self.assertEqual(mock_send_worklog.call_count, 2)
+        self.assertEqual(self._read(self.store), [
+            f"# {self.LINES[1]} # Уже есть в Jira (ворклог с той же датой, началом и длительностью)",
+        ])
+        self.mock_print.assert_any_call("Пропущено записей, которые уже есть в Jira: 1")
+
+    def test_reconcile_period_ignores_invalid_dates(self):
+        with open(self.store, 'a', encoding='utf-8') as f:
+            f.write("32.01.2023 [10:00 - 11:00] TASK-1 1h `Неверная дата`\n")
+
+        with patch('lit.fetch_user_worklogs', return_value=Counter()) as mock_fetch, \
+                patch('lit.send_worklog', return_value=('1001', None)):
+            WorklogManager().push_entries(['--reconcile'])
+
+        self.assertEqual(mock_fetch.call_args.args[2:], (date(2023, 1, 15), date(2023, 1, 15)))
+
+    def test_filtered_push_leaves_other_entries_untouched(self):
+        with open(self.store, 'a', encoding='utf-8') as f:
+            f.write("16.01.2023 [10:00 - 11:00] TASK-1 1h `Следующий день`\n")
+
+        cases = [
+            (['--code', 'task-2'], [2]),
+            (['--to', '15.01.2023', '--grep', '^в'], [1]),
+            (['--from', '16.01.2023'], [3]),
+        ]
+        lines = self._read(self.store)
+        for args, sent in cases:
+            with self.subTest(args=args):
+                with open(self.store, 'w', encoding='utf-8') as f:
+                    f.write("\n".join(lines) + "\n")
+                with patch('lit.send_worklog', return_value=('1001', None)) as mock_send_worklog:
+                    WorklogManager().push_entries(args)
+
+                self.assertEqual(mock_send_worklog.call_count, len(sent))
+                # Невыбранные строки не комментируются и не переписываются как ошибки
+                self.assertEqual(self._read(self.store), [line for i, line in enumerate(lines) if i not in sent])
+
+    def test_filter_without_matches_does_not_push(self):
+        with patch('lit.send_worklog') as mock_send_worklog:
+            WorklogManager().push_entries(['--code', 'TASK-404'])
+        mock_send_worklog.assert_not_called()
+        self.mock_print.assert_any_call("Нет записей для отправки по заданным условиям.")
+        self.assertEqual(self._read(self.store), self.LINES)
+
+    def test_background_push_keeps_entries_added_meanwhile(self):
+        manager = WorklogManager()
+        started, resume = threading.Event(), threading.Event()
+
+        def send(*args):
+            started.set()
+            resume.wait(5)
+            return '1001', None
+
+        with patch('lit.send_worklog', side_effect=send):
+            manager.push_entries(['--bg', '--code', 'TASK-2'])
+            self.assertTrue(started.wait(5))
+            self.assertTrue(manager.push_running())
+            # Пока идёт отправка, интерактивный режим принимает новые записи
+            manager.add_entry(['TASK-3', '1', 'Во время отправки', '-d', '16.01.2023', '-t', '10:00'])
+            resume.set()
+            manager.wait_push()
+
+        added = "16.01.2023 [10:00 - 11:00] TASK-3 1h `Во время отправки`"
+        self.assertEqual(self._read(self.store), self.LINES[:2] + [added])
+        self.assertEqual(manager.entries, self.LINES[:2] + [added])
+        self.assertEqual(self._read(self.history), [f"{self.LINES[2]} # 1001"])
+        self.mock_print.assert_any_call("\nФоновая отправка завершена.")
+
+    def test_plan_does_not_touch_jira(self):
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write(f"{self.LINES[0]} # 1001\n")
+
+        with patch('lit.send_worklog') as mock_send_worklog, \
+                patch('connection.PROVIDER.connect_calls', return_value=2):
+            WorklogManager().push_entries(['--plan'])
+
+        mock_send_worklog.assert_not_called()
+        self.mock_jira_connect.assert_not_called()
+        self.mock_print.assert_any_call("\nTASK-1: ворклогов 1")
+        self.mock_print.assert_any_call("\nЗаписей к отправке: 2, задач: 2")
+        self.mock_print.assert_any_call(
+            "HTTP-запросов: 5 (подключение 2, проверка задач 1, отправка 2), без учёта повторов после временных ошибок"
+        )
+        self.assertEqual(self._read(self.store), self.LINES)
+
+    def test_plan_skips_entries_with_invalid_date(self):
+        with open(self.store, 'a', encoding='utf-8') as f:
+            f.write("32.01.2023 [10:00 - 11:00] TASK-2 1h `Неверная дата`\n")
+
+        with patch('connection.PROVIDER.connect_calls', return_value=2):
+            WorklogManager().push_entries(['--plan'])
+
+        self.mock_print.assert_any_call("\nЗаписей к отправке: 3, задач: 2")
+        self.mock_print.assert_any_call("Не будут отправлены из-за неверной даты или времени: 1")
+        self.mock_print.assert_any_call(
+            "HTTP-запросов: 6 (подключение 2, проверка задач 1, отправка 3), без учёта повторов после временных ошибок"
+        )
+
+    def test_worklogs_are_not_fetched_without_reconcile(self):
+        with patch('lit.fetch_user_worklogs') as mock_fetch, patch('lit.send_worklog', return_value=('1001', None)):
+            WorklogManager().push_entries()
+        mock_fetch.assert_not_called()
+
+
+class TestAmendRevert(unittest.TestCase):
+    HISTORY = [
+        "15.01.2023 [10:00 - 12:00] TASK-1 2h `Первая` # 1001",
+        "15.01.2023 [12:00 - 13:00] TASK-2 1h `Вторая` # 1002",
+        "16.01.2023 [10:00 - 11:00] TASK-1 1h `Третья` # 1003",
+    ]
+
+    def setUp(self):
+        isolate_lit(self)
+        self.history = lit.LIT_HISTORY
+        patch('lit.PUSH_WORKERS', 1).start()
+        patch('lit.load_config').start()
+        patch('lit.jira_connect').start()
+        patch('lit.PromptSession').start().return_value.prompt.return_value = 'y'
+        self.mock_print = patch('builtins.print').start()
+        with open(self.history, 'w', encoding='utf-8') as f:
+            f.write("\n".join(self.HISTORY) + "\n")
+
+    def tearDown(self):
+        patch.stopall()
+
+    def _read_history(self):
+        with open(self.history, encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def _editor(self, edit):
+        def run(cmd, **kwargs):
+            with open(cmd[1], encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            with open(cmd[1], 'w', encoding='utf-8') as f:
+                f.write("\n".join(edit(lines)) + "\n")
+        return patch('lit.subprocess.run', side_effect=run)
+
+    def test_amend_sends_put_for_changed_lines(self):
+        amended = "15.01.2023 [10:00 - 11:30] TASK-1 1,5h `Первая` # 1001"
+        with self._editor(lambda lines: [amended, lines[1]]), \
+                patch('lit.update_worklog', return_value=('1001', None)) as mock_update:
+            WorklogManager().amend_history(['--code', 'TASK-1'])
+
+        mock_update.assert_called_once()
+        payload = mock_update.call_args.args[1]
+        self.assertEqual((payload.worklog_id, payload.time_spent), ('1001', '1,5h'))
+        self.assertEqual(self._read_history(), [amended] + self.HISTORY[1:])
+        self.assertFalse(os.path.exists(lit.LIT_AMEND_FILE))
+
+    def test_amend_cannot_move_worklog_to_other_issue(self):
+        with self._editor(lambda lines: [lines[0].replace('TASK-2', 'TASK-9')]), \
+                patch('lit.update_worklog') as mock_update:
+            WorklogManager().amend_history(['--code', 'TASK-2'])
+
+        mock_update.assert_not_called()
+        self.assertEqual(self._read_history(), self.HISTORY)
+
+    def test_revert_deletes_selected_worklogs(self):
+        with patch('lit.delete_worklog', side_effect=[('1001', None), (None, 'Forbidden')]) as mock_delete:
+            WorklogManager().revert_history(['--code', 'TASK-1'])
+
+        self.assertEqual([c.args[1].worklog_id for c in mock_delete.call_args_list], ['1001', '1003'])
+        # Ворклог, который не удалось удалить, остаётся в истории
+        self.assertEqual(self._read_history(), self.HISTORY[1:])
+        self.mock_print.assert_any_call("Ворклогов удалено: 1, с ошибками: 1")
+
+    def test_revert_finds_id_after_old_error(self):
+        # Строка, отправленная повторно до того, как lit стал убирать из неё прежнюю ошибку
+        with open(self.history, 'a', encoding='utf-8') as f:
+            f.write("17.01.2023 [10:00 - 11:00] TASK-3 1h `Повтор` # Issue does not exist # 10001\n")
+
+        with patch('lit.delete_worklog', return_value=('10001', None)) as mock_delete:
+            WorklogManager().revert_history(['--code', 'TASK-3'])
+
+        self.assertEqual(mock_delete.call_args.args[1].worklog_id, '10001')
+        self.assertEqual(self._read_history(), self.HISTORY)
+
+    def test_revert_requires_filter(self):
+        with patch('lit.delete_worklog') as mock_delete:
+            WorklogManager().revert_history([])
+        mock_delete.assert_not_called()
+        self.assertEqual(self._read_history(), self.HISTORY)
+
+
 class TestWorklogCompleter(unittest.TestCase):
     def setUp(self):
         self.completer = WorklogCompleter()
@@ -203,7 +872,7 @@ class TestWorklogCompleter(unittest.TestCase):
         completions = list(self.completer.get_completions(doc, None))
         self.assertEqual(
             {c.text for c in completions},
-            {'add', 'status', 'push', 'pull', 'edit', 'init'}
+            {'add', 'status', 'push', 'history', 'amend', 'revert', 'pull', 'edit', 'init', 'store'}
         )
 
     def test_command_completion_partial(self):
@@ -326,6 +995,9 @@ class TestVersionCommand(unittest.TestCase):
 
 
 class TestInteractiveVersion(unittest.TestCase):
+    def setUp(self):
+        isolate_lit(self)
+
     @patch('lit.patch_stdout', new=lambda: contextlib.nullcontext())
     @patch('lit.PromptSession')
     @patch('sys.stdout', new_callable=io.StringIO)
@@ -352,6 +1024,24 @@ class TestInteractiveVersion(unittest.TestCase):
         self.assertIn("lit v1.2.3", output)
 
 
+class TestLazyImports(unittest.TestCase):
+    def test_import_does_not_load_integrations(self):
+        """Импорт lit не должен подгружать jira, requests, bs4 и prompt_toolkit"""
+        code = (
+            "import sys, lit; "
+            "print(','.join(m for m in ('jira', 'requests', 'bs4', 'tzlocal', 'prompt_toolkit', 'questionary') "
+            "if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        self.assertEqual(result.stdout.strip(), '')
+
+
 class TestHelpCommand(unittest.TestCase):
 
     def test_cli_help(self):
@@ -378,6 +1068,9 @@ class TestHelpCommand(unittest.TestCase):
 
 
 class TestInteractiveHelp(unittest.TestCase):
+    def setUp(self):
+        isolate_lit(self)
+
     @patch('lit.patch_stdout', new=lambda: contextlib.nullcontext())
     @patch('lit.PromptSession')
     @patch('sys.stdout', new_callable=io.StringIO)
@@ -408,6 +1101,7 @@ class TestInteractiveHelp(unittest.TestCase):
 
 class TestValidation(unittest.TestCase):
     def setUp(self):
+        isolate_lit(self)
         self.manager = WorklogManager()
         self.manager.entries = []
         self.mock_print = patch('builtins.print').start()
@@ -492,6 +1186,7 @@ class TestValidation(unittest.TestCase):
 
 class TestPullEntries(unittest.TestCase):
     def setUp(self):
+        isolate_lit(self)
         self.manager = WorklogManager()
 
     @patch('lit.load_tasks_from_jira')
@@ -569,18 +1264,19 @@ class TestPullEntries(unittest.TestCase):
 
 class TestEditEntries(unittest.TestCase):
     def setUp(self):
-        self.manager = WorklogManager()
-        self.mock_print = patch('builtins.print').start()
-        self.mock_subprocess = patch('subprocess.run').start()
-        self.mock_load = patch.object(WorklogManager, '_load').start()
-
-        # Мокируем глобальные переменные
+        isolate_lit(self)
+        # Мокируем глобальные переменные (путь к файлу хранилище получает при создании менеджера)
         self.patcher = patch.multiple('lit',
                                       LIT_STORE='/fake/path/.litstore',
                                       CUSTOM_EDITOR=''
                                       )
         self.patcher.start()
 
+        self.manager = WorklogManager()
+        self.mock_print = patch('builtins.print').start()
+        self.mock_subprocess = patch('subprocess.run').start()
+        self.mock_load = patch.object(WorklogManager, '_load').start()
+
     def tearDown(self):
         patch.stopall()
         self.patcher.stop()
@@ -0,0 +1,137 @@
+import types
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import parser
+from models import WorklogEntry
+from parser import ParseCache, history_line, pars_line, pars_store, pars_store_iter
+
+
+class TestParsStore(unittest.TestCase):
+    def test_valid_line(self):
+        line = "15.01.2023 [14:30 - 16:30] TASK-123 1h 30m `Тестовая запись`"
+        entry = pars_store([line])[0]
+
+        self.assertIsNone(entry.disabled)
+        self.assertEqual(entry.date, '15.01.2023')
+        self.assertEqual(entry.start, '14:30')
+        self.assertEqual(entry.end, '16:30')
+        self.assertEqual(entry.code, 'TASK-123')
+        self.assertEqual(entry.duration, '1h 30m')
+        self.assertEqual(entry.message, 'Тестовая запись')
+        self.assertIsNone(entry.error)
+        self.assertEqual(entry.log, line)
+
+        # Числовые поля считаются при разборе
+        self.assertEqual(entry.date_ord, date(2023, 1, 15).toordinal())
+        self.assertEqual(entry.start_min, 14 * 60 + 30)
+        self.assertEqual(entry.end_min, 16 * 60 + 30)
+        self.assertEqual(entry.minutes, 90)
+
+    def test_disabled_line_with_error(self):
+        line = "# 15.01.2023 [14:30 - 16:30] TASK-123 2h `Тестовая запись` # Задача не найдена"
+        entry = pars_store([line])[0]
+
+        self.assertEqual(entry.disabled, '#')
+        self.assertEqual(entry.error, 'Задача не найдена')
+
+    def test_invalid_lines(self):
+        lines = [
+            "просто текст",
+            "15.01.2023 TASK-123 2h `без времени`",
+            "[14:30 - 16:30] TASK-123 2h `без даты`",
+            "15.01.2023 [14:30 - 16:30] TASK-123 2h без кавычек",
+        ]
+        for entry, line in zip(pars_store(lines), lines):
+            with self.subTest(line=line):
+                self.assertEqual(entry, WorklogEntry.invalid(line))
+                self.assertEqual(entry.disabled, 'X')
+                self.assertIsNone(entry.date)
+
+    def test_iter_is_lazy(self):
+        lines = ["15.01.2023 [14:30 - 16:30] TASK-123 2h `Первая`", "мусор"]
+        entries = pars_store_iter(lines)
+
+        self.assertIsInstance(entries, types.GeneratorType)
+        self.assertEqual(next(entries).message, 'Первая')
+        self.assertEqual(next(entries).disabled, 'X')
+
+
+class TestWorklogEntry(unittest.TestCase):
+    def test_duration_minutes(self):
+        cases = {
+            '2h': 120,
+            '1,5h': 90,
+            '0.5h': 30,
+            '15m': 15,
+            '1d': 480,
+            '1h 30m': 90,
+        }
+        for duration, minutes in cases.items():
+            with self.subTest(duration=duration):
+                line = f"15.01.2023 [10:00 - 11:00] TASK-123 {duration} `Запись`"
+                self.assertEqual(pars_store([line])[0].minutes, minutes)
+
+    def test_invalid_date(self):
+        entry = pars_store(["31.02.2023 [09:00 - 10:00] TASK-1 1h `Нет такой даты`"])[0]
+        self.assertIsNone(entry.disabled)
+        self.assertGreater(entry.date_ord, date.max.toordinal())
+
+    def test_worklog_id(self):
+        cases = {
+            "# 10001": '10001',
+            "# 10001 ": '10001',
+            "# Issue does not exist # 10001": '10001',
+            "# Задача не найдена в Jira или нет доступа": None,
+            "# Ошибка 500": None,
+            "": None,
+        }
+        for comment, worklog_id in cases.items():
+            with self.subTest(comment=comment):
+                line = f"15.01.2023 [10:00 - 11:00] TASK-1 1h `Запись` {comment}".rstrip()
+                self.assertEqual(pars_line(line).worklog_id, worklog_id)
+
+    def test_history_line_drops_old_error(self):
+        line = "15.01.2023 [10:00 - 11:00] TASK-1 1h `Запись`"
+        self.assertEqual(history_line(line, '10001'), f"{line} # 10001")
+        self.assertEqual(history_line(f"{line} # Issue does not exist", '10001'), f"{line} # 10001")
+        # Строка, которую не удалось разобрать, сохраняется как есть
+        self.assertEqual(history_line("мусор # x", '10001'), "мусор # x # 10001")
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.lines = [f"15.01.2023 [10:00 - 11:00] TASK-{i} 1h `Запись {i}`" for i in range(100)]
+
+    def test_entry_reuses_parsed_line(self):
+        cache = ParseCache()
+        parsed = cache.parse(self.lines)
+
+        self.assertIs(cache.entry(self.lines[10]), parsed[10])
+        new_line = "16.01.2023 [10:00 - 11:00] TASK-1 1h `Новая`"
+        self.assertIs(cache.entry(new_line), cache.entry(new_line))
+
+    def test_only_changed_line_is_parsed(self):
+        cache = ParseCache()
+        first = cache.parse(self.lines)
+
+        edited = list(self.lines)
+        edited[50] = "15.01.2023 [10:00 - 12:00] TASK-50 2h `Исправлено`"
+        with patch('parser.pars_line', wraps=parser.pars_line) as mock_parse:
+            second = cache.parse(edited)
+
+        mock_parse.assert_called_once_with(edited[50])
+        self.assertIs(second[0], first[0])
+        self.assertEqual(second[50].minutes, 120)
+
+    def test_same_list_and_stat_is_not_walked(self):
+        cache = ParseCache()
+        first = cache.parse(self.lines, (1, 1000))
+        self.assertIs(cache.parse(self.lines, (1, 1000)), first)
+        self.assertIsNot(cache.parse(self.lines, (2, 1000)), first)
+        self.assertIsNot(cache.parse(list(self.lines), (2, 1000)), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,20 @@
+import json
 import unittest
-from unittest.mock import MagicMock
-from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from datetime import date, datetime, timedelta, timezone
 from tzlocal import get_localzone
 from jira.exceptions import JIRAError
+from requests.exceptions import ConnectionError, ReadTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
 # Импортируем тестируемые функции
-from push import add_worklog
+from connection import CONNECT_CALLS
+from jira_rest import RestClient
+from push import (
+    delete_worklog, fetch_user_worklogs, find_missing_issues, plan_calls, send_worklog, update_worklog,
+)
+from pusher import NETWORK, RATE_LIMITED, WorklogPayload
 
 
 class TestAddWorklog(unittest.TestCase):
@@ -26,6 +35,7 @@ class TestAddWorklog(unittest.TestCase):
             f"{self.day} {self.time}",
             "%d.%m.%Y %H:%M"
         ).replace(tzinfo=get_localzone())
+        self.payload = WorklogPayload(self.issue, self.time_spent, self.comment, self.expected_start_time)
 
     def test_add_worklog_success(self):
         """Тест успешного добавления рабочего журнала"""
@@ -34,14 +44,7 @@ class TestAddWorklog(unittest.TestCase):
         self.mock_jira.add_worklog.return_value = expected_id
 
         # Вызов тестируемой функции
-        result_id, error = add_worklog(
-            self.mock_jira,
-            self.issue,
-            self.time_spent,
-            self.comment,
-            self.day,
-            self.time
-        )
+        result_id, error = send_worklog(self.mock_jira, self.payload)
 
         # Проверки
         self.assertEqual(result_id, expected_id)
@@ -62,14 +65,7 @@ class TestAddWorklog(unittest.TestCase):
         self.mock_jira.add_worklog.side_effect = JIRAError(status_code=404, text=error_message)
 
         # Вызов тестируемой функции
-        result_id, error = add_worklog(
-            self.mock_jira,
-            self.issue,
-            self.time_spent,
-            self.comment,
-            self.day,
-            self.time
-        )
+        result_id, error = send_worklog(self.mock_jira, self.payload)
 
         # Проверки
         self.assertIsNone(result_id)
@@ -85,11 +81,179 @@ class TestAddWorklog(unittest.TestCase):
         self.mock_jira.add_worklog.side_effect = Exception(error_message)
 
         # Вызов тестируемой функции
-        result_id, error = add_worklog(
-            self.mock_jira,
-            self.issue,
-            self.time_spent,
-            self.comment,
-            self.day,
-            self.time
+        result_id, error = send_worklog(self.mock_jira, self.payload)
+
+    def test_add_worklog_rate_limited(self):
+        """429 помечается для повтора вместе с Retry-After"""
+        response = MagicMock(headers={'Retry-After': '12'})
+        self.mock_jira.add_worklog.side_effect = JIRAError(status_code=429, text="Too Many Requests", response=response)
+
+        result_id, error = send_worklog(self.mock_jira, self.payload)
+
+        self.assertIsNone(result_id)
+        self.assertEqual(error, "Too Many Requests")
+        self.assertEqual(error.kind, RATE_LIMITED)
+        self.assertEqual(error.retry_after, 12.0)
+
+    def test_add_worklog_connection_refused(self):
+        """Соединение не установлено - запрос можно повторить"""
+        reason = NewConnectionError(None, "Connection refused")
+        self.mock_jira.add_worklog.side_effect = ConnectionError(MaxRetryError(None, '/worklog', reason))
+
+        result_id, error = send_worklog(self.mock_jira, self.payload)
+
+        self.assertIsNone(result_id)
+        self.assertEqual(error.kind, NETWORK)
+
+    def test_add_worklog_read_timeout_is_not_retried(self):
+        """Ответ не дождались - ворклог мог быть создан, повтор дал бы дубль"""
+        self.mock_jira.add_worklog.side_effect = ReadTimeout("Read timed out")
+
+        result_id, error = send_worklog(self.mock_jira, self.payload)
+
+        self.assertIsNone(result_id)
+        self.assertIsNone(getattr(error, 'kind', None))
+
+
+class TestFindMissingIssues(unittest.TestCase):
+    def setUp(self):
+        self.mock_jira = MagicMock()
+        self.mock_jira.search_issues.side_effect = lambda jql, **kwargs: [
+            MagicMock(key=key) for key in jql[len('key in ('):-1].split(', ') if key != 'PROJ-404'
+        ]
+
+    def test_codes_are_checked_in_chunks(self):
+        codes = {f"PROJ-{i}" for i in range(1, 6)} | {'PROJ-404'}
+
+        self.assertEqual(find_missing_issues(self.mock_jira, codes, chunk_size=4), {'PROJ-404'})
+        self.assertEqual(self.mock_jira.search_issues.call_count, 2)
+        for c in self.mock_jira.search_issues.call_args_list:
+            # Несуществующий ключ не должен ронять весь запрос
+            self.assertFalse(c.kwargs['validate_query'])
+            self.assertEqual(c.kwargs['fields'], 'key')
+
+    def test_key_case_and_garbage(self):
+        self.assertEqual(find_missing_issues(self.mock_jira, {'proj-1', 'PROJ-1) OR (x'}), {'PROJ-1) OR (x'})
+        self.mock_jira.search_issues.assert_called_once()
+        self.assertEqual(self.mock_jira.search_issues.call_args.args[0], 'key in (PROJ-1)')
+
+    def test_search_failure_skips_validation(self):
+        self.mock_jira.search_issues.side_effect = JIRAError(status_code=500, text='Internal Server Error')
+        with patch('builtins.print'):
+            self.assertIsNone(find_missing_issues(self.mock_jira, {'PROJ-1'}))
+
+    def test_auth_and_network_errors_are_raised(self):
+        for error in (JIRAError(status_code=401, text='Unauthorized'), ConnectionError('Connection reset')):
+            with self.subTest(error=type(error).__name__):
+                self.mock_jira.search_issues.side_effect = error
+                with patch('push.PROVIDER') as mock_provider, self.assertRaises(type(error)):
+                    find_missing_issues(self.mock_jira, {'PROJ-1'})
+                mock_provider.report.assert_called_once_with(self.mock_jira, error)
+
+
+class TestFetchUserWorklogs(unittest.TestCase):
+    def _worklog(self, author, started, seconds):
+        started = started.replace(tzinfo=get_localzone()).strftime('%Y-%m-%dT%H:%M:%S.000%z')
+        return SimpleNamespace(author=SimpleNamespace(name=author), started=started, timeSpentSeconds=seconds)
+
+    def test_only_current_user_worklogs_are_counted(self):
+        mock_jira = MagicMock()
+        mock_jira.current_user.return_value = 'me'
+        mock_jira.worklogs.side_effect = lambda code: {
+            'PROJ-1': [self._worklog('me', datetime(2023, 1, 15, 10, 0), 5400),
+                       self._worklog('colleague', datetime(2023, 1, 15, 12, 0), 3600)],
+            'PROJ-2': [self._worklog('me', datetime(2023, 1, 16, 9, 30), 1800)] * 2,
+        }[code]
+
+        existing = fetch_user_worklogs(mock_jira, {'PROJ-1', 'PROJ-2'}, workers=2)
+
+        self.assertEqual(existing, {
+            ('PROJ-1', '15.01.2023', '10:00', 90): 1,
+            ('PROJ-2', '16.01.2023', '09:30', 30): 2,
+        })
+
+    def test_worklogs_are_requested_for_pending_days(self):
+        mock_jira = MagicMock(spec=RestClient)
+        mock_jira.current_user.return_value = 'me'
+        mock_jira.worklogs.return_value = [self._worklog('me', datetime(2023, 1, 15, 0, 0), 3600)]
+
+        existing = fetch_user_worklogs(mock_jira, {'PROJ-1'}, date(2023, 1, 15), date(2023, 1, 16))
+
+        zone = get_localzone()
+        mock_jira.worklogs.assert_called_once_with(
+            'PROJ-1',
+            startedAfter=int(datetime(2023, 1, 15, tzinfo=zone).timestamp() * 1000) - 1,
+            startedBefore=int(datetime(2023, 1, 17, tzinfo=zone).timestamp() * 1000),
         )
+        self.assertEqual(existing, {('PROJ-1', '15.01.2023', '00:00', 60): 1})
+
+    def test_failed_issue_is_skipped(self):
+        mock_jira = MagicMock()
+        mock_jira.worklogs.side_effect = JIRAError(status_code=500, text='Internal Server Error')
+        with patch('builtins.print'):
+            self.assertEqual(fetch_user_worklogs(mock_jira, {'PROJ-1'}), {})
+
+
+class TestSendWorklog(unittest.TestCase):
+    def test_prebuilt_payload_is_sent_as_is(self):
+        mock_jira = MagicMock()
+        mock_jira.add_worklog.return_value = '1001'
+        started = datetime(2023, 1, 15, 10, 0, tzinfo=get_localzone())
+
+        self.assertEqual(send_worklog(mock_jira, WorklogPayload('PROJ-1', '1h', 'Текст', started)), ('1001', None))
+        mock_jira.add_worklog.assert_called_once_with('PROJ-1', timeSpent='1h', comment='Текст', started=started)
+
+    def test_invalid_start_is_not_sent(self):
+        mock_jira = MagicMock()
+        worklog_id, error = send_worklog(mock_jira, WorklogPayload('PROJ-1', '1h', 'Текст', None))
+        self.assertIsNone(worklog_id)
+        self.assertTrue(error)
+        mock_jira.add_worklog.assert_not_called()
+
+    @patch('push.PROVIDER.connect_calls', return_value=CONNECT_CALLS)
+    def test_plan_calls(self, mock_connect_calls):
+        started = datetime(2023, 1, 15, 10, 0, tzinfo=get_localzone())
+        payloads = [WorklogPayload('PROJ-1', '1h', '', started)] * 3
+        self.assertEqual(plan_calls({'PROJ-1', 'PROJ-2'}, payloads),
+                         {'connect': CONNECT_CALLS, 'validate': 1, 'worklogs': 3})
+        # Запись с неверной датой или временем не отправляется
+        payloads[1] = WorklogPayload('PROJ-1', '1h', '', None)
+        self.assertEqual(plan_calls({'PROJ-1'}, payloads)['worklogs'], 2)
+        codes = {f"PROJ-{i}" for i in range(150)}
+        self.assertEqual(plan_calls(codes, [], reconcile=True),
+                         {'connect': CONNECT_CALLS, 'validate': 2, 'worklogs': 0, 'reconcile': 150})
+
+        # Подключение уже есть или его проверка в кэше
+        mock_connect_calls.return_value = 0
+        self.assertEqual(plan_calls({'PROJ-1'}, [])['connect'], 0)
+
+
+class TestAmendRevert(unittest.TestCase):
+    def setUp(self):
+        self.mock_jira = MagicMock()
+        self.mock_jira._get_url.side_effect = lambda path: f"https://jira/rest/api/2/{path}"
+        started = datetime(2023, 1, 15, 10, 0, tzinfo=timezone(timedelta(hours=3)))
+        self.payload = WorklogPayload('PROJ-1', '1h 30m', 'Исправлено', started, worklog_id='1001')
+
+    def test_update_is_single_put(self):
+        self.assertEqual(update_worklog(self.mock_jira, self.payload), ('1001', None))
+
+        self.mock_jira._session.put.assert_called_once()
+        url = self.mock_jira._session.put.call_args.args[0]
+        body = json.loads(self.mock_jira._session.put.call_args.kwargs['data'])
+        self.assertEqual(url, "https://jira/rest/api/2/issue/PROJ-1/worklog/1001")
+        self.assertEqual(body, {'timeSpent': '1h 30m', 'comment': 'Исправлено',
+                                'started': '2023-01-15T10:00:00.000+0300'})
+        self.mock_jira._session.get.assert_not_called()
+
+    def test_delete_is_single_delete(self):
+        self.assertEqual(delete_worklog(self.mock_jira, self.payload), ('1001', None))
+        self.mock_jira._session.delete.assert_called_once_with("https://jira/rest/api/2/issue/PROJ-1/worklog/1001")
+
+    def test_rate_limit_is_retryable(self):
+        response = MagicMock(headers={'Retry-After': '5'})
+        self.mock_jira._session.delete.side_effect = JIRAError(status_code=429, text='Too Many Requests',
+                                                               response=response)
+        worklog_id, error = delete_worklog(self.mock_jira, self.payload)
+        self.assertIsNone(worklog_id)
+        self.assertEqual((error.kind, error.retry_after), (RATE_LIMITED, 5.0))
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from parser import pars_line
+from pusher import (
+    NETWORK, RATE_LIMITED, RETRY_POLICIES, UNAVAILABLE, PushError, RetryPolicy,
+    build_payloads, group_by_issue, parse_retry_after, push_concurrently, send_with_retries,
+)
+
+
+def _entries(codes):
+    return [pars_line(f"15.01.2023 [10:{i:02d} - 11:00] {code} 1h `Запись {i}`") for i, code in enumerate(codes)]
+
+
+class TestPushConcurrently(unittest.TestCase):
+    def test_group_by_issue(self):
+        entries = _entries(['A-1', 'B-1', 'A-1', 'C-1', 'B-1'])
+        self.assertEqual(group_by_issue(entries), [[0, 2], [1, 4], [3]])
+
+    def test_results_keep_original_order(self):
+        entries = _entries(['A-1', 'B-1', 'C-1', 'A-1', 'D-1', 'B-1', 'E-1', 'A-1'])
+
+        def send(entry):
+            time.sleep(random.uniform(0, 0.01))
+            return entry.message, None
+
+        results = push_concurrently(entries, send, workers=4)
+        self.assertEqual(results, [(entry.message, None, 1) for entry in entries])
+
+    def test_same_issue_is_serialized(self):
+        entries = _entries(['A-1', 'B-1'] * 5)
+        active = {}
+        overlaps = []
+        lock = threading.Lock()
+
+        def send(entry):
+            with lock:
+                active[entry.code] = active.get(entry.code, 0) + 1
+                if active[entry.code] > 1:
+                    overlaps.append(entry.code)
+            time.sleep(0.005)
+            with lock:
+                active[entry.code] -= 1
+            return '1', None
+
+        push_concurrently(entries, send, workers=4)
+        self.assertEqual(overlaps, [])
+
+    def test_different_issues_run_in_parallel(self):
+        # Обе задачи должны одновременно дойти до барьера, иначе он сломается по таймауту
+        barrier = threading.Barrier(2, timeout=5)
+
+        def send(entry):
+            barrier.wait()
+            return '1', None
+
+        results = push_concurrently(_entries(['A-1', 'B-1']), send, workers=2)
+        self.assertEqual(results, [('1', None, 1), ('1', None, 1)])
+
+    def test_exception_becomes_error(self):
+        def send(entry):
+            if entry.message == 'Запись 0':
+                raise RuntimeError('Обрыв соединения')
+            return '1', None
+
+        results = push_concurrently(_entries(['A-1', 'A-1']), send, workers=1)
+        self.assertEqual(results, [(None, 'Обрыв соединения', 1), ('1', None, 1)])
+
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        self.entry = _entries(['A-1'])[0]
+        self.delays = []
+
+    def _send(self, *responses):
+        responses = iter(responses)
+        return lambda entry: next(responses)
+
+    def test_transient_error_is_retried(self):
+        send = self._send((None, PushError('Service Unavailable', UNAVAILABLE)), ('1001', None))
+        self.assertEqual(send_with_retries(send, self.entry, sleep=self.delays.append), ('1001', None, 2))
+        self.assertEqual(len(self.delays), 1)
+
+    def test_permanent_error_is_not_retried(self):
+        send = self._send((None, PushError('Задача не найдена')))
+        self.assertEqual(send_with_retries(send, self.entry, sleep=self.delays.append),
+                         (None, 'Задача не найдена', 1))
+        self.assertEqual(self.delays, [])
+
+    def test_attempts_are_limited_per_error_kind(self):
+        error = PushError('Connection refused', NETWORK)
+        send = self._send(*[(None, error)] * 10)
+
+        id, err, attempts = send_with_retries(send, self.entry, sleep=self.delays.append)
+
+        self.assertIsNone(id)
+        self.assertIs(err, error)
+        self.assertEqual(attempts, RETRY_POLICIES[NETWORK].attempts)
+
+    def test_retry_after_is_honored_for_all_threads(self):
+        send = self._send((None, PushError('Too Many Requests', RATE_LIMITED, retry_after=7)), ('1001', None))
+        with patch('pusher.time.monotonic', return_value=100.0):
+            result = send_with_retries(send, self.entry, sleep=self.delays.append)
+        self.assertEqual(result, ('1001', None, 2))
+        self.assertEqual(self.delays, [7.0])
+
+    def test_backoff_is_exponential_with_jitter(self):
+        policy = RetryPolicy(attempts=5, base_delay=1, max_delay=6)
+        for attempt, backoff in [(1, 1), (2, 2), (3, 4), (4, 6)]:
+            with self.subTest(attempt=attempt):
+                delay = policy.delay(attempt)
+                self.assertGreaterEqual(delay, backoff / 2)
+                self.assertLessEqual(delay, backoff)
+        self.assertEqual(policy.delay(1, retry_after=30), 30)
+
+    def test_parse_retry_after(self):
+        now = datetime(2024, 3, 1, 12, 0, 0, tzinfo=timezone.utc)
+        self.assertEqual(parse_retry_after('15'), 15.0)
+        self.assertEqual(parse_retry_after('Fri, 01 Mar 2024 12:00:30 GMT', now), 30.0)
+        self.assertIsNone(parse_retry_after('завтра'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_push_reports_attempts(self):
+        entries = _entries(['A-1', 'B-1'])
+        responses = {
+            'A-1': iter([(None, PushError('Bad Gateway', UNAVAILABLE)), ('1', None)]),
+            'B-1': iter([('2', None)]),
+        }
+        results = push_concurrently(entries, lambda entry: next(responses[entry.code]),
+                                    workers=2, sleep=self.delays.append)
+        self.assertEqual(results, [('1', None, 2), ('2', None, 1)])
+
+
+class TestBuildPayloads(unittest.TestCase):
+    def test_zone_is_resolved_once(self):
+        zone = timezone(timedelta(hours=3))
+        entries = _entries(['A-1', 'B-1', 'A-1'])
+        entries.append(pars_line("16.01.2023 [09:05 - 10:00] C-1 1h `Две\\nстроки`"))
+
+        with patch('tzlocal.get_localzone', return_value=zone) as mock_zone:
+            payloads = build_payloads(entries)
+
+        mock_zone.assert_called_once()
+        self.assertEqual([p.code for p in payloads], ['A-1', 'B-1', 'A-1', 'C-1'])
+        self.assertEqual(payloads[1].started, datetime(2023, 1, 15, 10, 1, tzinfo=zone))
+        self.assertEqual(payloads[3].started, datetime(2023, 1, 16, 9, 5, tzinfo=zone))
+        self.assertEqual((payloads[3].time_spent, payloads[3].comment), ('1h', 'Две\nстроки'))
+
+    def test_invalid_date_is_left_to_sender(self):
+        payload, = build_payloads([pars_line("32.01.2023 [10:00 - 11:00] A-1 1h `Нет такой даты`")],
+                                  zone=timezone.utc)
+        self.assertIsNone(payload.started)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from shards import ShardedStore, UNDATED, shard_key
+from storage import file_stat, read_lines_from
+from utils import load_dict
+
+OLD_SENT = "# 10.01.2024 [10:00 - 11:00] OLD-1 1h `Старая ошибка` # Задача не найдена"
+OLD_PENDING = "12.02.2024 [10:00 - 11:00] OLD-2 1h `Забыли отправить`"
+CURRENT = "05.03.2024 [10:00 - 11:00] CUR-1 1h `Текущий месяц`"
+TODAY = date(2024, 3, 20)
+
+
+class TestShardedStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, 'store')
+        self.flat = os.path.join(self.tmp_dir.name, '.litstore')
+        patch('storage.FSYNC', 'none').start()
+        with open(self.flat, 'w', encoding='utf-8') as f:
+            f.write("\n".join([OLD_SENT, OLD_PENDING, CURRENT, "мусор"]) + "\n")
+
+        self.store = ShardedStore(self.directory)
+        self.store.migrate(self.flat)
+        patch('builtins.print').start()
+        patch('shards.date', wraps=date, **{'today.return_value': TODAY}).start()
+
+    def tearDown(self):
+        patch.stopall()
+        self.tmp_dir.cleanup()
+
+    def _shard_lines(self, shard):
+        return read_lines_from(self.store.shard_file(shard), 0)
+
+    def test_shard_key(self):
+        self.assertEqual(shard_key(CURRENT), '2024-03')
+        self.assertEqual(shard_key(OLD_SENT), '2024-01')
+        self.assertEqual(shard_key("мусор"), UNDATED)
+
+    def test_migrate(self):
+        self.assertFalse(os.path.exists(self.flat))
+        self.assertTrue(os.path.exists(self.flat + '.migrated'))
+        self.assertEqual(load_dict(self.store.manifest_file), {
+            '2024-01': {'count': 1, 'pending': 0},
+            '2024-02': {'count': 1, 'pending': 1},
+            '2024-03': {'count': 1, 'pending': 1},
+            UNDATED: {'count': 1, 'pending': 0},
+        })
+
+    def test_load_skips_dead_months(self):
+        lines = self.store.load()
+        self.assertCountEqual(lines, [OLD_PENDING, CURRENT, "мусор"])
+        self.assertNotIn('2024-01', self.store.loaded)
+        self.assertEqual(self.store.archived_count(), 1)
+
+    def test_append_to_archived_month_keeps_old_lines(self):
+        lines = self.store.load()
+        new_line = "11.01.2024 [10:00 - 11:00] OLD-3 1h `Дописали задним числом`"
+
+        extra = self.store.append([new_line])
+
+        self.assertEqual(extra, [OLD_SENT])
+        self.assertEqual(self._shard_lines('2024-01'), [OLD_SENT, new_line])
+        self.assertEqual(load_dict(self.store.manifest_file)['2024-01'], {'count': 2, 'pending': 1})
+
+        # Последующая перезапись не теряет старую строку месяца
+        lines = lines + extra + [new_line]
+        self.store.save(lines)
+        self.assertEqual(self._shard_lines('2024-01'), [OLD_SENT, new_line])
+
+    def test_save_rewrites_only_loaded_months(self):
+        self.store.load()
+        stat_before = file_stat(self.store.shard_file('2024-01'))
+
+        # После отправки записи февраля месяц пустеет и удаляется
+        self.store.save([CURRENT, "мусор"])
+
+        self.assertFalse(os.path.exists(self.store.shard_file('2024-02')))
+        self.assertEqual(file_stat(self.store.shard_file('2024-01')), stat_before)
+        self.assertNotIn('2024-02', load_dict(self.store.manifest_file))
+
+    def test_save_keeps_lines_appended_by_other_process(self):
+        self.store.load()
+        other = ShardedStore(self.directory)
+        other.load()
+        other_line = "06.03.2024 [10:00 - 11:00] CUR-2 1h `Из другого процесса`"
+        other.append([other_line])
+
+        lines = self.store.save([CURRENT, OLD_PENDING, "мусор"])
+
+        self.assertIn(other_line, lines)
+        self.assertEqual(self._shard_lines('2024-03'), [CURRENT, other_line])
+
+    def test_edit_roundtrip(self):
+        path = self.store.export_for_edit()
+        self.assertCountEqual(read_lines_from(path, 0), [OLD_SENT, OLD_PENDING, CURRENT, "мусор"])
+        stat_before = file_stat(path)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join([OLD_PENDING.replace('1h', '2h').replace('11:00', '12:00'), CURRENT]) + "\n")
+        self.store.import_edit(path, stat_before)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(self.store.shard_file('2024-01')))
+        self.assertEqual(self._shard_lines('2024-02'), ["12.02.2024 [10:00 - 12:00] OLD-2 2h `Забыли отправить`"])
+        self.assertEqual(sorted(load_dict(self.store.manifest_file)), ['2024-02', '2024-03'])
+
+    def test_unchanged_edit_is_ignored(self):
+        path = self.store.export_for_edit()
+        with patch.object(ShardedStore, 'save') as mock_save:
+            self.store.import_edit(path, file_stat(path))
+        mock_save.assert_not_called()
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
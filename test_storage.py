@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+from storage import append_lines, atomic_write, file_lock, file_size, read_lines_from, save_json, write_lines
+
+
+def _append_many(path, prefix, count):
+    for i in range(count):
+        with file_lock(path):
+            append_lines(path, [f'{prefix}-{i}'])
+
+
+class TestAppendLines(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, '.litstore')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_creates_file(self):
+        size = append_lines(self.path, ['первая', 'вторая'])
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'первая\nвторая\n')
+        self.assertEqual(size, file_size(self.path))
+
+    def test_append_adds_missing_newline(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('первая')
+        append_lines(self.path, ['вторая'])
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'первая\nвторая\n')
+
+    def test_read_lines_from_offset(self):
+        offset = append_lines(self.path, ['первая'])
+        append_lines(self.path, ['вторая', 'третья'])
+        self.assertEqual(read_lines_from(self.path, offset), ['вторая', 'третья'])
+        self.assertEqual(read_lines_from(self.path, file_size(self.path)), [])
+
+    def test_missing_file(self):
+        self.assertEqual(file_size(self.path), 0)
+        self.assertEqual(read_lines_from(self.path, 0), [])
+
+    def test_parallel_processes_do_not_lose_lines(self):
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(_append_many, self.path, f'p{n}', 50) for n in range(4)]
+            for future in futures:
+                future.result()
+
+        lines = read_lines_from(self.path, 0)
+        self.assertEqual(len(lines), 200)
+        self.assertEqual(len(set(lines)), 200)
+
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tasks.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_json(self):
+        save_json(self.path, {'TASK-1': 'Задача'}, fsync='none')
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'TASK-1': 'Задача'})
+
+    def test_failure_keeps_old_file(self):
+        save_json(self.path, {'TASK-1': 'Задача'}, fsync='none')
+
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.path, fsync='none') as f:
+                f.write('{"TASK-2": ')
+                raise RuntimeError('Прервано')
+
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'TASK-1': 'Задача'})
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['tasks.json'])
+
+    def test_write_lines(self):
+        size = write_lines(self.path, ['первая', 'вторая'], fsync='none')
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'первая\nвторая\n')
+        self.assertEqual(size, file_size(self.path))
+
+    def test_fsync_policies(self):
+        for policy, expected_calls in [('none', 0), ('file', 1), ('full', 1 if os.name == 'nt' else 2)]:
+            with self.subTest(policy=policy):
+                with patch('storage.os.fsync') as mock_fsync:
+                    save_json(self.path, {}, fsync=policy)
+                self.assertEqual(mock_fsync.call_count, expected_calls)
+
+    @patch('storage.FSYNC', None)
+    def test_fsync_policy_from_config(self):
+        config_file = os.path.join(self.tmp_dir.name, '.litconfig')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write('[storage]\nfsync = none\n')
+
+        with patch('config.CONFIG_FILE', config_file), patch('storage.os.fsync') as mock_fsync:
+            save_json(self.path, {})
+        mock_fsync.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
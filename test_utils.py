@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils import LazyDict
+
+
+class TestLazyDict(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tasks.json')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'TASK-1': 'Первая задача'}, f, ensure_ascii=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_file_is_not_read_on_creation(self):
+        with patch('utils.load_dict') as mock_load:
+            cache = LazyDict(self.path)
+            mock_load.assert_not_called()
+            self.assertFalse(cache.loaded)
+
+    def test_file_is_read_once(self):
+        cache = LazyDict(self.path)
+        with patch('utils.load_dict', return_value={'TASK-1': 'Первая задача'}) as mock_load:
+            self.assertIn('TASK-1', cache)
+            self.assertEqual(cache['TASK-1'], 'Первая задача')
+            self.assertEqual(list(cache), ['TASK-1'])
+            mock_load.assert_called_once_with(self.path)
+
+    def test_invalidate_rereads_file(self):
+        cache = LazyDict(self.path)
+        self.assertEqual(len(cache), 1)
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'TASK-1': 'Первая задача', 'TASK-2': 'Вторая задача'}, f, ensure_ascii=False)
+        self.assertEqual(len(cache), 1)
+
+        cache.invalidate()
+        self.assertEqual(len(cache), 2)
+
+    def test_clear_does_not_read_file(self):
+        cache = LazyDict(self.path)
+        with patch('utils.load_dict') as mock_load:
+            cache.clear()
+            cache.update({'TASK-3': 'Третья задача'})
+            mock_load.assert_not_called()
+        self.assertEqual(dict(cache), {'TASK-3': 'Третья задача'})
+
+    def test_missing_file(self):
+        cache = LazyDict(os.path.join(self.tmp_dir.name, 'missing.json'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('TASK-1'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
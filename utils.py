@@ -1,27 +1,6 @@
 import json
 import shlex
-from datetime import datetime
-
-
-def sort_key(item):
-    # Приоритет disabled: сначала None, потом остальные
-    disabled_priority = 0 if item.get('disabled') is None else 1
-
-    # Преобразование даты в объект для сравнения
-    date_str = item.get('date', '31.12.9999')  # Для элементов без даты
-    try:
-        date = datetime.strptime(date_str, '%d.%m.%Y').date()
-    except:
-        date = datetime.max.date()
-
-    # Преобразование времени начала
-    start_str = item.get('start', '23:59')  # Для элементов без времени
-    try:
-        start = datetime.strptime(start_str, '%H:%M').time()
-    except:
-        start = datetime.max.time()
-
-    return (disabled_priority, date, start)
+from collections.abc import MutableMapping
 
 
 def load_dict(path_file) -> dict:
@@ -38,6 +17,52 @@ def load_dict(path_file) -> dict:
         return {}
 
 
+class LazyDict(MutableMapping):
+    """
+    Словарь из JSON-файла, который читается при первом обращении.
+    Загруженные данные остаются в памяти до вызова invalidate().
+    """
+
+    def __init__(self, path_file):
+        self.path_file = path_file
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = load_dict(self.path_file)
+        return self._data
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    def invalidate(self):
+        """Сбросить кэш, следующее обращение перечитает файл"""
+        self._data = None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self._data = {}
+
+
 def safe_split(text):
     """
     Разбирает строку с учётом кавычек.